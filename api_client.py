@@ -0,0 +1,280 @@
+"""
+Cliente HTTP compartilhado para as chamadas à API do Albion Online.
+Mantém uma única requests.Session com pool de conexões keep-alive, de modo que
+requisições seguidas (e concorrentes) reaproveitem a conexão TCP/TLS em vez de
+abrir uma nova a cada chamada. Também define os cabeçalhos padrão, negocia
+compressão gzip/deflate e expõe estatísticas de reaproveitamento das conexões.
+As respostas passam por um cache em disco (http_cache) com TTL por endpoint,
+revalidação condicional e cache permanente para batalhas encerradas.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from http_cache import PERMANENT, ResponseCache, request_key
+from rate_limiter import RateLimiter
+from ingest_log import capture_payload
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes
+API_BASE_URL = os.environ.get("ALBION_API_BASE_URL",
+                              "https://gameinfo.albiononline.com/api/gameinfo")  # Base da API (configurável para o servidor stub)
+POOL_CONNECTIONS = 4  # Hosts distintos mantidos no pool
+POOL_MAXSIZE = int(os.environ.get("ALBION_API_POOL_SIZE", "16"))  # Conexões keep-alive por host
+DEFAULT_TIMEOUT = 30  # Timeout padrão das requisições (segundos)
+CACHE_ENABLED = os.environ.get("ALBION_API_CACHE", "1") != "0"  # Desligar com ALBION_API_CACHE=0
+CACHE_DIR = os.environ.get("ALBION_API_CACHE_DIR", "http_cache")  # Diretório do cache de respostas
+CACHE_MAX_BYTES = 200 * 1024 * 1024  # Tamanho máximo do cache (descarte LRU)
+BATTLE_FINISHED_AFTER = 3600  # Segundos após o fim para a batalha ser considerada encerrada
+
+# TTL do cache por endpoint (regex do caminho → segundos; 0 = não guardar).
+# Batalhas encerradas são guardadas permanentemente, independentemente do TTL.
+CACHE_TTLS = [
+    (re.compile(r'/battles/\d+$'), 300),  # Detalhes de batalha ainda em andamento
+    (re.compile(r'/battles$'), 0),  # Listagem: sempre consultar (sincronização incremental)
+    (re.compile(r'/search$'), 86400),  # Busca de guilds
+    (re.compile(r'/guilds/[^/]+$'), 86400),  # Dados de guild
+]
+
+DEFAULT_HEADERS = {
+    'User-Agent':
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, deflate',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
+    'Referer': 'https://albiononline.com/',
+    'Connection': 'keep-alive',
+}
+
+_session = None
+_session_lock = threading.Lock()
+_response_cache = None
+rate_limiter = RateLimiter()  # Token bucket por host, compartilhado por todas as requisições
+
+
+def get_session():
+    """
+    Retorna a sessão compartilhada, criando-a na primeira chamada.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def close_session():
+    """
+    Fecha a sessão compartilhada e suas conexões (uma nova é criada no próximo uso).
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def api_url(path):
+    """
+    Monta a URL completa a partir de um caminho relativo à API (ex.: "battles/123").
+    URLs absolutas são retornadas sem alteração.
+    """
+    if path.startswith(('http://', 'https://')):
+        return path
+    return f"{API_BASE_URL}/{path.lstrip('/')}"
+
+
+def get_response_cache():
+    """
+    Retorna o cache de respostas compartilhado, ou None se estiver desligado.
+    """
+    global _response_cache
+    if not CACHE_ENABLED:
+        return None
+    with _session_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(CACHE_DIR, CACHE_MAX_BYTES)
+        return _response_cache
+
+
+def _endpoint_ttl(url):
+    """
+    TTL do endpoint da URL (0 se não deve ser guardado).
+    """
+    path = urlparse(url).path.rstrip('/')
+    for pattern, ttl in CACHE_TTLS:
+        if pattern.search(path):
+            return ttl
+    return 0
+
+
+def _response_ttl(url, ttl, body):
+    """
+    TTL de uma resposta: permanente para batalhas encerradas, senão o do endpoint.
+    """
+    if not CACHE_TTLS[0][0].search(urlparse(url).path.rstrip('/')):
+        return ttl
+    try:
+        end_time = json.loads(body).get('endTime')
+        ended = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+    except (ValueError, TypeError, AttributeError):
+        return ttl
+    if time.time() - ended.timestamp() > BATTLE_FINISHED_AFTER:
+        return PERMANENT
+    return ttl
+
+
+def _cached_response(url, meta, body):
+    """
+    Monta um requests.Response a partir de uma entrada do cache.
+    """
+    response = requests.Response()
+    response.status_code = meta['status']
+    response.headers = CaseInsensitiveDict(meta['headers'])
+    response._content = body
+    response.encoding = 'utf-8'
+    response.url = url
+    response.from_cache = True
+    return response
+
+
+def _send(url, params, timeout, headers):
+    """
+    Envia o GET pela sessão compartilhada, respeitando o limite de taxa do host.
+    Registra só o status e o tamanho da resposta; o corpo completo vai, por amostragem,
+    para o arquivo de payloads (ingest_log).
+    """
+    rate_limiter.acquire(url)
+    response = get_session().get(url, params=params, timeout=timeout, headers=headers)
+    rate_limiter.observe(url, response)
+    logging.debug("GET %s: %s, %s bytes", url, response.status_code, len(response.content))
+    if response.status_code == 200:
+        capture_payload(response.url, response.content)
+    return response
+
+
+def api_get(path, params=None, timeout=DEFAULT_TIMEOUT, headers=None, use_cache=True):
+    """
+    GET pela sessão compartilhada. Retorna o requests.Response
+    (exceções do requests são propagadas para o chamador tratar).
+    Respostas em cache dentro do TTL não vão à rede; entradas vencidas são
+    revalidadas com If-None-Match / If-Modified-Since quando o servidor informou
+    ETag ou Last-Modified. Se a rede falhar, uma entrada vencida é usada no lugar.
+    """
+    url = api_url(path)
+    ttl = _endpoint_ttl(url)
+    cache = get_response_cache() if use_cache and ttl != 0 else None
+    if cache is None:
+        return _send(url, params, timeout, headers)
+
+    key = request_key(url, params)
+    cached = cache.get(key)
+    if cached is not None and cached[0]['fresh']:
+        cache.record('hit')
+        return _cached_response(url, *cached)
+
+    request_headers = dict(headers or {})
+    if cached is not None:
+        validators = cached[0]['headers']
+        if 'ETag' in validators:
+            request_headers['If-None-Match'] = validators['ETag']
+        if 'Last-Modified' in validators:
+            request_headers['If-Modified-Since'] = validators['Last-Modified']
+
+    try:
+        response = _send(url, params, timeout, request_headers or None)
+    except requests.exceptions.RequestException:
+        if cached is None:
+            raise
+        logging.warning("Falha na rede, usando resposta vencida do cache para %s", url)
+        cache.record('hit')
+        return _cached_response(url, *cached)
+
+    if response.status_code == 304 and cached is not None:
+        cache.refresh(key, _response_ttl(url, ttl, cached[1]))
+        cache.record('revalidated')
+        return _cached_response(url, *cached)
+
+    cache.record('miss')
+    if response.status_code == 200:
+        try:
+            cache.put(key, url, 200, response.headers, response.content,
+                      _response_ttl(url, ttl, response.content))
+        except OSError as e:
+            logging.warning("Erro ao gravar resposta no cache HTTP: %s", e)
+    return response
+
+
+async def api_get_async(path, params=None, timeout=DEFAULT_TIMEOUT, headers=None, use_cache=True):
+    """
+    Versão assíncrona de api_get: executa a requisição em uma thread,
+    usando o mesmo pool de conexões da sessão compartilhada.
+    """
+    return await asyncio.to_thread(api_get, path, params, timeout, headers, use_cache)
+
+
+def connection_stats():
+    """
+    Retorna estatísticas dos pools de conexão da sessão:
+    conexões abertas, requisições feitas e requisições que reaproveitaram uma conexão.
+    """
+    stats = {'pools': 0, 'connections': 0, 'requests': 0, 'reused': 0}
+    with _session_lock:
+        session = _session
+    if session is None:
+        return stats
+
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats['pools'] += 1
+            stats['connections'] += pool.num_connections
+            stats['requests'] += pool.num_requests
+
+    stats['reused'] = max(0, stats['requests'] - stats['connections'])
+    return stats
+
+
+def log_connection_stats():
+    """
+    Registra no log as estatísticas de reaproveitamento de conexões, do limite de taxa
+    e do cache de respostas.
+    """
+    stats = connection_stats()
+    if stats['requests']:
+        logging.info("Conexões HTTP: %s requisições em %s conexões (%s reaproveitadas)",
+                     stats['requests'], stats['connections'], stats['reused'])
+
+    limiter_stats = rate_limiter.stats()
+    if limiter_stats['throttled'] or limiter_stats['retry_after_pauses']:
+        logging.info("Limite de taxa: %s/%s requisições aguardaram %.1fs no total, %s pausas por Retry-After",
+                     limiter_stats['throttled'], limiter_stats['requests'], limiter_stats['wait_seconds'],
+                     limiter_stats['retry_after_pauses'])
+
+    cache = get_response_cache()
+    if cache is not None:
+        cache_stats = cache.stats()
+        if cache_stats['hits'] or cache_stats['misses'] or cache_stats['revalidated']:
+            logging.info("Cache HTTP: %s acertos, %s falhas, %s revalidadas, %s descartadas",
+                         cache_stats['hits'], cache_stats['misses'], cache_stats['revalidated'],
+                         cache_stats['evictions'])
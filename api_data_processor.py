@@ -1,9 +1,10 @@
 import pandas as pd
-import json
 import logging
-from datetime import datetime
 import os
-from battle_history_manager import update_battle_history, load_battle_history, get_battles_by_timeframe
+from json_stream import iter_json_array
+from battle_history_manager import update_battle_tables, load_battle_history, get_battles_by_timeframe, iter_unseen_battles
+from battle_normalizer import normalize_battles_parallel
+from battle_store import build_history_frame
 from api_scraper import refresh_battle_data
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,79 +16,65 @@ GUILD_NAME = "We Profit"
 # Arquivo local com dados baixados previamente
 DATA_FILE = "data.json"
 
-def process_raw_battle_data(battles_data):
+# Com o worker de ingestão (ingest_worker.py) rodando, a interface só lê o histórico
+INGEST_WORKER_ENABLED = os.environ.get("ALBION_INGEST_WORKER") == "1"
+
+def normalize_raw_battle_data(battles_data, skip_known=True):
+    """
+    Processa dados brutos de batalhas para as três tabelas planas do histórico
+    (battle_normalizer), mantendo só as batalhas com jogadores da guild.
+    battles_data pode ser uma lista ou qualquer iterável (ex.: iter_json_array),
+    e é consumido uma batalha por vez.
+    Com mais de um processo configurado (ALBION_NORMALIZE_WORKERS), lotes de
+    batalhas são normalizados em paralelo.
+    Com skip_known, batalhas que já estão no histórico (consultadas no índice de IDs)
+    são descartadas antes do processamento.
+    """
+    counts = {'read': 0, 'unseen': 0}
+    
+    def counted(battles, name):
+        for battle in battles:
+            counts[name] += 1
+            yield battle
+    
+    # Contar a entrada antes do filtro de batalhas conhecidas e o que passa por ele
+    battles_data = counted(battles_data, 'read')
+    if skip_known:
+        battles_data = iter_unseen_battles(battles_data)
+    
+    tables = normalize_battles_parallel(counted(battles_data, 'unseen'), GUILD_ID)
+    logging.info(f"Lidas {counts['read']} batalhas, {counts['unseen']} novas processadas, "
+                 f"{len(tables['battles'])} com a guild {GUILD_NAME}")
+    return tables
+
+def process_raw_battle_data(battles_data, skip_known=True):
     """
     Processa dados brutos de batalhas para o formato padronizado
+    (DataFrame com a coluna details), a partir de normalize_raw_battle_data.
+    """
+    return build_history_frame(normalize_raw_battle_data(battles_data, skip_known))
+
+def ingest_local_data(path=DATA_FILE):
     """
-    processed_battles = []
+    Grava no histórico as batalhas novas do arquivo local de dados brutos.
+    Retorna o número de batalhas novas processadas.
+    """
+    if not os.path.exists(path):
+        logging.warning(f"Arquivo de dados {path} não encontrado")
+        return 0
     
-    for battle in battles_data:
-        try:
-            # Extrair informações básicas
-            battle_id = battle['id']
-            battle_time = datetime.fromisoformat(battle['startTime'].replace('Z', '+00:00'))
-            total_fame = battle['totalFame']
-            
-            # Os jogadores estão organizados como um dicionário, onde as chaves são os IDs dos jogadores
-            players_dict = battle['players']
-            all_players = list(players_dict.values())
-            
-            # Filtrar jogadores da guild
-            guild_players = [p for p in all_players if p.get('guildId') == GUILD_ID]
-            
-            if guild_players:
-                players_count = len(guild_players)
-                guild_kills = sum(p.get('kills', 0) for p in guild_players)
-                guild_deaths = sum(p.get('deaths', 0) for p in guild_players)
-                
-                # Agrupar por guild
-                guilds_stats = {}
-                
-                for player in all_players:
-                    guild_name = player.get('guildName', 'Unknown')
-                    
-                    if guild_name not in guilds_stats:
-                        guilds_stats[guild_name] = {
-                            'players': [],
-                            'total_kills': 0,
-                            'total_deaths': 0,
-                            'total_fame': 0
-                        }
-                    
-                    player_stats = {
-                        'name': player.get('name', 'Unknown'),
-                        'kills': player.get('kills', 0),
-                        'deaths': player.get('deaths', 0),
-                        'fame': player.get('killFame', 0)
-                    }
-                    
-                    guilds_stats[guild_name]['players'].append(player_stats)
-                    guilds_stats[guild_name]['total_kills'] += player_stats['kills']
-                    guilds_stats[guild_name]['total_deaths'] += player_stats['deaths']
-                    guilds_stats[guild_name]['total_fame'] += player_stats['fame']
-                
-                # Criar objeto de detalhes
-                battle_details = {
-                    'id': battle_id,
-                    'time': battle_time,
-                    'guilds': guilds_stats
-                }
-                
-                # Adicionar à lista
-                processed_battles.append({
-                    'battle_id': battle_id,
-                    'time': battle_time,
-                    'players': players_count,
-                    'kills': guild_kills,
-                    'deaths': guild_deaths,
-                    'fame': total_fame,
-                    'details': battle_details
-                })
-        except Exception as e:
-            logging.error(f"Erro ao processar batalha {battle.get('id', 'unknown')}: {e}")
+    logging.info(f"Lendo dados de batalhas do arquivo local: {path}")
+    
+    # Ler o arquivo JSON uma batalha por vez, sem carregar o array inteiro
+    battles_data = iter_json_array(path)
     
-    # Criar DataFrame
-    return pd.DataFrame(processed_battles)
+    # Processar os dados brutos direto para as tabelas do histórico
+    new_tables = normalize_raw_battle_data(battles_data)
+    logging.info(f"Processados dados de {len(new_tables['battles'])} batalhas com sucesso")
+    
+    # Atualizar o histórico com as novas batalhas
+    update_battle_tables(new_tables)
+    return len(new_tables['battles'])
 
 def get_battle_data(days=None, force_refresh=False):
     """
@@ -96,42 +83,30 @@ def get_battle_data(days=None, force_refresh=False):
     Args:
         days: Número de dias no passado para recuperar dados (None = todos)
         force_refresh: Se True, força a busca de dados na API em vez de usar dados locais
+            (ignorado com o worker de ingestão ativo, que já mantém o histórico atualizado)
     
     Returns:
         DataFrame com dados de batalhas
     """
     try:
+        # Com o worker ativo, a API e o arquivo local são ingeridos por ele; aqui só leitura
+        if INGEST_WORKER_ENABLED:
+            if force_refresh:
+                logging.info("Atualização via API feita pelo worker de ingestão; lendo o histórico")
+        
         # Se force_refresh é True, buscamos dados atualizados da API
-        if force_refresh:
+        elif force_refresh:
             logging.info(f"Forçando atualização de dados da API para os últimos {days if days else 30} dias")
             api_days = days if days is not None else 30
-            battles_df = refresh_battle_data(GUILD_NAME, days=api_days)
+            new_battles_df = refresh_battle_data(GUILD_NAME, days=api_days)
             
-            if not battles_df.empty:
-                logging.info(f"Dados atualizados com sucesso via API: {len(battles_df)} batalhas")
-                # Já que refresh_battle_data já atualiza o histórico, apenas retornamos os dados
-                return battles_df
-            else:
-                logging.warning("Não foi possível atualizar dados via API, usando dados locais")
+            # refresh_battle_data já grava no histórico apenas as batalhas novas;
+            # o resultado é lido do histórico abaixo
+            logging.info(f"Atualização via API concluída: {len(new_battles_df)} batalhas novas")
         
         # Processamento padrão dos dados locais
-        if os.path.exists(DATA_FILE):
-            logging.info(f"Lendo dados de batalhas do arquivo local: {DATA_FILE}")
-            
-            # Abrir o arquivo JSON
-            with open(DATA_FILE, 'r') as f:
-                battles_data = json.load(f)
-            
-            logging.info(f"Encontrados dados de {len(battles_data)} batalhas no arquivo")
-            
-            # Processar os dados brutos
-            new_battles_df = process_raw_battle_data(battles_data)
-            logging.info(f"Processados dados de {len(new_battles_df)} batalhas com sucesso")
-            
-            # Atualizar o histórico com as novas batalhas
-            update_battle_history(new_battles_df)
-        else:
-            logging.warning(f"Arquivo de dados {DATA_FILE} não encontrado")
+        if not INGEST_WORKER_ENABLED:
+            ingest_local_data()
         
         # Retornar os dados históricos filtrados pelo período solicitado
         if days is not None:
@@ -5,17 +5,33 @@ import logging
 import json
 from datetime import datetime, timedelta
 import time
-from battle_history_manager import update_battle_history
+from battle_history_manager import update_battle_history, update_battle_tables, known_battles_mask
+from battle_normalizer import normalize_battles
+from battle_store import build_history_frame, concat_tables, empty_tables
+from battle_fetcher import (FETCH_MAX_ATTEMPTS, FETCH_RETRY_DELAY, LIST_PAGE_SIZE, LIST_PAGES_IN_FLIGHT,
+                            ListingError, fetch_battles_sync, list_guild_battles, iterate_sync)
+from sync_state import get_high_water_mark, update_high_water_mark
+from api_client import API_BASE_URL, api_get, log_connection_stats
+from rate_limiter import backoff_delay
+from single_flight import SingleFlight
+from raw_archive import archive_battles
+from guild_cache import lookup_guild, remember_guild, seed_from_battles
+from ingest_log import summarize
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 # API URLs for Albion Online official API
-SEARCH_URL = "https://gameinfo.albiononline.com/api/gameinfo/search"
-GUILD_URL = "https://gameinfo.albiononline.com/api/gameinfo/guilds"
-BATTLES_URL = "https://gameinfo.albiononline.com/api/gameinfo/battles?range=week&offset=0&limit=51&sort=totalfame&guildId=gUFLG-kcRFC1iOJDdwW2BQ"
-BATTLE_DETAIL_URL = "https://gameinfo.albiononline.com/api/gameinfo/battles"  # Para buscar uma batalha específica, adicione /{battleId}
+# (API_BASE_URL pode ser trocada pela variável de ambiente ALBION_API_BASE_URL)
+SEARCH_URL = f"{API_BASE_URL}/search"
+GUILD_URL = f"{API_BASE_URL}/guilds"
+BATTLE_DETAIL_URL = f"{API_BASE_URL}/battles"  # Para buscar uma batalha específica, adicione /{battleId}
+
+SYNC_OVERLAP = timedelta(minutes=10)  # Margem antes da última batalha sincronizada
+
+# Chamadas idênticas simultâneas (ex.: várias sessões do dashboard) compartilham uma só busca
+in_flight = SingleFlight()
 
 # Lista de IDs de batalhas conhecidas (para quando a API de listagem falhar)
 # Estas são batalhas reais que já aconteceram e têm dados disponíveis
@@ -29,18 +45,29 @@ KNOWN_BATTLE_IDS = [
 def get_guild_id(guild_name, max_attempts=3, delay=2):
     """
     Get the guild ID from the Albion Online API by searching for a guild name
+    Consulta antes o cache de guilds (guild_cache), alimentado pelas buscas anteriores
+    e pelas batalhas ingeridas; um nome recentemente buscado sem sucesso retorna None
+    sem nova busca.
     """
+    cached = lookup_guild(guild_name)
+    if cached is not None:
+        logging.info("Guild ID para %s obtido do cache: %s", guild_name, cached['guild_id'])
+        return cached['guild_id']
+
+    searched = False
     for attempt in range(max_attempts):
+        response = None
         try:
             # Prepare search parameters
             params = {"q": guild_name}
 
             # Make the API request with a longer timeout
-            response = requests.get(SEARCH_URL, params=params, timeout=10)
+            response = api_get(SEARCH_URL, params=params, timeout=10)
             response.raise_for_status()
 
             # Parse the JSON response
             data = response.json()
+            searched = True
 
             # Look for guilds in the search results
             if 'guilds' in data and data['guilds']:
@@ -48,171 +75,111 @@ def get_guild_id(guild_name, max_attempts=3, delay=2):
                     # Check if the guild name matches (case-insensitive)
                     if guild_name.lower() in guild['Name'].lower():
                         guild_id = guild['Id']
-                        logging.info(
-                            f"Found guild ID for {guild_name}: {guild_id}")
+                        logging.info("Found guild ID for %s: %s", guild_name, guild_id)
+                        remember_guild(guild_name, guild_id, guild.get('AllianceId'), guild.get('AllianceName'))
                         return guild_id
 
             # If we didn't find a match in this attempt
-            logging.warning(
-                f"Guild {guild_name} not found in attempt {attempt+1}/{max_attempts}"
-            )
+            logging.warning("Guild %s not found in attempt %s/%s", guild_name, attempt+1, max_attempts)
 
             # Wait before retrying (except on the last attempt)
             if attempt < max_attempts - 1:
-                time.sleep(delay)
+                time.sleep(backoff_delay(attempt, delay, response))
 
         except requests.exceptions.Timeout:
-            logging.warning(
-                f"Request timed out in attempt {attempt+1}/{max_attempts}")
+            logging.warning("Request timed out in attempt %s/%s", attempt+1, max_attempts)
             if attempt < max_attempts - 1:
-                time.sleep(delay)
+                time.sleep(backoff_delay(attempt, delay, response))
 
         except requests.exceptions.RequestException as e:
-            logging.error(f"Error searching for guild: {e}")
+            response = e.response
+            logging.error("Error searching for guild: %s", e)
             if attempt < max_attempts - 1:
-                time.sleep(delay)
+                time.sleep(backoff_delay(attempt, delay, response))
 
     # If we reach here, we couldn't find the guild after all attempts
-    logging.warning(
-        f"Guild {guild_name} not found after {max_attempts} attempts")
+    logging.warning("Guild %s not found after %s attempts", guild_name, max_attempts)
+    # Só a busca respondida sem a guild vai para o cache negativo (não falhas de rede)
+    if searched:
+        remember_guild(guild_name, None)
     return None
 
 
-def get_guild_battles(guild_id, days=7, max_attempts=8, delay=5):
+def _collect_guild_battles(guild_id, days, since=None, pages_in_flight=LIST_PAGES_IN_FLIGHT,
+                           max_attempts=FETCH_MAX_ATTEMPTS, delay=FETCH_RETRY_DELAY, skip_known=True):
+    """
+    Lista as batalhas da guild e as normaliza página a página (battle_normalizer),
+    enquanto as páginas seguintes da listagem continuam sendo buscadas. Cada página
+    é arquivada (raw_archive) e descartada depois de normalizada, então só as
+    tabelas normalizadas ficam em memória. Com skip_known, as batalhas que já estão
+    no histórico são ignoradas antes da normalização.
+    Retorna (tabelas, batalhas listadas, (time, battle_id) da mais recente ou None, completa),
+    em que completa indica se a listagem chegou ao fim sem erros.
     """
-    Get battles for a specific guild from the Albion Online API
+    tables = []
+    page = []
+    listed = 0
+    known_count = 0
+    newest = None
+    complete = False
+
+    def flush():
+        nonlocal known_count
+        archive_raw_battles(page)
+        battles = page
+        if skip_known:
+            known = known_battles_mask([battle.get('id') for battle in page])
+            known_count += int(known.sum())
+            battles = [battle for battle, is_known in zip(page, known) if not is_known]
+        if battles:
+            tables.append(normalize_battles(battles, guild_id))
+        page.clear()
+
+    try:
+        listing = list_guild_battles(guild_id, days, since=since, pages_in_flight=pages_in_flight,
+                                     max_attempts=max_attempts, delay=delay)
+        for battle in iterate_sync(listing):
+            listed += 1
+            battle_time = datetime.fromisoformat(battle.get('startTime').replace('Z', '+00:00'))
+            if newest is None or (battle_time, battle.get('id')) > newest:
+                newest = (battle_time, battle.get('id'))
+
+            # Normalizar a cada página completa, sem esperar o fim da listagem
+            page.append(battle)
+            if len(page) >= LIST_PAGE_SIZE:
+                flush()
+        complete = True
+
+    except ListingError as e:
+        logging.error("Error getting battles: %s", e)
+
+    except Exception as e:
+        logging.error("Unexpected error processing battles: %s", e)
+
+    if page:
+        flush()
+    if known_count:
+        logging.info("%s batalhas já estão no histórico e foram ignoradas", known_count)
+
+    new_tables = concat_tables(*tables) if tables else empty_tables()
+    logging.info("Retrieved %s battles for guild ID %s (%s listed)", len(new_tables['battles']), guild_id, listed)
+    return new_tables, listed, newest, complete
+
+
+def get_guild_battles(guild_id, days=7, max_attempts=FETCH_MAX_ATTEMPTS, delay=FETCH_RETRY_DELAY, since=None):
+    """
+    Get battles for a specific guild from the Albion Online API.
+    A listagem é paginada (várias páginas buscadas ao mesmo tempo) até cobrir os
+    últimos days dias (ou até since), e as batalhas de cada página são normalizadas
+    assim que ela chega. Retorna o DataFrame aninhado (coluna details) das batalhas
+    em que a guild participou.
     """
     if not guild_id:
         return pd.DataFrame()
 
-    battles = []
-    for attempt in range(max_attempts):
-        try:
-            # Usar o formato exato da URL fornecido pelo usuário
-            # URL exata fornecida pelo usuário
-            url = f"https://gameinfo.albiononline.com/api/gameinfo/battles?range=week&offset=0&limit=51&sort=totalfame&guildId={guild_id}"
-
-            # Se precisar de mais dias, modifique o parâmetro range
-            if days > 14:
-                url = url.replace("range=week", "range=month")
-            elif days > 7:
-                url = url.replace("range=week", "range=2weeks")
-
-            # Adicionar headers para simular um navegador
-            headers = {
-                'User-Agent':
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'application/json',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-                'Referer': 'https://albiononline.com/'
-            }
-
-            logging.info(
-                f"Tentativa {attempt+1}/{max_attempts} de obter dados de batalhas usando a URL direta: {url}"
-            )
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-
-            # Parse the battles data and ensure it's a list
-            battles_data = response.json()
-
-            # Log para debug
-            logging.info(f"Resposta da API: {battles_data}")
-
-            if isinstance(battles_data, dict):
-                if 'error' in battles_data:
-                    logging.error(f"Erro da API: {battles_data['error']}")
-                    if attempt < max_attempts - 1:
-                        time.sleep(delay)
-                    continue
-
-            if not isinstance(battles_data, list):
-                if isinstance(battles_data, dict):
-                    # Se for um dicionário, pode estar em outro formato
-                    logging.info("Convertendo formato da resposta")
-                    battles_data = [battles_data]
-                else:
-                    logging.error(f"Resposta da API em formato inesperado: {type(battles_data)}")
-                    if attempt < max_attempts - 1:
-                        time.sleep(delay)
-                    continue
-
-            if not battles_data:
-                logging.warning("Lista de batalhas vazia")
-                if attempt < max_attempts - 1:
-                    time.sleep(delay)
-                continue
-
-            logging.info(f"Recebidas {len(battles_data)} batalhas da API")
-
-            # Process each battle
-            for battle in battles_data:
-                # Basic battle info
-                battle_id = battle.get('id')
-                battle_time = datetime.fromisoformat(
-                    battle.get('startTime').replace('Z', '+00:00'))
-                total_kills = battle.get('totalKills', 0)
-                total_fame = battle.get('totalFame', 0)
-
-                # Process players from this guild in the battle
-                players_count = 0
-                guild_kills = 0
-                guild_deaths = 0
-
-                # Look through all players in the battle
-                guild_players = [
-                    player for player in battle.get('players', [])
-                    if player.get('guildId') == guild_id
-                ]
-
-                if guild_players:
-                    players_count = len(guild_players)
-                    guild_kills = sum(
-                        player.get('kills', 0) for player in guild_players)
-                    guild_deaths = sum(
-                        player.get('deaths', 0) for player in guild_players)
-
-                    battles.append({
-                        'battle_id': battle_id,
-                        'time': battle_time,
-                        'players': players_count,
-                        'kills': guild_kills,
-                        'deaths': guild_deaths,
-                        'fame': total_fame,
-                        'raw_data': battle
-                    })
-
-            # Convert to DataFrame
-            battles_df = pd.DataFrame(battles)
-            logging.info(
-                f"Retrieved {len(battles_df)} battles for guild ID {guild_id}")
-
-            if not battles_df.empty:
-                return battles_df
-            else:
-                logging.warning(f"No battles found for guild ID {guild_id}")
-                # Try again if no battles found
-                if attempt < max_attempts - 1:
-                    time.sleep(delay)
-
-        except requests.exceptions.Timeout:
-            logging.warning(
-                f"Request timed out in attempt {attempt+1}/{max_attempts}")
-            if attempt < max_attempts - 1:
-                time.sleep(delay)
-
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error getting battles: {e}")
-            if attempt < max_attempts - 1:
-                time.sleep(delay)
-
-        except Exception as e:
-            logging.error(f"Unexpected error processing battles: {e}")
-            if attempt < max_attempts - 1:
-                time.sleep(delay)
-
-    # If we reach here, we couldn't get battles after all attempts
-    return pd.DataFrame()
+    tables = _collect_guild_battles(guild_id, days, since=since, max_attempts=max_attempts, delay=delay,
+                                    skip_known=False)[0]
+    return build_history_frame(tables)
 
 
 def process_battle_details(battle_data, guild_name):
@@ -223,8 +190,8 @@ def process_battle_details(battle_data, guild_name):
         return None
 
     # Debug log para verificar o formato dos dados recebidos
-    logging.info(
-        f"Processando detalhes da batalha: {battle_data['battle_id']}")
+    logging.debug("Processando detalhes da batalha %s: %s", battle_data['battle_id'],
+                  summarize(battle_data['raw_data']))
 
     # Verificar se raw_data é uma string (resposta da API) ou um dicionário
     raw_battle = battle_data['raw_data']
@@ -232,178 +199,151 @@ def process_battle_details(battle_data, guild_name):
         try:
             raw_battle = json.loads(raw_battle)
         except Exception as e:
-            logging.error(f"Erro ao converter raw_data para JSON: {e}")
+            logging.error("Erro ao converter raw_data para JSON: %s", e)
             return None
 
-    battle_id = battle_data['battle_id']
-    battle_time = battle_data['time']
-
-    # Prepare the guild stats dictionary
-    guilds_stats = {}
-
-    # Group players by guild
-    guilds = {}
-    for player in raw_battle.get('players', []):
-        guild_id = player.get('guildId')
-        guild_name_api = player.get('guildName', 'Unknown')
-
-        if guild_id not in guilds:
-            guilds[guild_id] = {
-                'name': guild_name_api,
-                'players': [],
-                'total_kills': 0,
-                'total_deaths': 0,
-                'total_fame': 0
-            }
-
-        # Add player data
-        player_stats = {
-            'name': player.get('name', 'Unknown'),
-            'kills': player.get('kills', 0),
-            'deaths': player.get('deaths', 0),
-            'fame': player.get('killFame', 0)
-        }
-
-        guilds[guild_id]['players'].append(player_stats)
-        guilds[guild_id]['total_kills'] += player_stats['kills']
-        guilds[guild_id]['total_deaths'] += player_stats['deaths']
-        guilds[guild_id]['total_fame'] += player_stats['fame']
-
-    # Format guilds for the return structure
-    for guild_id, stats in guilds.items():
-        guilds_stats[stats['name']] = {
-            'players': stats['players'],
-            'total_kills': stats['total_kills'],
-            'total_deaths': stats['total_deaths'],
-            'total_fame': stats['total_fame']
-        }
-
-    battle_details = {
-        'id': battle_id,
-        'time': battle_time,
-        'guilds': guilds_stats
-    }
+    # Totais por guild calculados pelo normalizador (battle_normalizer)
+    history_df = build_history_frame(normalize_battles([raw_battle]))
+    if history_df.empty:
+        return None
+
+    battle_details = history_df['details'].iloc[0]
+    battle_details['id'] = battle_data['battle_id']
+    battle_details['time'] = battle_data['time']
 
     return battle_details
 
 
+def wrap_battle(battle_data):
+    """
+    Converte o JSON bruto de uma batalha no formato usado por process_battle_details
+    """
+    return {
+        'battle_id': battle_data.get('id'),
+        'time': datetime.fromisoformat(
+            battle_data.get('startTime').replace('Z', '+00:00')),
+        'raw_data': battle_data
+    }
+
+
+def archive_raw_battles(raw_battles):
+    """
+    Guarda os dados brutos recebidos da API no arquivo compactado (raw_archive),
+    para reprocessamento futuro sem buscar de novo, e registra as guilds dos
+    jogadores no cache de guilds. Falhas não interrompem a atualização.
+    """
+    raw_battles = list(raw_battles)
+    seed_from_battles(raw_battles)
+    try:
+        return archive_battles(raw_battles)
+    except (OSError, ValueError) as e:
+        logging.error("Erro ao arquivar dados brutos das batalhas: %s", e)
+        return 0
+
+
+@in_flight.wrap
 def get_battle_by_id(battle_id, max_attempts=3, delay=2):
     """
     Get a specific battle by ID directly from the API
     """
     url = f"{BATTLE_DETAIL_URL}/{battle_id}"
 
-    headers = {
-        'User-Agent':
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'application/json',
-        'Accept-Language': 'pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7',
-    }
-
     for attempt in range(max_attempts):
+        response = None
         try:
-            logging.info(
-                f"Buscando batalha ID {battle_id}, tentativa {attempt+1}/{max_attempts}"
-            )
-            response = requests.get(url, headers=headers, timeout=30)
+            logging.info("Buscando batalha ID %s, tentativa %s/%s", battle_id, attempt+1, max_attempts)
+            response = api_get(url, timeout=30)
             response.raise_for_status()
 
             battle_data = response.json()
 
             # Verificar se a resposta possui o formato esperado
             if 'id' not in battle_data:
-                logging.warning(
-                    f"Resposta para batalha ID {battle_id} não possui o formato esperado"
-                )
+                logging.warning("Resposta para batalha ID %s não possui o formato esperado", battle_id)
                 if attempt < max_attempts - 1:
-                    time.sleep(delay)
+                    time.sleep(backoff_delay(attempt, delay, response))
                 continue
 
-            battle_id = battle_data.get('id')
-            battle_time = datetime.fromisoformat(
-                battle_data.get('startTime').replace('Z', '+00:00'))
-
-            return {
-                'battle_id': battle_id,
-                'time': battle_time,
-                'raw_data': battle_data
-            }
+            archive_raw_battles([battle_data])
+            return wrap_battle(battle_data)
 
         except requests.exceptions.Timeout:
-            logging.warning(
-                f"Timeout ao buscar batalha ID {battle_id}, tentativa {attempt+1}/{max_attempts}"
-            )
+            logging.warning("Timeout ao buscar batalha ID %s, tentativa %s/%s", battle_id, attempt+1, max_attempts)
             if attempt < max_attempts - 1:
-                time.sleep(delay)
+                time.sleep(backoff_delay(attempt, delay, response))
 
         except requests.exceptions.RequestException as e:
-            logging.error(f"Erro ao buscar batalha ID {battle_id}: {e}")
+            response = e.response
+            logging.error("Erro ao buscar batalha ID %s: %s", battle_id, e)
             if attempt < max_attempts - 1:
-                time.sleep(delay)
+                time.sleep(backoff_delay(attempt, delay, response))
 
     return None
 
 
-def refresh_battle_data(guild_name, days=30):
+@in_flight.wrap
+def refresh_battle_data(guild_name, days=30, incremental=True):
     """
-    Refresh all battle data for a guild using the Albion Online API
+    Refresh all battle data for a guild using the Albion Online API.
+    Chamadas simultâneas para a mesma guild (e mesmos argumentos) compartilham
+    uma única atualização e recebem cópias do mesmo DataFrame.
+    Com incremental, lista apenas as batalhas a partir da última sincronizada
+    (high-water mark da guild, em sync_state), parando ao alcançá-la; sem marca
+    (primeira sincronização) baixa o período inteiro de days dias.
     """
-    logging.info(f"Refreshing battle data for {guild_name}")
+    logging.info("Refreshing battle data for %s", guild_name)
 
     # O ID da guild "We Profit" nos foi fornecido diretamente pelo usuário
     if guild_name == "We Profit":
         guild_id = "gUFLG-kcRFC1iOJDdwW2BQ"
-        logging.info(f"Usando ID fixo para guild We Profit: {guild_id}")
+        logging.info("Usando ID fixo para guild We Profit: %s", guild_id)
     else:
         # Para outras guilds, tentamos procurar pelo nome
         guild_id = get_guild_id(guild_name)
 
     if not guild_id:
-        logging.warning(
-            f"Guild ID não encontrado para {guild_name}, tentando usar batalhas conhecidas"
-        )
+        logging.warning("Guild ID não encontrado para %s, tentando usar batalhas conhecidas", guild_name)
         return get_known_battles(guild_name)
 
-    # Get basic battle information
-    battles_df = get_guild_battles(guild_id, days)
+    # Sincronização incremental: listar só até a última batalha já sincronizada
+    # (com uma margem, já que batalhas próximas podem aparecer fora de ordem)
+    mark = get_high_water_mark(guild_id) if incremental else None
+    if mark is not None:
+        since = mark[0] - SYNC_OVERLAP
+        logging.info("Sincronização incremental a partir de %s", since)
+        new_tables, listed, newest, complete = _collect_guild_battles(guild_id, days, since=since,
+                                                                     pages_in_flight=1)
+    else:
+        new_tables, listed, newest, complete = _collect_guild_battles(guild_id, days)
+
+    if listed == 0 and mark is not None and complete:
+        logging.info("Nenhuma batalha nova para %s desde a última sincronização", guild_name)
+        return pd.DataFrame()
 
     # Se não conseguir obter batalhas pela API normal, tentar com IDs conhecidos
-    if battles_df.empty:
+    if listed == 0:
         logging.warning(
             "Não foi possível obter batalhas pela API padrão, tentando com batalhas conhecidas"
         )
         return get_known_battles(guild_name)
 
-    # Process battle details
-    detailed_battles = []
-
-    for _, battle in battles_df.iterrows():
-        battle_details = process_battle_details(battle, guild_name)
-
-        if battle_details:
-            detailed_battles.append({
-                'battle_id': battle['battle_id'],
-                'time': battle['time'],
-                'players': battle['players'],
-                'kills': battle['kills'],
-                'deaths': battle['deaths'],
-                'fame': battle['fame'],
-                'details': battle_details
-            })
-
-    # Create detailed DataFrame
-    detailed_df = pd.DataFrame(detailed_battles)
-    logging.info(f"Retrieved detailed data for {len(detailed_df)} battles")
+    # Batalhas novas já normalizadas página a página durante a listagem
+    detailed_df = build_history_frame(new_tables)
+    logging.info("Retrieved detailed data for %s battles", len(detailed_df))
+    log_connection_stats()
 
     # Atualizar o histórico de batalhas com os novos dados
+    stored = True
     if not detailed_df.empty:
         try:
-            update_battle_history(detailed_df)
-            logging.info(
-                f"Histórico de batalhas atualizado com {len(detailed_df)} novas batalhas"
-            )
+            update_battle_tables(new_tables)
+            logging.info("Histórico de batalhas atualizado com %s novas batalhas", len(detailed_df))
         except Exception as e:
-            logging.error(f"Erro ao atualizar histórico de batalhas: {e}")
+            stored = False
+            logging.error("Erro ao atualizar histórico de batalhas: %s", e)
+
+    if complete and stored:
+        update_high_water_mark(guild_id, newest[0], newest[1])
 
     return detailed_df
 
@@ -414,11 +354,19 @@ def get_known_battles(guild_name):
     """
     detailed_battles = []
 
-    # Buscar até 5 batalhas conhecidas
-    for battle_id in KNOWN_BATTLE_IDS[:5]:
-        battle = get_battle_by_id(battle_id)
-        if not battle:
+    # Buscar até 5 batalhas conhecidas, exceto as que já estão no histórico,
+    # todas ao mesmo tempo
+    candidate_ids = KNOWN_BATTLE_IDS[:5]
+    known = known_battles_mask(candidate_ids)
+    missing_ids = [b for b, is_known in zip(candidate_ids, known) if not is_known]
+    fetched = {str(b['id']): b for b in fetch_battles_sync(missing_ids)} if missing_ids else {}
+    archive_raw_battles(fetched.values())
+
+    # Processar na ordem da lista de IDs conhecidos
+    for battle_id in missing_ids:
+        if battle_id not in fetched:
             continue
+        battle = wrap_battle(fetched[battle_id])
 
         # Processar detalhes da batalha para extrair dados relevantes
         battle_details = process_battle_details(battle, guild_name)
@@ -451,19 +399,15 @@ def get_known_battles(guild_name):
     # Criar DataFrame com batalhas encontradas
     detailed_df = pd.DataFrame(
         detailed_battles) if detailed_battles else pd.DataFrame()
-    logging.info(
-        f"Retrieved {len(detailed_df)} battles using known battle IDs")
+    logging.info("Retrieved %s battles using known battle IDs", len(detailed_df))
+    log_connection_stats()
 
     # Atualizar o histórico de batalhas com os novos dados
     if not detailed_df.empty:
         try:
             update_battle_history(detailed_df)
-            logging.info(
-                f"Histórico de batalhas atualizado com {len(detailed_df)} batalhas conhecidas"
-            )
+            logging.info("Histórico de batalhas atualizado com %s batalhas conhecidas", len(detailed_df))
         except Exception as e:
-            logging.error(
-                f"Erro ao atualizar histórico de batalhas com batalhas conhecidas: {e}"
-            )
+            logging.error("Erro ao atualizar histórico de batalhas com batalhas conhecidas: %s", e)
 
     return detailed_df
\ No newline at end of file
@@ -60,21 +60,22 @@ def display_battle_data():
                         st.bar_chart(results)
                 
                 # Exibir detalhes de uma única batalha
-                elif isinstance(data, dict) and "id" in data:
-                    st.subheader(f"Detalhes da Batalha: {data['id']}")
+                elif isinstance(data, dict) and "battle_id" in data:
+                    # Registro do histórico: battle_id, time, players, kills, deaths, fame, details
+                    st.subheader(f"Detalhes da Batalha: {data['battle_id']}")
                     
                     # Exibir informações em colunas
                     col1, col2 = st.columns(2)
                     
                     with col1:
-                        st.write("**Data:**", data.get("date", "N/A"))
-                        st.write("**Resultado:**", data.get("result", "N/A"))
-                        st.write("**Tipo:**", data.get("type", "N/A"))
+                        st.write("**Data:**", data.get("time", "N/A"))
+                        st.write("**Jogadores:**", data.get("players", "N/A"))
+                        st.write("**Guilds:**", len(data.get("details", {}).get("guilds", {})))
                     
                     with col2:
-                        st.write("**Jogador:**", data.get("player_name", "N/A"))
-                        st.write("**Oponente:**", data.get("opponent_name", "N/A"))
-                        st.write("**Pontuação:**", data.get("score", "N/A"))
+                        st.write("**Abates:**", data.get("kills", "N/A"))
+                        st.write("**Mortes:**", data.get("deaths", "N/A"))
+                        st.write("**Fama:**", data.get("fame", "N/A"))
 
 # Função para exibir estatísticas gerais
 def display_statistics():
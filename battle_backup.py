@@ -0,0 +1,180 @@
+"""
+Backups incrementais do histórico de batalhas.
+Em vez de copiar o histórico inteiro a cada gravação, registra apenas o delta
+(batalhas adicionadas com seus dados e IDs removidos) em relação ao estado anterior,
+com um checkpoint completo periódico. A restauração carrega o checkpoint e
+reaplica os deltas em ordem.
+"""
+
+import os
+import json
+import gzip
+import shutil
+import logging
+from datetime import datetime
+from battle_store import save_tables, load_tables, filter_tables, concat_tables
+from battle_journal import encode_battles, decode_battles
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MANIFEST_FILE = "backup_manifest.json"  # Índice dos checkpoints e deltas
+
+
+def _manifest_path(backup_dir):
+    return os.path.join(backup_dir, MANIFEST_FILE)
+
+
+def load_manifest(backup_dir):
+    """
+    Carrega o índice de backups. Retorna um índice vazio se ainda não existir.
+    """
+    path = _manifest_path(backup_dir)
+    if not os.path.exists(path):
+        return {'next_seq': 1, 'entries': []}
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _save_manifest(backup_dir, manifest):
+    path = _manifest_path(backup_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _deltas_since_checkpoint(manifest):
+    """
+    Conta os deltas registrados depois do último checkpoint (None se não há checkpoint).
+    """
+    count = 0
+    for entry in reversed(manifest['entries']):
+        if entry['type'] == 'checkpoint':
+            return count
+        count += 1
+    return None
+
+
+def record_backup(tables, added, removed_ids, backup_dir, checkpoint_interval=20, checkpoint=False):
+    """
+    Registra um backup da gravação atual.
+    Grava um checkpoint completo (tables) se não houver nenhum, se já existirem
+    checkpoint_interval deltas desde o último ou se checkpoint for True; caso
+    contrário grava apenas o delta com as batalhas adicionadas (added) e os IDs removidos.
+    tables pode ser uma função que retorna as tabelas, chamada apenas quando
+    um checkpoint é necessário.
+    Retorna a entrada registrada no índice, ou None se não houve mudança.
+    """
+    removed_ids = [int(battle_id) for battle_id in removed_ids]
+    if not checkpoint and added['battles'].empty and not removed_ids:
+        return None
+
+    os.makedirs(backup_dir, exist_ok=True)
+    manifest = load_manifest(backup_dir)
+    seq = manifest['next_seq']
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    deltas = _deltas_since_checkpoint(manifest)
+
+    if checkpoint or deltas is None or deltas >= checkpoint_interval:
+        name = f"checkpoint_{seq:06d}_{timestamp}"
+        if callable(tables):
+            tables = tables()
+        save_tables(tables, os.path.join(backup_dir, name))
+        entry = {'seq': seq, 'type': 'checkpoint', 'file': name, 'time': timestamp,
+                 'battles': len(tables['battles'])}
+    else:
+        name = f"delta_{seq:06d}_{timestamp}.ndjson.gz"
+        header = json.dumps({'seq': seq, 'removed': removed_ids}) + '\n'
+        with gzip.open(os.path.join(backup_dir, name), 'wt') as f:
+            f.write(header)
+            f.write(''.join(encode_battles(added)))
+        entry = {'seq': seq, 'type': 'delta', 'file': name, 'time': timestamp,
+                 'added': len(added['battles']), 'removed': len(removed_ids)}
+
+    manifest['entries'].append(entry)
+    manifest['next_seq'] = seq + 1
+    _save_manifest(backup_dir, manifest)
+
+    logging.info(f"Backup {entry['type']} #{seq} criado: {name}")
+    return entry
+
+
+def _read_delta(path):
+    """
+    Lê um arquivo de delta e retorna (IDs removidos, tabelas adicionadas).
+    """
+    with gzip.open(path, 'rt') as f:
+        header = json.loads(f.readline())
+        added = decode_battles(f, source=path)
+    return header['removed'], added
+
+
+def restore_tables(backup_dir, seq=None):
+    """
+    Reconstrói as tabelas do histórico até o backup seq (o mais recente se None).
+    Carrega o último checkpoint anterior a seq e reaplica os deltas seguintes.
+    Não altera o índice: quem grava o estado restaurado deve registrá-lo como
+    novo checkpoint (record_backup com checkpoint=True), senão os backups
+    seguintes seriam deltas sobre os backups descartados.
+    """
+    manifest = load_manifest(backup_dir)
+    entries = [e for e in manifest['entries'] if seq is None or e['seq'] <= seq]
+
+    checkpoints = [i for i, e in enumerate(entries) if e['type'] == 'checkpoint']
+    if not checkpoints:
+        logging.warning(f"Nenhum checkpoint disponível em {backup_dir}")
+        return None
+
+    start = checkpoints[-1]
+    tables = load_tables(os.path.join(backup_dir, entries[start]['file']))
+    if tables is None:
+        logging.error(f"Checkpoint {entries[start]['file']} não encontrado")
+        return None
+
+    for entry in entries[start + 1:]:
+        removed, added = _read_delta(os.path.join(backup_dir, entry['file']))
+        battles = tables['battles']
+        drop = set(removed) | set(added['battles']['battle_id'].tolist())
+        kept_ids = battles.loc[~battles['battle_id'].isin(drop), 'battle_id']
+        tables = concat_tables(filter_tables(tables, kept_ids), added)
+
+    tables['battles'] = tables['battles'].sort_values('time', ascending=False, kind='stable').reset_index(drop=True)
+    logging.info(f"Backup restaurado até #{entries[-1]['seq']}: {len(tables['battles'])} batalhas")
+    return tables
+
+
+def prune_backups(backup_dir, max_checkpoints=2):
+    """
+    Remove checkpoints antigos e os deltas que dependem deles,
+    mantendo apenas os max_checkpoints mais recentes.
+    """
+    manifest = load_manifest(backup_dir)
+    entries = manifest['entries']
+    checkpoints = [i for i, e in enumerate(entries) if e['type'] == 'checkpoint']
+
+    if len(checkpoints) <= max_checkpoints:
+        return
+
+    first_kept = checkpoints[-max_checkpoints]
+    for entry in entries[:first_kept]:
+        path = os.path.join(backup_dir, entry['file'])
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            logging.info(f"Backup antigo removido: {path}")
+        except Exception as e:
+            logging.error(f"Erro ao remover backup: {e}")
+
+    manifest['entries'] = entries[first_kept:]
+    _save_manifest(backup_dir, manifest)
+
+
+def list_backups(backup_dir):
+    """
+    Retorna as entradas do índice de backups, da mais antiga para a mais recente.
+    """
+    return load_manifest(backup_dir)['entries']
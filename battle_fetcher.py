@@ -0,0 +1,230 @@
+"""
+Busca concorrente na API do Albion Online: detalhes de batalhas (/battles/{id})
+e listagem paginada das batalhas de uma guild (/battles?offset=&limit=).
+Usa asyncio com as requisições do cliente compartilhado (api_client) executadas em
+threads, limitando o número de requisições simultâneas.
+Falhas temporárias são repetidas com espera exponencial e jitter aleatório
+(ou pelo tempo do Retry-After), e o cliente limita a taxa por host.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone, timedelta
+import requests
+from api_client import api_get_async
+from rate_limiter import backoff_delay
+from ingest_log import summarize
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes
+FETCH_CONCURRENCY = 8  # Requisições simultâneas
+FETCH_TIMEOUT = 30  # Timeout de cada requisição (segundos)
+FETCH_MAX_ATTEMPTS = 3  # Tentativas por batalha
+FETCH_RETRY_DELAY = 2  # Espera base entre tentativas (segundos), dobrada a cada tentativa
+LIST_PAGE_SIZE = 51  # Batalhas por página da listagem (máximo aceito pela API)
+LIST_PAGES_IN_FLIGHT = 3  # Páginas da listagem buscadas ao mesmo tempo
+LIST_MAX_PAGES = 40  # Limite de segurança de páginas por listagem
+
+
+class ListingError(Exception):
+    """
+    Uma página da listagem não pôde ser obtida; a listagem ficou incompleta.
+    """
+
+
+async def _get_json(url, params, timeout):
+    """
+    Requisição pelo cliente compartilhado.
+    Retorna o JSON, ou None se o recurso não existir (404).
+    """
+    response = await api_get_async(url, params=params, timeout=timeout)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+async def _fetch_json(url, params, semaphore, is_valid, label, timeout=FETCH_TIMEOUT,
+                      max_attempts=FETCH_MAX_ATTEMPTS, delay=FETCH_RETRY_DELAY):
+    """
+    Busca um JSON respeitando o semáforo, repetindo falhas e respostas para as quais
+    is_valid(data) é falso. Retorna o JSON, ou None se não foi possível obtê-lo.
+    """
+    for attempt in range(max_attempts):
+        response = None
+        try:
+            async with semaphore:
+                data = await asyncio.wait_for(_get_json(url, params, timeout), timeout + 5)
+
+            if data is None:
+                logging.warning("%s não encontrada", label)
+                return None
+
+            if is_valid(data):
+                logging.debug("%s: %s", label, summarize(data))
+                return data
+
+            logging.warning("Resposta para %s não possui o formato esperado", label)
+
+        except (asyncio.TimeoutError, requests.exceptions.Timeout):
+            logging.warning("Timeout ao buscar %s, tentativa %s/%s", label, attempt+1, max_attempts)
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            response = getattr(e, 'response', None)
+            logging.error("Erro ao buscar %s, tentativa %s/%s: %s", label, attempt+1, max_attempts, e)
+
+        if attempt < max_attempts - 1:
+            await asyncio.sleep(backoff_delay(attempt, delay, response))
+
+    return None
+
+
+async def fetch_battle(battle_id, semaphore, base_url=None, timeout=FETCH_TIMEOUT,
+                       max_attempts=FETCH_MAX_ATTEMPTS, delay=FETCH_RETRY_DELAY):
+    """
+    Busca uma batalha pelo ID, respeitando o semáforo de concorrência.
+    Retorna o JSON bruto da batalha, ou None se não foi possível obtê-la.
+    """
+    url = f"{base_url}/battles/{battle_id}" if base_url else f"battles/{battle_id}"
+    return await _fetch_json(url, None, semaphore, lambda data: isinstance(data, dict) and 'id' in data,
+                             f"batalha ID {battle_id}", timeout, max_attempts, delay)
+
+
+async def fetch_battles(battle_ids, concurrency=FETCH_CONCURRENCY, base_url=None, timeout=FETCH_TIMEOUT,
+                        max_attempts=FETCH_MAX_ATTEMPTS, delay=FETCH_RETRY_DELAY):
+    """
+    Iterador assíncrono que busca as batalhas concorrentemente e entrega o JSON
+    bruto de cada uma assim que fica pronto (não na ordem dos IDs).
+    Batalhas que não puderam ser obtidas são omitidas.
+
+    Exemplo:
+        async for battle in fetch_battles(ids):
+            ...
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(fetch_battle(battle_id, semaphore, base_url, timeout, max_attempts, delay))
+             for battle_id in dict.fromkeys(str(battle_id) for battle_id in battle_ids)]
+
+    try:
+        for finished in asyncio.as_completed(tasks):
+            battle_data = await finished
+            if battle_data is not None:
+                yield battle_data
+    finally:
+        # Se o consumidor parar antes do fim, cancelar as buscas pendentes
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _listing_range(days):
+    """
+    Valor do parâmetro range da listagem que cobre o número de dias.
+    """
+    if days > 14:
+        return "month"
+    if days > 7:
+        return "2weeks"
+    return "week"
+
+
+def _battle_time(battle):
+    return datetime.fromisoformat(battle['startTime'].replace('Z', '+00:00'))
+
+
+async def list_guild_battles(guild_id, days=7, since=None, page_size=LIST_PAGE_SIZE,
+                             pages_in_flight=LIST_PAGES_IN_FLIGHT, max_pages=LIST_MAX_PAGES, base_url=None,
+                             timeout=FETCH_TIMEOUT, max_attempts=FETCH_MAX_ATTEMPTS, delay=FETCH_RETRY_DELAY):
+    """
+    Iterador assíncrono sobre as batalhas da guild nos últimos days dias, mais recentes primeiro.
+    Percorre a listagem em páginas de page_size (offset crescente), com até pages_in_flight
+    páginas sendo buscadas ao mesmo tempo, e entrega as batalhas de cada página assim que
+    ela chega (em ordem de offset). Para na primeira página incompleta, ao encontrar uma
+    batalha anterior ao corte (days, ou since se for mais recente) ou após max_pages páginas.
+    Lança ListingError se uma página falhar depois de todas as tentativas.
+    """
+    url = f"{base_url}/battles" if base_url else "battles"
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    if since is not None:
+        cutoff = max(cutoff, since)
+    semaphore = asyncio.Semaphore(pages_in_flight)
+
+    def fetch_page(page):
+        params = {'range': _listing_range(days), 'offset': page * page_size, 'limit': page_size,
+                  'sort': 'recent', 'guildId': guild_id}
+        return asyncio.create_task(_fetch_json(url, params, semaphore, lambda data: isinstance(data, list),
+                                               f"página {page + 1} da listagem", timeout, max_attempts, delay))
+
+    pending = {}
+    next_page = 0
+    try:
+        for page in range(max_pages):
+            # Manter pages_in_flight páginas à frente da que está sendo entregue
+            while next_page < max_pages and next_page < page + pages_in_flight:
+                pending[next_page] = fetch_page(next_page)
+                next_page += 1
+
+            battles = await pending.pop(page)
+            if battles is None:
+                raise ListingError(f"Listagem interrompida na página {page + 1}")
+
+            reached_cutoff = False
+            for battle in battles:
+                if _battle_time(battle) < cutoff:
+                    reached_cutoff = True
+                    continue
+                yield battle
+
+            logging.info("Listagem: página %s com %s batalhas", page + 1, len(battles))
+            if reached_cutoff or len(battles) < page_size:
+                return
+    finally:
+        # Páginas buscadas além do fim da listagem são descartadas
+        for task in pending.values():
+            task.cancel()
+        await asyncio.gather(*pending.values(), return_exceptions=True)
+
+
+def iterate_sync(async_iterator):
+    """
+    Consome um iterador assíncrono a partir de código síncrono, item a item.
+    As requisições continuam em andamento (nas threads) enquanto o chamador
+    processa cada item, então o resultado chega em fluxo, não ao final.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(async_iterator.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(async_iterator.aclose())
+        loop.run_until_complete(loop.shutdown_default_executor())
+        loop.close()
+
+
+def fetch_battles_sync(battle_ids, **kwargs):
+    """
+    Versão síncrona de fetch_battles para código não assíncrono (ex.: Streamlit).
+    Retorna a lista de batalhas obtidas, na ordem em que ficaram prontas.
+    """
+    async def collect():
+        return [battle async for battle in fetch_battles(battle_ids, **kwargs)]
+
+    return asyncio.run(collect())
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # Uso: python battle_fetcher.py <id> [<id> ...]
+    # Com ALBION_API_BASE_URL=http://127.0.0.1:8000 usa o servidor stub (stub_api_server.py)
+    start = time.perf_counter()
+    battles = fetch_battles_sync(sys.argv[1:])
+    for battle in battles:
+        print(f"{battle['id']}: {battle.get('startTime')} - {len(battle.get('players', {}))} jogadores")
+    print(f"{len(battles)}/{len(sys.argv[1:])} batalhas em {time.perf_counter() - start:.2f}s")
@@ -4,44 +4,402 @@ Provê funções para salvar batalhas novas, evitar duplicação e recuperar dad
 """
 
 import pandas as pd
+import numpy as np
 import json
 import os
 import logging
 from datetime import datetime, timedelta
+from battle_store import (TABLE_NAMES, PARTITION_MANIFEST, flatten_history, build_history_frame, filter_tables,
+                          concat_tables, empty_tables, load_tables, remove_tables, load_manifest,
+                          split_by_partition, save_partitions, load_partitions)
+from battle_journal import append_battles, read_journal, truncate_journal, journal_length
+from battle_backup import record_backup, restore_tables, prune_backups, list_backups
+from history_cache import VersionedCache
+from battle_index import (INDEX_FILE, BLOOM_FILE, BloomFilter, build_index, load_index, save_index,
+                          add_ids, remove_ids, contains)
+import battle_sqlite
+from name_dictionary import name_mask
+from dimensions import assign_keys, load_dimension
+from battle_sides import (SIDE_ALLIANCE, DEFAULT_PERSPECTIVE, assign_sides, store_sides, fill_sides,
+                          classify_sides, resolve_perspective)
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Constantes
-HISTORY_FILE = "battle_history.json"  # Arquivo principal de histórico
+HISTORY_FILE = "battle_history.json"  # Arquivo legado de histórico (JSON aninhado)
+STORE_DIR = "battle_store"  # Diretório do armazenamento colunar particionado por dia
+JOURNAL_FILE = os.path.join(STORE_DIR, "journal.ndjson")  # Batalhas novas ainda não compactadas
+JOURNAL_COMPACT_THRESHOLD = 200  # Compactar o journal quando atingir este número de batalhas
 BACKUP_DIR = "backups"  # Diretório para backups regulares
+BACKUP_CHECKPOINT_INTERVAL = 20  # Deltas entre dois checkpoints completos
+MAX_BACKUP_CHECKPOINTS = 2  # Checkpoints (e respectivos deltas) mantidos
 MAX_HISTORY_DAYS = 90  # Armazenar até 90 dias de histórico
+HISTORY_BACKEND = os.environ.get("BATTLE_HISTORY_BACKEND", "columnar")  # "columnar" ou "sqlite"
+SQLITE_DB = os.path.join(STORE_DIR, "battle_history.db")  # Banco usado pelo backend "sqlite"
+ID_INDEX_FILE = os.path.join(STORE_DIR, f"{HISTORY_BACKEND}_{INDEX_FILE}")  # Índice dos IDs já armazenados (por backend)
+ID_BLOOM_FILE = os.path.join(STORE_DIR, f"{HISTORY_BACKEND}_{BLOOM_FILE}")  # Filtro de Bloom na frente do índice
+BLOOM_ERROR_RATE = 0.01  # Taxa de falsos positivos do filtro de Bloom
 
-def load_battle_history():
+HISTORY_CACHE_ENTRIES = 16  # Resultados de leitura mantidos no cache do processo
+
+_sqlite_migrated = False  # Migração para o SQLite já verificada neste processo
+_history_cache = VersionedCache(max_entries=HISTORY_CACHE_ENTRIES)
+
+def _load_legacy_history():
+    """
+    Lê o arquivo JSON legado e retorna o DataFrame aninhado.
+    """
+    with open(HISTORY_FILE, 'r') as f:
+        history_data = json.load(f)
+
+    df = pd.DataFrame(history_data)
+    if not df.empty and 'time' in df.columns:
+        df['time'] = pd.to_datetime(df['time'], utc=True)
+    return df
+
+def _write_base(tables):
+    """
+    Grava as tabelas como snapshot base completo, uma partição por dia,
+    removendo as partições que deixaram de existir.
+    """
+    partitions = split_by_partition(tables)
+    manifest = load_manifest(STORE_DIR)
+    stale = [key for key in (manifest or {}).get('partitions', {}) if key not in partitions]
+    save_partitions(partitions, STORE_DIR, drop_keys=stale)
+
+def _ensure_partitioned():
+    """
+    Garante que o snapshot base esteja particionado, migrando o layout anterior
+    (tabelas únicas em STORE_DIR) ou o arquivo JSON legado na primeira execução.
+    Retorna o manifesto de partições, ou None se não houver histórico.
+    """
+    manifest = load_manifest(STORE_DIR)
+    if manifest is not None:
+        return manifest
+
+    tables = load_tables(STORE_DIR)
+    if tables is not None:
+        logging.info(f"Particionando histórico existente em {STORE_DIR}")
+    elif os.path.exists(HISTORY_FILE):
+        logging.info(f"Migrando histórico legado {HISTORY_FILE} para {STORE_DIR}")
+        tables = flatten_history(_load_legacy_history())
+    else:
+        logging.info("Arquivo de histórico não encontrado. Criando novo histórico.")
+        return None
+
+    _write_base(tables)
+    remove_tables(STORE_DIR)
+    return load_manifest(STORE_DIR)
+
+def _load_base_tables(since=None, tables=TABLE_NAMES):
+    """
+    Carrega o snapshot base do armazenamento colunar.
+    Com since, lê apenas as partições que se sobrepõem ao período.
+    """
+    if _ensure_partitioned() is None:
+        return {name: empty_tables()[name] for name in tables}
+
+    return load_partitions(STORE_DIR, since=since, tables=tables)
+
+def _merge_journal(base, journal):
+    """
+    Combina o snapshot base com as batalhas do journal.
+    Batalhas do journal que já estão no snapshot (compactação interrompida) são ignoradas.
+    """
+    if journal['battles'].empty:
+        return base
+
+    new_ids = journal['battles'].loc[~journal['battles']['battle_id'].isin(base['battles']['battle_id']), 'battle_id']
+    merged = concat_tables(base, filter_tables(journal, new_ids))
+    merged['battles'] = merged['battles'].sort_values('time', ascending=False, kind='stable').reset_index(drop=True)
+    return merged
+
+def _use_sqlite():
+    """
+    Indica se o backend SQLite está ativo, migrando o histórico existente na primeira vez.
+    """
+    global _sqlite_migrated
+    if HISTORY_BACKEND != "sqlite":
+        return False
+
+    if not _sqlite_migrated:
+        if battle_sqlite.battle_count(SQLITE_DB) == 0:
+            tables = _merge_journal(_load_base_tables(), read_journal(JOURNAL_FILE))
+            if not tables['battles'].empty:
+                logging.info(f"Migrando {len(tables['battles'])} batalhas para {SQLITE_DB}")
+                battle_sqlite.insert_tables(SQLITE_DB, tables)
+        _sqlite_migrated = True
+
+    return True
+
+def _file_version(path):
     """
-    Carrega o histórico de batalhas do arquivo.
-    Retorna um DataFrame vazio se o arquivo não existir.
+    Retorna (mtime, tamanho) do arquivo, ou None se ele não existir.
     """
     try:
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, 'r') as f:
-                history_data = json.load(f)
-            
-            # Converter para DataFrame
-            df = pd.DataFrame(history_data)
-            
-            # Converter coluna de tempo para datetime
-            if not df.empty and 'time' in df.columns:
-                df['time'] = pd.to_datetime(df['time'])
-            
-            logging.info(f"Carregado histórico com {len(df)} batalhas")
-            return df
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+def _store_version():
+    """
+    Retorna a versão atual do armazenamento (mtime e tamanho dos arquivos que mudam
+    a cada gravação), usada para invalidar o cache quando outro processo grava.
+    """
+    if HISTORY_BACKEND == "sqlite":
+        paths = [SQLITE_DB, SQLITE_DB + "-wal"]
+    else:
+        paths = [os.path.join(STORE_DIR, PARTITION_MANIFEST), JOURNAL_FILE, HISTORY_FILE]
+
+    return (HISTORY_BACKEND, tuple(_file_version(path) for path in paths))
+
+def invalidate_history_cache():
+    """
+    Descarta o cache do histórico (chamado após cada gravação).
+    """
+    _history_cache.invalidate()
+
+def _read_battle_tables(since, tables):
+    """
+    Lê as tabelas do armazenamento, sem passar pelo cache.
+    """
+    if _use_sqlite():
+        if since is None:
+            loaded = battle_sqlite.query_all(SQLITE_DB)
         else:
-            logging.info("Arquivo de histórico não encontrado. Criando novo histórico.")
-            return pd.DataFrame()
+            loaded = battle_sqlite.query_since(SQLITE_DB, since)
+        loaded = {name: loaded[name] for name in tables}
+    else:
+        journal = read_journal(JOURNAL_FILE)
+        loaded = _merge_journal(_load_base_tables(since, tables),
+                                {name: journal[name] for name in tables})
+        if since is not None:
+            battles = loaded['battles']
+            loaded = filter_tables(loaded, battles.loc[battles['time'] >= since, 'battle_id'])
+    loaded = fill_sides(loaded)
+    logging.info(f"Carregado histórico com {len(loaded['battles'])} batalhas")
+    return loaded
+
+def load_battle_tables(since=None, tables=TABLE_NAMES, perspective=None):
+    """
+    Carrega o histórico como tabelas colunares tipadas (battles, guilds, players).
+    Combina o snapshot base com o journal de batalhas ainda não compactadas
+    (ou lê do banco, com o backend SQLite).
+    Com since, retorna apenas as batalhas a partir desse instante, lendo só as
+    partições necessárias. Retorna tabelas vazias se não houver histórico.
+    Com perspective (battle_sides.Perspective), o lado das guilds (coluna side)
+    é o desse ponto de vista em vez do gravado na ingestão.
+    O resultado fica em cache até a próxima gravação e é compartilhado entre os
+    chamadores: não deve ser modificado.
+    """
+    tables = tuple(tables)
+    try:
+        if perspective is not None and perspective != DEFAULT_PERSPECTIVE and 'guilds' in tables:
+            return _history_cache.get(('tables', since, tables, perspective), _store_version(),
+                                      lambda: assign_sides(load_battle_tables(since, tables), perspective))
+        return _history_cache.get(('tables', since, tables), _store_version(),
+                                  lambda: _read_battle_tables(since, tables))
     except Exception as e:
         logging.error(f"Erro ao carregar histórico: {e}")
-        return pd.DataFrame()
+        return {name: empty_tables()[name] for name in tables}
+
+def load_battle_history(perspective=None):
+    """
+    Carrega o histórico de batalhas do armazenamento colunar.
+    Retorna o DataFrame no formato aninhado (coluna details) usado pelos componentes,
+    ou um DataFrame vazio se não houver histórico. Com perspective, os lados das
+    guilds são os desse ponto de vista (ver load_battle_tables).
+    O resultado fica em cache até a próxima gravação e não deve ser modificado.
+    """
+    return _history_cache.get(('history', None, perspective), _store_version(),
+                              lambda: build_history_frame(load_battle_tables(perspective=perspective)))
+
+def _guild_rows(battle_ids):
+    """
+    Linhas da tabela de guilds das batalhas informadas (todas as guilds de cada batalha).
+    """
+    if _use_sqlite():
+        return battle_sqlite.query_by_ids(SQLITE_DB, battle_ids)['guilds']
+    guilds = load_battle_tables()['guilds']
+    return guilds.loc[guilds['battle_id'].isin(battle_ids)]
+
+def get_battles_from_perspective(battles_df, guild_name, alliance_name=None):
+    """
+    As batalhas de battles_df com os lados das guilds (stats['side']) do ponto de
+    vista da guild e da aliança informadas pelo nome (ver battle_sides.resolve_perspective).
+    Para o ponto de vista configurado retorna battles_df; para os demais, os lados
+    são recalculados só para as batalhas de battles_df, a partir das linhas delas
+    na tabela de guilds. Os detalhes são copiados; as listas de jogadores, compartilhadas.
+    """
+    perspective = resolve_perspective(guild_name, alliance_name)
+    if battles_df.empty or perspective == DEFAULT_PERSPECTIVE:
+        return battles_df
+
+    battle_ids = battles_df['battle_id'].drop_duplicates().tolist()
+    guilds = _guild_rows(battle_ids)
+    if guilds.empty:
+        return battles_df
+    sides = dict(zip(zip(guilds['battle_id'].tolist(), guilds['guild'].tolist()),
+                     classify_sides(guilds, perspective).tolist()))
+
+    def with_sides(battle_id, details):
+        battle_guilds = {}
+        for guild, stats in details['guilds'].items():
+            side = sides.get((battle_id, guild))
+            if side is None:
+                battle_guilds[guild] = stats
+                continue
+            stats = {key: value for key, value in stats.items() if key != 'alliance'}
+            stats['side'] = side
+            if side == SIDE_ALLIANCE:
+                stats['alliance'] = True
+            battle_guilds[guild] = stats
+        return dict(details, guilds=battle_guilds)
+
+    result = battles_df.copy()
+    result['details'] = [with_sides(battle_id, details) for battle_id, details
+                         in zip(battles_df['battle_id'].tolist(), battles_df['details'])]
+    return result
+
+def _read_battle_index():
+    """
+    Lê o índice de IDs do disco, reconstruindo-o a partir do histórico se não existir.
+    """
+    index = load_index(ID_INDEX_FILE)
+    if index is None:
+        index = build_index(load_battle_tables(tables=('battles',))['battles']['battle_id'])
+        save_index(index, ID_INDEX_FILE)
+        logging.info(f"Índice de batalhas reconstruído com {len(index)} IDs")
+    return index
+
+def known_battle_ids():
+    """
+    Retorna o array int64 ordenado com os IDs das batalhas do histórico.
+    Fica em cache até a próxima gravação e não deve ser modificado.
+    """
+    return _history_cache.get(('battle_ids',), (_store_version(), _file_version(ID_INDEX_FILE)),
+                              _read_battle_index)
+
+def _read_battle_filter():
+    """
+    Lê o filtro de Bloom do disco, reconstruindo-o a partir do índice se não existir
+    ou se estiver saturado.
+    """
+    bloom = BloomFilter.load(ID_BLOOM_FILE)
+    if bloom is None or bloom.saturated:
+        bloom = BloomFilter.from_ids(known_battle_ids(), BLOOM_ERROR_RATE)
+        bloom.save(ID_BLOOM_FILE)
+        logging.info(f"Filtro de Bloom reconstruído para {bloom.count} IDs")
+    return bloom
+
+def _battle_filter():
+    """
+    Retorna o filtro de Bloom dos IDs do histórico (em cache até a próxima gravação).
+    """
+    return _history_cache.get(('battle_filter',), (_store_version(), _file_version(ID_BLOOM_FILE)),
+                              _read_battle_filter)
+
+def known_battles_mask(battle_ids):
+    """
+    Retorna um array booleano indicando quais IDs já estão no histórico.
+    O filtro de Bloom responde os IDs certamente novos; só os demais
+    são confirmados por busca binária no índice (carregado apenas se necessário).
+    """
+    ids = np.asarray([int(battle_id) for battle_id in battle_ids], dtype=np.int64)
+    known = np.zeros(len(ids), dtype=bool)
+    if len(ids) == 0:
+        return known
+
+    maybe = _battle_filter().might_contain(ids)
+    if maybe.any():
+        known[maybe] = contains(known_battle_ids(), ids[maybe])
+    return known
+
+def _write_battle_index(battle_ids):
+    """
+    Regrava o índice de IDs e o filtro de Bloom com exatamente os IDs informados.
+    """
+    try:
+        index = build_index(battle_ids)
+        save_index(index, ID_INDEX_FILE)
+        BloomFilter.from_ids(index, BLOOM_ERROR_RATE).save(ID_BLOOM_FILE)
+    except Exception as e:
+        logging.error(f"Erro ao gravar índice de batalhas: {e}")
+        _discard_battle_index()
+
+def _update_battle_index(added_ids=(), removed_ids=()):
+    """
+    Atualiza o índice de IDs e o filtro de Bloom após uma gravação no histórico.
+    O filtro só recebe acréscimos; IDs removidos permanecem nele até a reconstrução.
+    """
+    try:
+        index = remove_ids(add_ids(known_battle_ids(), added_ids), removed_ids)
+        save_index(index, ID_INDEX_FILE)
+
+        # Ler do disco em vez de usar o filtro em cache, que é compartilhado
+        bloom = BloomFilter.load(ID_BLOOM_FILE)
+        if bloom is not None:
+            bloom.add(added_ids)
+        if bloom is None or bloom.saturated:
+            bloom = BloomFilter.from_ids(index, BLOOM_ERROR_RATE)
+        bloom.save(ID_BLOOM_FILE)
+    except Exception as e:
+        logging.error(f"Erro ao atualizar índice de batalhas: {e}")
+        _discard_battle_index()
+
+def _discard_battle_index():
+    """
+    Remove o índice de IDs e o filtro de Bloom, que serão reconstruídos na próxima consulta.
+    """
+    for path in (ID_INDEX_FILE, ID_BLOOM_FILE):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def iter_unseen_battles(raw_battles, batch_size=256):
+    """
+    Gera apenas as batalhas brutas (no formato da API) que ainda não estão no histórico
+    e que estão dentro da retenção de MAX_HISTORY_DAYS, antes de qualquer processamento.
+    As batalhas são verificadas em lotes de batch_size contra o filtro de Bloom e o índice.
+    Em uma atualização sem batalhas novas quase nada chega à etapa de normalização.
+    """
+    cutoff = _cutoff(MAX_HISTORY_DAYS)
+    skipped = 0
+    batch = []
+
+    def flush():
+        nonlocal skipped
+        known = known_battles_mask([battle_id for battle_id, _ in batch])
+        skipped += int(known.sum())
+        unseen = [battle for (_, battle), is_known in zip(batch, known) if not is_known]
+        batch.clear()
+        return unseen
+
+    for battle in raw_battles:
+        try:
+            battle_id = int(battle['id'])
+            battle_time = datetime.fromisoformat(battle['startTime'].replace('Z', '+00:00'))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            # Deixar o processamento registrar o erro da batalha malformada
+            yield battle
+            continue
+
+        if battle_time < cutoff:
+            skipped += 1
+            continue
+
+        batch.append((battle_id, battle))
+        if len(batch) >= batch_size:
+            yield from flush()
+
+    if batch:
+        yield from flush()
+
+    if skipped:
+        logging.info(f"{skipped} batalhas já conhecidas ou fora da retenção ignoradas antes do processamento")
 
 def datetime_converter(obj):
     """
@@ -51,69 +409,140 @@ def datetime_converter(obj):
         return obj.isoformat()
     raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
 
+def backup_battle_changes(tables, added, removed_ids):
+    """
+    Registra no diretório de backups o delta da gravação atual
+    (ou um checkpoint completo, quando for a vez).
+    """
+    try:
+        record_backup(tables, added, removed_ids, BACKUP_DIR,
+                      checkpoint_interval=BACKUP_CHECKPOINT_INTERVAL)
+        cleanup_old_backups()
+    except Exception as e:
+        logging.error(f"Erro ao criar backup: {e}")
+
+def save_battle_tables(tables, previous_ids=None):
+    """
+    Salva as tabelas colunares do histórico como novo snapshot base.
+    Registra um backup incremental com as diferenças em relação ao estado anterior
+    e esvazia o journal, já que as tabelas informadas representam o histórico completo.
+    """
+    try:
+        if previous_ids is None:
+            previous_ids = load_battle_tables()['battles']['battle_id']
+
+        if _use_sqlite():
+            battle_sqlite.replace_tables(SQLITE_DB, tables)
+        else:
+            _write_base(tables)
+            truncate_journal(JOURNAL_FILE)
+        invalidate_history_cache()
+        _write_battle_index(tables['battles']['battle_id'])
+        logging.info(f"Histórico salvo com {len(tables['battles'])} batalhas")
+
+        # Backup incremental: batalhas adicionadas e IDs removidos
+        battle_ids = tables['battles']['battle_id']
+        added_ids = battle_ids[~battle_ids.isin(previous_ids)]
+        removed_ids = previous_ids[~previous_ids.isin(battle_ids)]
+        backup_battle_changes(tables, filter_tables(tables, added_ids), removed_ids.tolist())
+
+        return True
+    except Exception as e:
+        logging.error(f"Erro ao salvar histórico: {e}")
+        return False
+
 def save_battle_history(history_df):
     """
-    Salva o histórico de batalhas no arquivo principal.
-    Faz um backup se o arquivo já existir.
+    Salva o histórico de batalhas (formato aninhado) no armazenamento colunar.
+    """
+    return save_battle_tables(flatten_history(history_df))
+
+def history_to_records(history_df):
     """
+    Converte o DataFrame aninhado em lista de dicionários serializáveis em JSON.
+    """
+    records = []
+    for record in history_df.to_dict('records'):
+        if isinstance(record.get('time'), datetime):
+            record['time'] = record['time'].isoformat()
+        details = record.get('details')
+        if isinstance(details, dict) and isinstance(details.get('time'), datetime):
+            record['details'] = dict(details, time=details['time'].isoformat())
+        records.append(record)
+    return records
+
+def _cutoff(days):
+    """
+    Retorna o instante (UTC) de corte para uma janela de dias.
+    Arredondado ao minuto para que consultas repetidas reaproveitem o cache.
+    """
+    return pd.Timestamp.now(tz='UTC').floor('min') - pd.Timedelta(days=days)
+
+def compact_battle_history():
+    """
+    Incorpora o journal ao snapshot base e aplica a retenção de MAX_HISTORY_DAYS.
+    Só as partições que recebem batalhas do journal são regravadas; a retenção
+    descarta partições inteiras cujas batalhas são todas anteriores ao corte.
+    Com o backend SQLite apenas remove as batalhas fora da retenção.
+    Retorna True se a compactação foi concluída.
+    """
+    cutoff = _cutoff(MAX_HISTORY_DAYS)
+    
+    if _use_sqlite():
+        removed_ids = battle_sqlite.delete_before(SQLITE_DB, cutoff)
+        invalidate_history_cache()
+        _update_battle_index(removed_ids=removed_ids)
+        logging.info(f"Retenção aplicada: {len(removed_ids)} batalhas removidas")
+        backup_battle_changes(lambda: battle_sqlite.query_all(SQLITE_DB), empty_tables(), removed_ids)
+        return True
+    
     try:
-        # Garantir que o diretório de backup exista
-        if not os.path.exists(BACKUP_DIR):
-            os.makedirs(BACKUP_DIR)
-            
-        # Backup do arquivo atual se existir
-        if os.path.exists(HISTORY_FILE):
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = os.path.join(BACKUP_DIR, f"battle_history_{timestamp}.json")
-            
-            # Copiar arquivo atual para backup
-            with open(HISTORY_FILE, 'r') as src:
-                with open(backup_file, 'w') as dst:
-                    dst.write(src.read())
-            
-            logging.info(f"Backup criado: {backup_file}")
+        manifest = _ensure_partitioned() or {'partitions': {}}
+        journal = read_journal(JOURNAL_FILE)
         
-        # Criar uma cópia profunda para conversão
-        history_data = []
-        for _, row in history_df.iterrows():
-            # Converter campos problemáticos explicitamente
-            battle_record = row.to_dict()
+        # Partições inteiras fora da retenção
+        expired = [key for key, info in manifest['partitions'].items()
+                   if pd.Timestamp(info['max_time']) < cutoff]
+        removed = load_partitions(STORE_DIR, keys=expired, tables=('battles',))['battles']['battle_id'].tolist()
+        
+        # Regravar apenas as partições tocadas pelo journal
+        updated_partitions = {}
+        added_ids = []
+        for key, part in split_by_partition(journal).items():
+            if part['battles']['time'].max() < cutoff:
+                removed.extend(part['battles']['battle_id'].tolist())
+                continue
             
-            # Converter o campo time para string ISO
-            if 'time' in battle_record and isinstance(battle_record['time'], datetime):
-                battle_record['time'] = battle_record['time'].isoformat()
-                
-            # Processar campos aninhados em details
-            if 'details' in battle_record and isinstance(battle_record['details'], dict):
-                if 'time' in battle_record['details'] and isinstance(battle_record['details']['time'], datetime):
-                    battle_record['details']['time'] = battle_record['details']['time'].isoformat()
-                    
-                # Processar guilds e seus jogadores
-                if 'guilds' in battle_record['details']:
-                    for guild_name, guild_stats in battle_record['details']['guilds'].items():
-                        # Aqui não há campos datetime, mas caso seja adicionado no futuro, 
-                        # podemos adicionar conversão adicional
-                        pass
+            if key in manifest['partitions'] and key not in expired:
+                existing = load_partitions(STORE_DIR, keys=[key])
+            else:
+                existing = empty_tables()
             
-            history_data.append(battle_record)
-        
-        # Salvar arquivo principal com conversor personalizado
-        with open(HISTORY_FILE, 'w') as f:
-            json.dump(history_data, f, default=datetime_converter, indent=2)
+            part_battles = part['battles']
+            new_ids = part_battles.loc[~part_battles['battle_id'].isin(existing['battles']['battle_id']), 'battle_id']
+            merged = fill_sides(concat_tables(existing, filter_tables(part, new_ids)), stored=True)
+            merged['battles'] = merged['battles'].sort_values('time', ascending=False, kind='stable').reset_index(drop=True)
+            updated_partitions[key] = merged
+            added_ids.extend(new_ids.tolist())
         
-        logging.info(f"Histórico salvo com {len(history_df)} batalhas")
-        
-        # Limpar backups antigos
-        cleanup_old_backups()
+        save_partitions(updated_partitions, STORE_DIR, drop_keys=expired)
+        truncate_journal(JOURNAL_FILE)
+        invalidate_history_cache()
+        _update_battle_index(removed_ids=removed)
+        logging.info(f"Histórico compactado: {len(updated_partitions)} partições regravadas, "
+                     f"{len(expired)} partições removidas pela retenção")
         
+        backup_battle_changes(load_battle_tables, filter_tables(journal, added_ids), removed)
         return True
     except Exception as e:
-        logging.error(f"Erro ao salvar histórico: {e}")
+        logging.error(f"Erro ao compactar histórico: {e}")
         return False
 
 def update_battle_history(new_battles_df):
     """
     Atualiza o histórico com novas batalhas, evitando duplicação.
+    As novas batalhas são acrescentadas ao journal; o snapshot só é reescrito
+    na compactação, quando o journal atinge JOURNAL_COMPACT_THRESHOLD batalhas.
     Retorna o histórico atualizado.
     """
     if new_battles_df.empty:
@@ -127,75 +556,171 @@ def update_battle_history(new_battles_df):
             logging.error(f"Coluna obrigatória ausente nas novas batalhas: {col}")
             return load_battle_history()
     
-    # Carregar histórico atual
-    history_df = load_battle_history()
+    return update_battle_tables(flatten_history(new_battles_df))
+
+def update_battle_tables(new_tables):
+    """
+    Como update_battle_history, mas recebe as batalhas novas já nas três tabelas
+    planas (ex.: geradas por battle_normalizer), sem passar pelo formato aninhado.
+    Retorna o histórico atualizado.
+    """
+    if new_tables['battles'].empty:
+        logging.info("Nenhuma nova batalha para adicionar ao histórico")
+        return load_battle_history()
     
-    # Se não houver histórico, simplesmente usar as novas batalhas
-    if history_df.empty:
-        logging.info(f"Iniciando novo histórico com {len(new_battles_df)} batalhas")
-        save_battle_history(new_battles_df)
-        return new_battles_df
-    
-    # Verificar batalhas duplicadas
-    if 'battle_id' in history_df.columns:
-        existing_ids = set(history_df['battle_id'].astype(str))
-        new_battles_ids = set(new_battles_df['battle_id'].astype(str))
-        
-        # Filtrar apenas batalhas que não existem no histórico
-        unique_battles = new_battles_df[~new_battles_df['battle_id'].astype(str).isin(existing_ids)]
-        
-        if len(unique_battles) == 0:
+    # Filtrar apenas batalhas que não existem no histórico (filtro de Bloom + índice de IDs),
+    # sem carregar o histórico
+    new_ids = new_tables['battles']['battle_id'].drop_duplicates()
+    unique_ids = new_ids[~known_battles_mask(new_ids)]
+    
+    if len(unique_ids) == 0:
+        logging.info("Todas as batalhas já existem no histórico")
+        return load_battle_history()
+    
+    unique_tables = filter_tables(new_tables, unique_ids)
+    
+    # Chaves de dimensão (jogador, guild, aliança) a partir dos IDs da API
+    try:
+        unique_tables = assign_keys(unique_tables)
+    except Exception as e:
+        logging.error(f"Erro ao atualizar as dimensões: {e}")
+    
+    # Lado de cada guild (própria, aliança, inimiga) do ponto de vista configurado
+    unique_tables = store_sides(unique_tables)
+    
+    # Backend SQLite: inserir apenas as batalhas novas e aplicar a retenção no banco
+    if _use_sqlite():
+        inserted_ids = battle_sqlite.insert_tables(SQLITE_DB, unique_tables)
+        invalidate_history_cache()
+        if not inserted_ids:
             logging.info("Todas as batalhas já existem no histórico")
-            return history_df
-        
-        logging.info(f"Adicionando {len(unique_battles)} novas batalhas ao histórico")
-        
-        # Combinar histórico com novas batalhas
-        updated_df = pd.concat([history_df, unique_battles], ignore_index=True)
-        
-        # Ordenar por data, mais recentes primeiro
-        updated_df = updated_df.sort_values('time', ascending=False).reset_index(drop=True)
-        
-        # Limitar histórico a MAX_HISTORY_DAYS
-        cutoff_date = datetime.now() - timedelta(days=MAX_HISTORY_DAYS)
-        updated_df = updated_df[updated_df['time'] >= cutoff_date]
-        
-        # Salvar histórico atualizado
-        save_battle_history(updated_df)
+            return load_battle_history()
         
-        return updated_df
-    else:
-        # Se o histórico não tiver a coluna battle_id, iniciar novo histórico
-        logging.warning("Histórico existente com formato inválido. Criando novo histórico.")
-        save_battle_history(new_battles_df)
-        return new_battles_df
+        logging.info(f"Adicionando {len(inserted_ids)} novas batalhas ao histórico")
+        removed_ids = battle_sqlite.delete_before(SQLITE_DB, _cutoff(MAX_HISTORY_DAYS))
+        _update_battle_index(inserted_ids, removed_ids)
+        backup_battle_changes(lambda: battle_sqlite.query_all(SQLITE_DB),
+                              filter_tables(unique_tables, inserted_ids), removed_ids)
+        return load_battle_history()
+    
+    logging.info(f"Adicionando {len(unique_ids)} novas batalhas ao histórico")
+    
+    # Acrescentar ao journal apenas as batalhas novas
+    journal_size = journal_length(JOURNAL_FILE)
+    append_battles(JOURNAL_FILE, unique_tables)
+    invalidate_history_cache()
+    _update_battle_index(unique_ids)
+    backup_battle_changes(load_battle_tables, unique_tables, [])
+    
+    # Compactar periodicamente, aplicando a retenção
+    if journal_size + len(unique_ids) >= JOURNAL_COMPACT_THRESHOLD:
+        compact_battle_history()
+    
+    return load_battle_history()
 
-def get_battles_by_timeframe(days=7):
+def get_battles_by_timeframe(days=7, perspective=None):
     """
     Retorna batalhas dentro de um período específico.
     Por padrão, retorna as batalhas dos últimos 7 dias.
+    Apenas as partições que se sobrepõem ao período são lidas.
+    Com perspective, os lados das guilds são os desse ponto de vista.
+    """
+    since = _cutoff(days)
+    return _history_cache.get(('history', since, perspective), _store_version(),
+                              lambda: build_history_frame(load_battle_tables(since=since, perspective=perspective)))
+
+def _filter_by_rows(table_name, column, value, days=None):
+    """
+    Seleciona (em memória) as batalhas com alguma linha da tabela em que a coluna
+    é igual ao valor, sem diferenciar maiúsculas, opcionalmente dentro de uma janela de dias.
+    Colunas de nomes são comparadas pelo dicionário (uma vez por nome distinto).
+    """
+    tables = load_battle_tables(since=_cutoff(days) if days is not None else None)
+    rows = tables[table_name]
+    if column not in rows.columns:
+        return pd.DataFrame()
+    matches = rows.loc[name_mask(rows[column], value), 'battle_id']
+    return build_history_frame(filter_tables(tables, matches.unique()))
+
+def _filter_by_key(table_name, key_column, key, id_column, api_id, days=None):
+    """
+    Seleciona as batalhas com alguma linha da tabela com a chave de dimensão
+    informada (comparação de inteiros). Linhas gravadas antes das dimensões
+    (chave 0) são comparadas pelo ID da API.
     """
-    history_df = load_battle_history()
+    tables = load_battle_tables(since=_cutoff(days) if days is not None else None)
+    rows = tables[table_name]
+    keys = rows[key_column].to_numpy()
+    mask = keys == key if key else np.zeros(len(rows), dtype=bool)
+    unkeyed = keys == 0
+    if unkeyed.any():
+        mask |= unkeyed & (rows[id_column] == api_id).to_numpy()
+    return build_history_frame(filter_tables(tables, rows.loc[mask, 'battle_id'].unique()))
+
+def get_battles_by_guild(guild_name=None, guild_id=None, days=None):
+    """
+    Retorna as batalhas em que a guild participou (pelo nome exato, sem diferenciar
+    maiúsculas, ou pelo ID), opcionalmente restritas aos últimos dias.
+    """
+    since = _cutoff(days) if days is not None else None
+    if _use_sqlite():
+        return build_history_frame(fill_sides(battle_sqlite.query_by_guild(SQLITE_DB, guild_name, guild_id, since)))
     
-    if history_df.empty:
+    if guild_id is not None:
+        return _filter_by_key('guilds', 'guild_key', load_dimension('guilds').lookup([guild_id])[0],
+                              'guild_id', guild_id, days)
+    return _filter_by_rows('guilds', 'guild', guild_name, days)
+
+def get_battles_by_alliance(alliance_name, days=None):
+    """
+    Retorna as batalhas com guilds da aliança informada.
+    """
+    since = _cutoff(days) if days is not None else None
+    if _use_sqlite():
+        return build_history_frame(fill_sides(battle_sqlite.query_by_alliance(SQLITE_DB, alliance_name, since)))
+    
+    return _filter_by_rows('guilds', 'alliance_name', alliance_name, days)
+
+def get_battles_by_player(player_name, days=None):
+    """
+    Retorna as batalhas em que o jogador participou.
+    """
+    since = _cutoff(days) if days is not None else None
+    if _use_sqlite():
+        return build_history_frame(fill_sides(battle_sqlite.query_by_player(SQLITE_DB, player_name, since)))
+    
+    return _filter_by_rows('players', 'name', player_name, days)
+
+def get_battle_from_history(battle_id):
+    """
+    Retorna uma batalha do histórico pelo ID (DataFrame aninhado com uma linha),
+    ou um DataFrame vazio se ela não existir.
+    """
+    try:
+        battle_id = int(battle_id)
+    except (TypeError, ValueError):
         return pd.DataFrame()
     
-    cutoff_date = datetime.now() - timedelta(days=days)
-    return history_df[history_df['time'] >= cutoff_date].reset_index(drop=True)
+    if _use_sqlite():
+        return build_history_frame(fill_sides(battle_sqlite.query_by_ids(SQLITE_DB, [battle_id])))
+    
+    return build_history_frame(filter_tables(load_battle_tables(), [battle_id]))
 
 def get_daily_stats(days=30):
     """
     Calcula estatísticas diárias a partir do histórico.
     Retorna DataFrame com estatísticas por dia.
     """
-    history_df = load_battle_history()
+    if _use_sqlite():
+        history_df = battle_sqlite.query_battle_summaries_since(SQLITE_DB, _cutoff(days))
+    else:
+        history_df = load_battle_tables(since=_cutoff(days), tables=('battles',))['battles']
     
     if history_df.empty:
         return pd.DataFrame()
     
     # Filtrar pelo período solicitado
-    cutoff_date = datetime.now() - timedelta(days=days)
-    filtered_df = history_df[history_df['time'] >= cutoff_date]
+    filtered_df = history_df[history_df['time'] >= _cutoff(days)].copy()
     
     if filtered_df.empty:
         return pd.DataFrame()
@@ -203,26 +728,24 @@ def get_daily_stats(days=30):
     # Criar coluna de data (apenas o dia)
     filtered_df['date'] = filtered_df['time'].dt.date
     
+    # Vitória: kills devem ser 60% maiores que deaths
+    filtered_df['won'] = filtered_df['kills'] >= (filtered_df['deaths'] * 1.6)
+    
     # Agrupar por dia
     daily_stats = filtered_df.groupby('date').agg({
         'battle_id': 'count',
         'kills': 'sum',
         'deaths': 'sum',
-        'fame': 'sum'
+        'fame': 'sum',
+        'won': 'sum'
     }).reset_index()
     
     # Renomear colunas
-    daily_stats.rename(columns={'battle_id': 'battles'}, inplace=True)
+    daily_stats.rename(columns={'battle_id': 'battles', 'won': 'wins'}, inplace=True)
     
     # Calcular K/D ratio
     daily_stats['kd_ratio'] = daily_stats['kills'] / daily_stats['deaths'].replace(0, 1)
     
-    # Calcular vitórias (kills devem ser 60% maiores que deaths)
-    def count_wins(day_battles):
-        return sum(day_battles['kills'] >= (day_battles['deaths'] * 1.6))
-    
-    daily_stats['wins'] = [count_wins(filtered_df[filtered_df['date'] == date]) for date in daily_stats['date']]
-    
     # Calcular taxa de vitórias
     daily_stats['win_rate'] = (daily_stats['wins'] / daily_stats['battles']) * 100
     
@@ -231,35 +754,49 @@ def get_daily_stats(days=30):
     
     return daily_stats
 
-def cleanup_old_backups(max_backups=10):
+def cleanup_old_backups(max_checkpoints=MAX_BACKUP_CHECKPOINTS):
     """
-    Remove backups antigos, mantendo apenas os mais recentes.
+    Remove backups antigos, mantendo apenas os checkpoints mais recentes e seus deltas.
     """
     if not os.path.exists(BACKUP_DIR):
         return
-        
-    backup_files = [os.path.join(BACKUP_DIR, f) for f in os.listdir(BACKUP_DIR) 
-                   if f.startswith("battle_history_") and f.endswith(".json")]
-    
-    if len(backup_files) <= max_backups:
-        return
-        
-    # Ordenar por data de modificação (mais antigos primeiro)
-    backup_files.sort(key=lambda f: os.path.getmtime(f))
-    
-    # Remover os mais antigos
-    for f in backup_files[:-max_backups]:
-        try:
-            os.remove(f)
-            logging.info(f"Backup antigo removido: {f}")
-        except Exception as e:
-            logging.error(f"Erro ao remover backup: {e}")
+
+    prune_backups(BACKUP_DIR, max_checkpoints=max_checkpoints)
+
+def restore_battle_history(seq=None):
+    """
+    Restaura o histórico a partir dos backups incrementais.
+    Reaplica os deltas sobre o último checkpoint até o backup seq (o mais recente se None),
+    grava o resultado como snapshot base e o registra como novo checkpoint.
+    """
+    tables = restore_tables(BACKUP_DIR, seq)
+    if tables is None:
+        logging.error("Não foi possível restaurar o histórico")
+        return False
+
+    if _use_sqlite():
+        battle_sqlite.replace_tables(SQLITE_DB, tables)
+    else:
+        _write_base(tables)
+        truncate_journal(JOURNAL_FILE)
+    invalidate_history_cache()
+    _write_battle_index(tables['battles']['battle_id'])
+
+    # O estado restaurado vira um novo checkpoint: os deltas seguintes partem dele,
+    # e não dos backups posteriores a seq, que foram descartados
+    try:
+        record_backup(tables, empty_tables(), [], BACKUP_DIR, checkpoint=True)
+        cleanup_old_backups()
+    except Exception as e:
+        logging.error(f"Erro ao registrar o checkpoint da restauração: {e}")
+    logging.info(f"Histórico restaurado com {len(tables['battles'])} batalhas")
+    return True
 
 def print_history_summary():
     """
     Função de diagnóstico para imprimir resumo do histórico.
     """
-    history_df = load_battle_history()
+    history_df = load_battle_tables(tables=('battles',))['battles']
     
     if history_df.empty:
         print("Histórico vazio.")
@@ -278,5 +815,17 @@ def print_history_summary():
 
 
 if __name__ == "__main__":
+    import sys
+
+    # Uso: python battle_history_manager.py [compact | backups | restore [seq]]
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == "compact":
+        compact_battle_history()
+    elif command == "backups":
+        for entry in list_backups(BACKUP_DIR):
+            print(entry)
+    elif command == "restore":
+        restore_battle_history(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+
     # Testes e diagnóstico
     print_history_summary()
\ No newline at end of file
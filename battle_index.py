@@ -0,0 +1,222 @@
+"""
+Índice persistente dos IDs de batalhas já armazenadas no histórico.
+Os IDs ficam em um array int64 ordenado (arquivo .npy), consultado por busca binária,
+para que a ingestão descarte batalhas conhecidas antes de processá-las.
+"""
+
+import os
+import logging
+import numpy as np
+
+INDEX_FILE = "battle_ids.npy"  # Nome do arquivo do índice dentro do diretório do armazenamento
+BLOOM_FILE = "battle_ids_bloom.npz"  # Filtro de Bloom consultado antes do índice
+
+
+def empty_index():
+    """
+    Retorna um índice vazio.
+    """
+    return np.empty(0, dtype=np.int64)
+
+
+def to_ids(battle_ids):
+    """
+    Converte IDs (int, str ou Series) para um array int64, descartando os inválidos.
+    """
+    values = np.asarray(battle_ids if hasattr(battle_ids, '__array__') else list(battle_ids))
+    if values.dtype.kind in 'iu':
+        return values.astype(np.int64, copy=False)
+
+    ids = []
+    for value in values.ravel():
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return np.asarray(ids, dtype=np.int64)
+
+
+def build_index(battle_ids):
+    """
+    Cria um índice (ordenado e sem repetições) a partir de uma coleção de IDs.
+    """
+    return np.unique(to_ids(battle_ids))
+
+
+def load_index(path):
+    """
+    Lê o índice do disco. Retorna None se o arquivo não existir ou estiver corrompido.
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        index = np.load(path, allow_pickle=False)
+    except Exception as e:
+        logging.error(f"Erro ao ler índice de batalhas {path}: {e}")
+        return None
+
+    if index.dtype != np.int64 or index.ndim != 1:
+        logging.error(f"Índice de batalhas {path} em formato inesperado")
+        return None
+    return index
+
+
+def save_index(index, path):
+    """
+    Grava o índice de forma atômica (arquivo temporário + os.replace).
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(index, dtype=np.int64), allow_pickle=False)
+    os.replace(tmp_path, path)
+    logging.debug(f"Índice de batalhas salvo com {len(index)} IDs")
+
+
+def contains(index, battle_ids):
+    """
+    Retorna um array booleano indicando quais IDs estão no índice.
+    """
+    ids = to_ids(battle_ids)
+    if len(index) == 0 or len(ids) == 0:
+        return np.zeros(len(ids), dtype=bool)
+
+    positions = np.searchsorted(index, ids)
+    positions[positions == len(index)] = 0
+    return index[positions] == ids
+
+
+def add_ids(index, battle_ids):
+    """
+    Retorna um novo índice com os IDs acrescentados.
+    """
+    ids = to_ids(battle_ids)
+    if len(ids) == 0:
+        return index
+    return np.union1d(index, ids)
+
+
+def remove_ids(index, battle_ids):
+    """
+    Retorna um novo índice sem os IDs informados.
+    """
+    ids = to_ids(battle_ids)
+    if len(ids) == 0:
+        return index
+    return np.setdiff1d(index, ids, assume_unique=False)
+
+
+def _mix64(values):
+    """
+    Espalha os bits de um array uint64 (finalizador do splitmix64).
+    """
+    z = values + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre IDs int64, usado na frente do índice ordenado:
+    se o filtro diz que um ID não existe, ele certamente é novo e a busca binária
+    no índice é evitada. Remoções não são suportadas; IDs removidos do histórico
+    continuam no filtro (falsos positivos, resolvidos pelo índice) até a reconstrução.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        num_bits = int(np.ceil(-self.capacity * np.log(error_rate) / (np.log(2) ** 2)))
+        self.num_bits = max(64, (num_bits + 63) // 64 * 64)
+        self.num_hashes = max(1, int(round(self.num_bits / self.capacity * np.log(2))))
+        self.bits = np.zeros(self.num_bits // 8, dtype=np.uint8)
+        self.count = 0
+
+    @classmethod
+    def from_ids(cls, battle_ids, error_rate=0.01, headroom=2):
+        """
+        Cria um filtro com folga para headroom vezes o número de IDs atuais.
+        """
+        ids = to_ids(battle_ids)
+        bloom = cls(max(1024, len(ids) * headroom), error_rate)
+        bloom.add(ids)
+        return bloom
+
+    def _positions(self, ids):
+        # Hash duplo: posição i = h1 + i * h2 (mod num_bits)
+        values = ids.astype(np.uint64)
+        h1 = _mix64(values)
+        h2 = _mix64(values ^ np.uint64(0x5BD1E9955BD1E995)) | np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def add(self, battle_ids):
+        """
+        Acrescenta IDs ao filtro.
+        """
+        ids = to_ids(battle_ids)
+        if len(ids) == 0:
+            return
+        positions = self._positions(ids).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self.count += len(ids)
+
+    def might_contain(self, battle_ids):
+        """
+        Retorna um array booleano: False significa que o ID certamente não foi acrescentado.
+        """
+        ids = to_ids(battle_ids)
+        if len(ids) == 0:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(ids)
+        bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+    @property
+    def saturated(self):
+        """
+        Indica se o filtro recebeu mais IDs que a capacidade (taxa de erro acima da prevista).
+        """
+        return self.count > self.capacity
+
+    def save(self, path):
+        """
+        Grava o filtro de forma atômica.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, bits=self.bits,
+                     params=np.array([self.capacity, self.num_bits, self.num_hashes, self.count], dtype=np.int64),
+                     error_rate=np.array([self.error_rate]))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Lê um filtro gravado com save. Retorna None se não existir ou estiver corrompido.
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                capacity, num_bits, num_hashes, count = (int(v) for v in data['params'])
+                bloom = cls(capacity, float(data['error_rate'][0]))
+                bits = data['bits']
+        except Exception as e:
+            logging.error(f"Erro ao ler filtro de Bloom {path}: {e}")
+            return None
+
+        if bits.dtype != np.uint8 or len(bits) * 8 != num_bits:
+            logging.error(f"Filtro de Bloom {path} em formato inesperado")
+            return None
+
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.bits = bits
+        bloom.count = count
+        return bloom
@@ -0,0 +1,176 @@
+"""
+Journal append-only do histórico de batalhas.
+Cada linha do arquivo (NDJSON) guarda uma batalha já normalizada nas três tabelas
+do armazenamento colunar, permitindo gravar novas batalhas em O(novas) sem
+reescrever o snapshot base. A compactação (ver battle_history_manager) incorpora
+o journal ao snapshot periodicamente.
+"""
+
+import os
+import json
+import logging
+import pandas as pd
+from battle_store import (BATTLE_SCHEMA, GUILD_SCHEMA, PLAYER_SCHEMA, apply_schema,
+                          empty_tables)
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Colunas gravadas para guilds e jogadores (battle_id fica no registro da batalha)
+GUILD_FIELDS = [c for c in GUILD_SCHEMA if c != 'battle_id']
+PLAYER_FIELDS = [c for c in PLAYER_SCHEMA if c != 'battle_id']
+
+
+def _rows_by_battle(table, fields):
+    """
+    Agrupa as linhas de uma tabela por battle_id, como listas de dicionários.
+    """
+    grouped = {}
+    if table.empty:
+        return grouped
+
+    columns = [table[f].tolist() for f in fields]
+    for i, battle_id in enumerate(table['battle_id'].tolist()):
+        grouped.setdefault(battle_id, []).append({f: col[i] for f, col in zip(fields, columns)})
+    return grouped
+
+
+def encode_battles(tables):
+    """
+    Serializa as batalhas das tabelas como linhas NDJSON (uma batalha por linha).
+    """
+    battles = tables['battles']
+    if battles.empty:
+        return []
+
+    guilds_by_battle = _rows_by_battle(tables['guilds'], GUILD_FIELDS)
+    players_by_battle = _rows_by_battle(tables['players'], PLAYER_FIELDS)
+
+    lines = []
+    for record in battles[list(BATTLE_SCHEMA)].to_dict('records'):
+        battle_id = record['battle_id']
+        record['time'] = record['time'].isoformat()
+        record['guilds'] = guilds_by_battle.get(battle_id, [])
+        record['roster'] = players_by_battle.get(battle_id, [])
+        lines.append(json.dumps(record, separators=(',', ':')) + '\n')
+    return lines
+
+
+def decode_battles(lines, source="journal"):
+    """
+    Converte linhas NDJSON geradas por encode_battles nas três tabelas tipadas.
+    Linhas corrompidas (por exemplo, uma gravação interrompida) são ignoradas.
+    """
+    battle_rows = []
+    guild_rows = []
+    player_rows = []
+    seen_ids = set()
+
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            logging.warning(f"Linha {line_number} inválida ignorada em {source}")
+            continue
+
+        # Gravações concorrentes podem repetir uma batalha; vale a primeira
+        battle_id = record['battle_id']
+        if battle_id in seen_ids:
+            continue
+        seen_ids.add(battle_id)
+
+        for guild in record.pop('guilds', []):
+            guild['battle_id'] = battle_id
+            guild_rows.append(guild)
+        for player in record.pop('roster', []):
+            player['battle_id'] = battle_id
+            player_rows.append(player)
+        battle_rows.append(record)
+
+    return {
+        'battles': apply_schema(pd.DataFrame(battle_rows), BATTLE_SCHEMA),
+        'guilds': apply_schema(pd.DataFrame(guild_rows), GUILD_SCHEMA),
+        'players': apply_schema(pd.DataFrame(player_rows), PLAYER_SCHEMA),
+    }
+
+
+def _drop_partial_line(path, chunk_size=65536):
+    """
+    Remove do fim do journal uma linha incompleta (gravação interrompida), para
+    que a próxima batalha acrescentada não seja concatenada a ela.
+    """
+    if not os.path.exists(path):
+        return
+
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - chunk_size)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+
+        if position < end:
+            logging.warning(f"Linha incompleta descartada no fim de {path}")
+            f.truncate(position)
+
+
+def append_battles(path, tables):
+    """
+    Acrescenta as batalhas das tabelas informadas ao final do journal,
+    descartando antes uma última linha incompleta.
+    Retorna o número de batalhas gravadas.
+    """
+    lines = encode_battles(tables)
+    if not lines:
+        return 0
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    _drop_partial_line(path)
+    with open(path, 'a') as f:
+        f.write(''.join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+    logging.info(f"Journal: {len(lines)} batalhas acrescentadas em {path}")
+    return len(lines)
+
+
+def read_journal(path):
+    """
+    Lê o journal e retorna as três tabelas tipadas.
+    """
+    if not os.path.exists(path):
+        return empty_tables()
+
+    with open(path, 'r') as f:
+        return decode_battles(f, source=path)
+
+
+def truncate_journal(path):
+    """
+    Esvazia o journal depois que ele foi incorporado ao snapshot.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def journal_length(path):
+    """
+    Conta as batalhas do journal (linhas não vazias) sem decodificá-las.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    with open(path, 'rb') as f:
+        return sum(1 for line in f if line.strip())
@@ -0,0 +1,308 @@
+"""
+Normalização dos dados brutos de batalhas (JSON da API) para as tabelas planas
+do armazenamento (battle_store): batalhas, guilds por batalha e jogadores por batalha.
+
+Os jogadores de um lote de batalhas são achatados em uma única tabela colunar,
+em uma passada; os totais de cada guild na batalha e os números da guild
+acompanhada são calculados com agregações agrupadas do pandas, sem dicionários
+aninhados por jogador. api_data_processor, local_data_fetcher e
+api_scraper.process_battle_details usam este módulo.
+
+Para dumps grandes (data.json, backfills), normalize_battles_parallel divide as
+batalhas em lotes processados por um ProcessPoolExecutor; cada processo devolve
+as tabelas do lote como arrays NumPy (strings como códigos + valores únicos),
+que são juntadas na ordem original:
+
+    ALBION_NORMALIZE_WORKERS=4 python ingest_worker.py --once
+"""
+
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from operator import itemgetter
+import numpy as np
+import pandas as pd
+from battle_store import BATTLE_SCHEMA, GUILD_SCHEMA, PLAYER_SCHEMA, SCHEMAS, TABLE_NAMES, concat_frames, empty_tables
+from name_dictionary import DICTIONARY_COLUMNS
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Campos de cada jogador no JSON da API → colunas da tabela de jogadores
+PLAYER_FIELDS = (
+    ('player_id', 'id', ''),
+    ('name', 'name', 'Unknown'),
+    ('guild', 'guildName', 'Unknown'),
+    ('guild_id', 'guildId', ''),
+    ('alliance_name', 'allianceName', ''),
+    ('alliance_id', 'allianceId', ''),
+    ('kills', 'kills', 0),
+    ('deaths', 'deaths', 0),
+    ('fame', 'killFame', 0),
+)
+NUMERIC_COLUMNS = ('kills', 'deaths', 'fame')
+
+# IDs da API mantidos como colunas extras nas tabelas normalizadas, para que
+# dimensions.assign_keys preencha as chaves de dimensão (não são gravados)
+API_ID_COLUMNS = {
+    'battles': (),
+    'guilds': ('alliance_id',),
+    'players': ('player_id', 'guild_id', 'alliance_id'),
+}
+
+NORMALIZE_WORKERS = int(os.environ.get("ALBION_NORMALIZE_WORKERS", "1"))  # Processos da normalização (1 = sem paralelismo)
+NORMALIZE_CHUNK_SIZE = 500  # Batalhas por lote enviado a um processo
+
+# Leitura de um campo de todos os jogadores de uma vez (itemgetter), com .get como
+# alternativa quando algum jogador não tem o campo
+_PLAYER_GETTERS = tuple((column, itemgetter(key), key, default) for column, key, default in PLAYER_FIELDS)
+
+
+def _int_column(values):
+    try:
+        return np.array(values, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').fillna(0).astype(np.int64).to_numpy()
+
+
+def _string_column(values, categorical=False):
+    if None in values:
+        values = ['' if value is None else value for value in values]
+    return pd.Categorical(values) if categorical else pd.array(values, dtype='string')
+
+
+def flatten_battles(raw_battles):
+    """
+    Achata um iterável de batalhas brutas em (batalhas, jogadores), dois DataFrames
+    colunares. A ordem das batalhas e dos jogadores de cada batalha é mantida.
+    Batalhas sem os campos obrigatórios são ignoradas (com registro no log), e uma
+    batalha repetida no lote vale só na primeira ocorrência.
+    """
+    battle_ids, start_times, total_fames, player_counts = [], [], [], []
+    seen_ids = set()
+    columns = {column: [] for column, _, _ in PLAYER_FIELDS}
+
+    for battle in raw_battles:
+        try:
+            battle_id = int(battle['id'])
+            start_time = battle['startTime']
+            players = battle.get('players') or {}
+            players = list(players.values() if isinstance(players, dict) else players)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            label = battle.get('id', 'unknown') if isinstance(battle, dict) else repr(battle)[:80]
+            logging.error("Erro ao processar batalha %s: %s", label, e)
+            continue
+
+        if battle_id in seen_ids:
+            continue
+        seen_ids.add(battle_id)
+        battle_ids.append(battle_id)
+        start_times.append(start_time)
+        total_fames.append(battle.get('totalFame', 0))
+        player_counts.append(len(players))
+        for column, getter, key, default in _PLAYER_GETTERS:
+            try:
+                values = list(map(getter, players))
+            except KeyError:
+                values = [player.get(key, default) for player in players]
+            columns[column].extend(values)
+
+    battles = pd.DataFrame({
+        'battle_id': np.asarray(battle_ids, dtype=np.int64),
+        # Precisão de microssegundos, como datetime.fromisoformat nos demais caminhos de ingestão
+        'time': pd.to_datetime(pd.Series(start_times, dtype=object), utc=True, format='ISO8601',
+                               errors='coerce').dt.floor('us').astype('datetime64[ns, UTC]'),
+        'fame': _int_column(total_fames),
+    })
+    players = pd.DataFrame({'battle_id': np.repeat(battles['battle_id'].to_numpy(), player_counts)})
+    for column, values in columns.items():
+        if column in NUMERIC_COLUMNS:
+            players[column] = _int_column(values)
+        else:
+            players[column] = _string_column(values, categorical=column in DICTIONARY_COLUMNS)
+
+    invalid = battles['time'].isna()
+    if invalid.any():
+        for battle_id in battles.loc[invalid, 'battle_id']:
+            logging.error("Erro ao processar batalha %s: horário inválido", battle_id)
+        players = players[~players['battle_id'].isin(battles.loc[invalid, 'battle_id'])].reset_index(drop=True)
+        battles = battles[~invalid].reset_index(drop=True)
+    return battles, players
+
+
+def _typed(df, schema, extra=()):
+    # Colunas do esquema (criando as chaves de dimensão, ainda não atribuídas), convertendo
+    # só as que ainda não estão no tipo certo, seguidas das colunas extras
+    for column in schema:
+        if column not in df.columns:
+            df[column] = 0
+    conversions = {column: dtype for column, dtype in schema.items() if df[column].dtype != dtype}
+    return (df.astype(conversions) if conversions else df)[list(schema) + list(extra)].reset_index(drop=True)
+
+
+def guild_totals(players):
+    """
+    Totais de cada guild em cada batalha (kills, mortes, fama, jogadores), na
+    ordem em que a guild aparece na batalha, com o ID e a aliança (nome e ID) da guild.
+    O agrupamento usa os códigos inteiros dos nomes (factorize), não as strings.
+    """
+    guild_codes, _ = pd.factorize(players['guild'])
+    keys = pd.DataFrame({
+        'battle_id': players['battle_id'].to_numpy(),
+        'guild_code': guild_codes,
+        'kills': players['kills'].to_numpy(),
+        'deaths': players['deaths'].to_numpy(),
+        'fame': players['fame'].to_numpy(),
+        'row': np.arange(len(players)),
+    })
+    totals = keys.groupby(['battle_id', 'guild_code'], sort=False).agg(
+        total_kills=('kills', 'sum'),
+        total_deaths=('deaths', 'sum'),
+        total_fame=('fame', 'sum'),
+        player_count=('row', 'size'),
+        first_row=('row', 'first'),
+    ).reset_index()
+
+    # Nome, ID e aliança vêm do primeiro jogador da guild na batalha
+    first_rows = totals['first_row'].to_numpy()
+    for column in ('guild', 'guild_id', 'alliance_name', 'alliance_id'):
+        totals[column] = players[column].array.take(first_rows)
+    return totals
+
+
+def normalize_battles(raw_battles, guild_id=None):
+    """
+    Converte batalhas brutas nas três tabelas tipadas do armazenamento, com os
+    IDs da API de API_ID_COLUMNS como colunas extras e as chaves de dimensão em 0.
+    Com guild_id, mantém apenas as batalhas com jogadores da guild, e os campos
+    players/kills/deaths de cada batalha são os da guild; sem guild_id, todas as
+    batalhas são mantidas e esses campos contam todos os jogadores.
+    """
+    battles, players = flatten_battles(raw_battles)
+    if battles.empty:
+        return empty_tables()
+
+    counted = players if guild_id is None else players[players['guild_id'] == guild_id]
+    own = counted.groupby('battle_id', sort=False).agg(
+        players=('kills', 'size'), kills=('kills', 'sum'), deaths=('deaths', 'sum'))
+
+    if guild_id is not None and len(own) < len(battles):
+        battles = battles[battles['battle_id'].isin(own.index)]
+        players = players[players['battle_id'].isin(own.index)].reset_index(drop=True)
+    battles = battles.join(own, on='battle_id')
+    battles[['players', 'kills', 'deaths']] = battles[['players', 'kills', 'deaths']].fillna(0)
+
+    totals = guild_totals(players)
+    totals['alliance'] = False
+    return {
+        'battles': _typed(battles, BATTLE_SCHEMA),
+        'guilds': _typed(totals, GUILD_SCHEMA, API_ID_COLUMNS['guilds']),
+        'players': _typed(players, PLAYER_SCHEMA, API_ID_COLUMNS['players']),
+    }
+
+
+def _pack_tables(tables):
+    """
+    Tabelas → arrays NumPy para envio entre processos: texto e Categorical viram
+    códigos int32 + valores únicos (guild e aliança se repetem muito entre
+    jogadores), datas viram datetime64 sem fuso (UTC).
+    """
+    packed = {}
+    for name, df in tables.items():
+        columns = {}
+        for column in df.columns:
+            values = df[column]
+            if isinstance(values.dtype, pd.DatetimeTZDtype):
+                columns[column] = values.dt.tz_convert(None).to_numpy()
+            elif isinstance(values.dtype, pd.CategoricalDtype):
+                columns[column] = ('category', values.cat.codes.to_numpy(np.int32),
+                                   values.cat.categories.to_numpy(object))
+            elif values.dtype == 'string':
+                codes, uniques = pd.factorize(values)
+                columns[column] = ('string', codes.astype(np.int32), np.asarray(uniques, dtype=object))
+            else:
+                columns[column] = values.to_numpy()
+        packed[name] = columns
+    return packed
+
+
+def _unpack_tables(packed):
+    tables = {}
+    for name, columns in packed.items():
+        data = {}
+        for column, values in columns.items():
+            if isinstance(values, tuple):
+                dtype, codes, uniques = values
+                data[column] = pd.Categorical.from_codes(codes, uniques)
+                if dtype == 'string':
+                    data[column] = data[column].astype('string')
+            elif values.dtype.kind == 'M':
+                data[column] = pd.Series(values).dt.tz_localize('UTC')
+            else:
+                data[column] = values
+        tables[name] = pd.DataFrame(data)
+    return tables
+
+
+def _normalize_chunk(battles, guild_id):
+    # Executado nos processos do pool
+    return _pack_tables(normalize_battles(battles, guild_id))
+
+
+def _iter_chunks(raw_battles, chunk_size):
+    # Lotes de batalhas na ordem original; uma batalha repetida vale só na primeira
+    # ocorrência, também entre lotes diferentes
+    seen_ids = set()
+
+    def unique(battles):
+        for battle in battles:
+            try:
+                battle_id = int(battle['id'])
+            except (KeyError, TypeError, ValueError):
+                yield battle  # normalize_battles registra o erro
+                continue
+            if battle_id not in seen_ids:
+                seen_ids.add(battle_id)
+                yield battle
+
+    battles = unique(raw_battles)
+    while True:
+        chunk = list(islice(battles, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def normalize_battles_parallel(raw_battles, guild_id=None, workers=None, chunk_size=NORMALIZE_CHUNK_SIZE):
+    """
+    Mesmo resultado de normalize_battles, com os lotes de chunk_size batalhas
+    normalizados em paralelo por workers processos (padrão NORMALIZE_WORKERS).
+    Com um processo só, ou quando as batalhas cabem em um lote, tudo roda no
+    processo atual. O iterável é consumido aos poucos: no máximo 2 lotes por
+    processo ficam pendentes de cada vez.
+    """
+    workers = NORMALIZE_WORKERS if workers is None else workers
+    chunks = _iter_chunks(raw_battles, chunk_size)
+    first_chunks = list(islice(chunks, 2))
+    chunks = chain(first_chunks, chunks)
+    if workers <= 1 or len(first_chunks) < 2:
+        return normalize_battles((battle for chunk in chunks for battle in chunk), guild_id)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_normalize_chunk, chunk, guild_id))
+            if len(pending) >= 2 * workers:
+                results.append(_unpack_tables(pending.popleft().result()))
+        while pending:
+            results.append(_unpack_tables(pending.popleft().result()))
+
+    logging.info("Normalizadas %s batalhas em %s lotes com %s processos",
+                 sum(len(tables['battles']) for tables in results), len(results), workers)
+    return {
+        name: concat_frames([tables[name] for tables in results], SCHEMAS[name])
+        for name in TABLE_NAMES
+    }
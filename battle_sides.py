@@ -0,0 +1,242 @@
+"""
+Classificação do lado de cada guild em cada batalha (própria guild, aliança ou
+inimiga) a partir de um ponto de vista: o ID da guild e, opcionalmente, o ID da
+aliança (allianceId da API).
+
+A classificação do ponto de vista configurado é calculada uma vez na ingestão e
+gravada na coluna side da tabela de guilds por batalha; a de outros pontos de
+vista é calculada sob demanda, só para as batalhas consultadas (ver
+battle_history_manager.get_battles_from_perspective). Os componentes apenas leem
+stats['side'] (ver split_sides).
+
+Sem ID de aliança, a aliança de cada batalha é a da própria guild naquela
+batalha. As alianças são comparadas pelas chaves de dimensão e, em linhas sem
+chave (gravadas antes das dimensões), pelos nomes. Em batalhas sem nenhuma
+linha com o ID da guild (ex.: histórico legado, sem IDs), a própria guild é
+encontrada pelo nome (sem diferenciar maiúsculas); esses lados não são gravados
+no armazenamento (ficam SIDE_UNKNOWN e são recalculados na leitura).
+"""
+
+import logging
+import os
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from dimensions import load_dimension, find_entities
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Lados (coluna side da tabela de guilds, int8)
+SIDE_UNKNOWN = 0  # Ainda não classificada (gravada antes da coluna side)
+SIDE_OWN = 1  # A guild do ponto de vista
+SIDE_ALLIANCE = 2  # Guild da mesma aliança
+SIDE_ENEMY = 3  # Demais guilds
+SIDE_LABELS = {SIDE_OWN: 'Guild', SIDE_ALLIANCE: 'Alliance', SIDE_ENEMY: 'Enemy'}
+
+# Ponto de vista: guild (ID da API e nome) e, opcionalmente, aliança fixa
+# (ID e nome; vazios = aliança da guild em cada batalha). Hashable, usado como chave de cache.
+Perspective = namedtuple('Perspective', ['guild_id', 'guild_name', 'alliance_id', 'alliance_name'],
+                         defaults=('', ''))
+
+# Ponto de vista gravado na ingestão
+PERSPECTIVE_GUILD_ID = os.environ.get("ALBION_PERSPECTIVE_GUILD_ID", "gUFLG-kcRFC1iOJDdwW2BQ")
+PERSPECTIVE_GUILD_NAME = os.environ.get("ALBION_PERSPECTIVE_GUILD_NAME", "We Profit")
+PERSPECTIVE_ALLIANCE_ID = os.environ.get("ALBION_PERSPECTIVE_ALLIANCE_ID", "")
+DEFAULT_PERSPECTIVE = Perspective(PERSPECTIVE_GUILD_ID, PERSPECTIVE_GUILD_NAME, PERSPECTIVE_ALLIANCE_ID)
+
+
+def _dimension_name(kind, api_id):
+    # Chave e nome atual da entidade na dimensão (0 e '' se o ID for desconhecido)
+    if not api_id:
+        return 0, ''
+    dimension = load_dimension(kind)
+    key = int(dimension.lookup([api_id])[0])
+    if not key:
+        return 0, ''
+    return key, str(dimension.entities['name'].iloc[key - 1])
+
+
+def _find_api_id(kind, name):
+    # ID da API da entidade com o nome (a vista mais recentemente), ou '' se não houver
+    entities = find_entities(kind, name)
+    if entities.empty:
+        return ''
+    return str(entities.sort_values('last_seen', kind='stable')['api_id'].iloc[-1])
+
+
+def resolve_perspective(guild_name=None, alliance_name=None):
+    """
+    Ponto de vista de uma guild escolhida pelo nome e, opcionalmente, de uma
+    aliança pelo nome, com os IDs da API resolvidos pelas dimensões.
+    A guild configurada, sem aliança ou com a aliança atual dela, resulta em
+    DEFAULT_PERSPECTIVE (os lados gravados na ingestão).
+    """
+    if not guild_name:
+        return DEFAULT_PERSPECTIVE
+
+    default_names = {PERSPECTIVE_GUILD_NAME.casefold(), _dimension_name('guilds', PERSPECTIVE_GUILD_ID)[1].casefold()}
+    if guild_name.casefold() in default_names:
+        if not alliance_name:
+            return DEFAULT_PERSPECTIVE
+        key, _ = _dimension_name('guilds', PERSPECTIVE_GUILD_ID)
+        if key and not PERSPECTIVE_ALLIANCE_ID:
+            alliances = load_dimension('alliances')
+            parent_key = int(load_dimension('guilds').entities['parent_key'].iloc[key - 1])
+            if parent_key and str(alliances.entities['name'].iloc[parent_key - 1]).casefold() == alliance_name.casefold():
+                return DEFAULT_PERSPECTIVE
+        guild_id = PERSPECTIVE_GUILD_ID
+    else:
+        guild_id = _find_api_id('guilds', guild_name)
+
+    if not alliance_name:
+        return Perspective(guild_id, guild_name)
+    return Perspective(guild_id, guild_name, _find_api_id('alliances', alliance_name), alliance_name)
+
+
+def _name_codes(values):
+    # Códigos Categorical de uma coluna de nomes, com -1 para nomes vazios
+    categorical = pd.Categorical(values)
+    codes = np.asarray(categorical.codes).copy()
+    empty = categorical.categories.get_indexer([''])[0]
+    if empty >= 0:
+        codes[codes == empty] = -1
+    return codes, categorical.categories
+
+
+def _name_match(codes, categories, names):
+    # Linhas cujo nome é um dos nomes informados, sem diferenciar maiúsculas
+    names = {name.casefold() for name in names if name}
+    if not names or not len(categories):
+        return np.zeros(len(codes), dtype=bool)
+    matched = np.flatnonzero(categories.str.casefold().isin(names))
+    return np.isin(codes, matched)
+
+
+def _classify(guilds, perspective):
+    # Lados de cada linha e, por linha, se a batalha tem a própria guild encontrada pelo ID
+    guild_id, guild_name, alliance_id, alliance_name = perspective
+    sides = np.full(len(guilds), SIDE_ENEMY, dtype=np.int8)
+    by_id = np.zeros(len(guilds), dtype=bool)
+    if guilds.empty or not (guild_id or guild_name):
+        return sides, by_id
+
+    battle_ids = guilds['battle_id'].to_numpy()
+    guild_ids = guilds['guild_id'].to_numpy(dtype=object, na_value='')
+    own = (guild_ids == guild_id) if guild_id else np.zeros(len(guilds), dtype=bool)
+    by_id = np.isin(battle_ids, battle_ids[own])
+
+    # Batalhas sem linha com o ID: pelo nome configurado ou pelo nome atual na dimensão
+    if not by_id.all():
+        guild_codes, categories = _name_codes(guilds['guild'])
+        names = (guild_name, _dimension_name('guilds', guild_id)[1])
+        candidates = ~by_id & ((guild_ids == '') | (not guild_id))
+        own |= candidates & _name_match(guild_codes, categories, names)
+    sides[own] = SIDE_OWN
+
+    alliance_keys = guilds['alliance_key'].to_numpy()
+    alliance_codes, categories = _name_codes(guilds['alliance_name'])
+    if alliance_id or alliance_name:
+        key, dimension_name = _dimension_name('alliances', alliance_id)
+        own_keys = np.full(len(guilds), key, dtype=np.int32)
+        named = _name_match(alliance_codes, categories, (alliance_name, dimension_name))
+        allied = np.where((alliance_keys != 0) & (own_keys != 0), alliance_keys == own_keys, named)
+    elif own.any():
+        # Aliança da própria guild em cada batalha (a primeira linha dela na batalha)
+        own_battles = pd.Index(battle_ids[own])
+        first = ~own_battles.duplicated()
+        positions = own_battles[first].get_indexer(battle_ids)
+        found = positions >= 0
+        own_keys = np.where(found, alliance_keys[own][first][positions], 0)
+        own_codes = np.where(found, alliance_codes[own][first][positions], -1)
+        keyed = (alliance_keys != 0) & (own_keys != 0)
+        allied = np.where(keyed, alliance_keys == own_keys, (own_codes >= 0) & (alliance_codes == own_codes))
+    else:
+        return sides, by_id
+
+    sides[allied & ~own] = SIDE_ALLIANCE
+    return sides, by_id
+
+
+def classify_sides(guilds, perspective=DEFAULT_PERSPECTIVE):
+    """
+    Lado (int8, SIDE_*) de cada linha da tabela de guilds por batalha do ponto
+    de vista informado (Perspective).
+    """
+    return _classify(guilds, perspective)[0]
+
+
+def _stored_sides(guilds):
+    # Lados do ponto de vista configurado a gravar: SIDE_UNKNOWN nas batalhas
+    # em que a própria guild não foi encontrada pelo ID
+    sides, by_id = _classify(guilds, DEFAULT_PERSPECTIVE)
+    return np.where(by_id, sides, SIDE_UNKNOWN).astype(np.int8)
+
+
+def _with_sides(tables, sides):
+    guilds = tables['guilds'].copy()
+    guilds['side'] = sides
+    guilds['alliance'] = sides == SIDE_ALLIANCE
+    return {**tables, 'guilds': guilds}
+
+
+def assign_sides(tables, perspective=DEFAULT_PERSPECTIVE):
+    """
+    Tabelas com as colunas side e alliance das guilds calculadas para o ponto de
+    vista. A tabela de guilds é copiada; as demais são compartilhadas.
+    """
+    if 'guilds' not in tables:
+        return tables
+    return _with_sides(tables, classify_sides(tables['guilds'], perspective))
+
+
+def store_sides(tables):
+    """
+    Como assign_sides com o ponto de vista configurado, para tabelas que vão ser
+    gravadas: batalhas sem a própria guild identificada pelo ID ficam SIDE_UNKNOWN
+    (classificadas pelo nome a cada leitura, nunca gravadas).
+    """
+    if 'guilds' not in tables:
+        return tables
+    return _with_sides(tables, _stored_sides(tables['guilds']))
+
+
+def fill_sides(tables, stored=False):
+    """
+    Classifica, do ponto de vista configurado, as linhas ainda sem lado (gravadas
+    antes da coluna side ou sem a própria guild identificada pelo ID). Com stored,
+    como em store_sides, só preenche as batalhas identificadas pelo ID.
+    Retorna as mesmas tabelas se nada mudar.
+    """
+    guilds = tables.get('guilds')
+    if guilds is None or 'side' not in guilds.columns:
+        return tables
+    sides = guilds['side'].to_numpy()
+    unknown = sides == SIDE_UNKNOWN
+    if not unknown.any():
+        return tables
+    computed = _stored_sides(guilds) if stored else classify_sides(guilds)
+    if stored and not (unknown & (computed != SIDE_UNKNOWN)).any():
+        return tables
+    sides = np.where(unknown, computed, sides).astype(np.int8)
+    logging.debug("Lados classificados para %d guilds gravadas sem a coluna side", int(unknown.sum()))
+    return _with_sides(tables, sides)
+
+
+def split_sides(battle_guilds):
+    """
+    Separa as guilds de uma batalha (details['guilds']) pelo lado já classificado.
+    Retorna (nome da própria guild, stats dela, aliadas, inimigas), com None na
+    própria guild se ela não participou. Guilds sem lado contam como inimigas.
+    """
+    own_name, own_stats = None, None
+    allies, enemies = {}, {}
+    for guild, stats in battle_guilds.items():
+        side = stats.get('side', SIDE_ENEMY)
+        if side == SIDE_OWN:
+            own_name, own_stats = guild, stats
+        elif side == SIDE_ALLIANCE:
+            allies[guild] = stats
+        else:
+            enemies[guild] = stats
+    return own_name, own_stats, allies, enemies
@@ -0,0 +1,334 @@
+"""
+Backend SQLite para o histórico de batalhas.
+Guarda as mesmas três tabelas do armazenamento colunar (batalhas, guilds por batalha
+e jogadores por batalha) com índices por ID, horário, guild, aliança e jogador,
+permitindo consultas por período, guild ou jogador direto em SQL.
+Usa o modo WAL para que os leitores do Streamlit não bloqueiem o processo de ingestão.
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+import pandas as pd
+from battle_store import BATTLE_SCHEMA, GUILD_SCHEMA, PLAYER_SCHEMA, apply_schema
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS battles (
+    battle_id INTEGER PRIMARY KEY,
+    time INTEGER NOT NULL,
+    players INTEGER NOT NULL DEFAULT 0,
+    kills INTEGER NOT NULL DEFAULT 0,
+    deaths INTEGER NOT NULL DEFAULT 0,
+    fame INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_battles_time ON battles (time);
+
+CREATE TABLE IF NOT EXISTS guild_battles (
+    battle_id INTEGER NOT NULL REFERENCES battles (battle_id) ON DELETE CASCADE,
+    guild TEXT NOT NULL,
+    guild_id TEXT NOT NULL DEFAULT '',
+    total_kills INTEGER NOT NULL DEFAULT 0,
+    total_deaths INTEGER NOT NULL DEFAULT 0,
+    total_fame INTEGER NOT NULL DEFAULT 0,
+    player_count INTEGER NOT NULL DEFAULT 0,
+    alliance INTEGER NOT NULL DEFAULT 0,
+    alliance_name TEXT NOT NULL DEFAULT '',
+    guild_key INTEGER NOT NULL DEFAULT 0,
+    alliance_key INTEGER NOT NULL DEFAULT 0,
+    side INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_guild_battles_battle ON guild_battles (battle_id);
+CREATE INDEX IF NOT EXISTS idx_guild_battles_guild ON guild_battles (guild COLLATE NOCASE, battle_id);
+CREATE INDEX IF NOT EXISTS idx_guild_battles_guild_id ON guild_battles (guild_id, battle_id);
+CREATE INDEX IF NOT EXISTS idx_guild_battles_alliance ON guild_battles (alliance_name COLLATE NOCASE, battle_id);
+
+CREATE TABLE IF NOT EXISTS player_battles (
+    battle_id INTEGER NOT NULL REFERENCES battles (battle_id) ON DELETE CASCADE,
+    guild TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kills INTEGER NOT NULL DEFAULT 0,
+    deaths INTEGER NOT NULL DEFAULT 0,
+    fame INTEGER NOT NULL DEFAULT 0,
+    player_key INTEGER NOT NULL DEFAULT 0,
+    guild_key INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_player_battles_battle ON player_battles (battle_id);
+CREATE INDEX IF NOT EXISTS idx_player_battles_name ON player_battles (name COLLATE NOCASE, battle_id);
+"""
+
+# Colunas acrescentadas depois da criação do esquema (bancos antigos recebem ALTER TABLE)
+ADDED_COLUMNS = {
+    'guild_battles': ('guild_key', 'alliance_key', 'side'),
+    'player_battles': ('player_key', 'guild_key'),
+}
+
+# Índices das chaves de dimensão, criados depois das colunas
+KEY_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_guild_battles_guild_key ON guild_battles (guild_key, battle_id);
+CREATE INDEX IF NOT EXISTS idx_player_battles_player_key ON player_battles (player_key, battle_id);
+"""
+
+# Colunas de cada tabela SQL, na ordem de inserção
+BATTLE_COLUMNS = list(BATTLE_SCHEMA)
+GUILD_COLUMNS = ['battle_id', 'guild', 'guild_id', 'total_kills', 'total_deaths', 'total_fame',
+                 'player_count', 'alliance', 'alliance_name', 'guild_key', 'alliance_key', 'side']
+PLAYER_COLUMNS = list(PLAYER_SCHEMA)
+
+# Conexões por thread (objetos sqlite3 não devem ser compartilhados entre threads)
+_local = threading.local()
+
+
+def connect(db_path):
+    """
+    Retorna a conexão da thread atual com o banco, criando o esquema se necessário.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(SCHEMA_SQL)
+        _add_missing_columns(conn)
+        conn.executescript(KEY_INDEX_SQL)
+        connections[db_path] = conn
+
+    return conn
+
+
+def _add_missing_columns(conn):
+    """
+    Acrescenta às tabelas de bancos criados por versões anteriores as colunas de ADDED_COLUMNS.
+    """
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column in columns:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+    conn.commit()
+
+
+def _to_epoch_ns(times):
+    return pd.to_datetime(times, utc=True).astype('datetime64[ns, UTC]').astype('int64')
+
+
+def _rows(df, columns):
+    """
+    Converte um DataFrame em lista de tuplas com tipos nativos do Python.
+    """
+    if df.empty:
+        return []
+    return list(df[columns].astype(object).itertuples(index=False, name=None))
+
+
+def _insert_rows(conn, tables, battle_ids):
+    """
+    Insere as linhas das três tabelas para os IDs informados (dentro da transação atual).
+    """
+    battles = tables['battles'][tables['battles']['battle_id'].isin(battle_ids)].copy()
+    battles['time'] = _to_epoch_ns(battles['time'])
+    guilds = tables['guilds'][tables['guilds']['battle_id'].isin(battle_ids)].copy()
+    guilds['guild_id'] = guilds['guild_id'].fillna('').astype(str) if 'guild_id' in guilds.columns else ''
+    guilds['alliance'] = guilds['alliance'].astype(int)
+    players = tables['players'][tables['players']['battle_id'].isin(battle_ids)]
+
+    conn.executemany(
+        f"INSERT INTO battles ({','.join(BATTLE_COLUMNS)}) VALUES ({','.join('?' * len(BATTLE_COLUMNS))})",
+        _rows(battles, BATTLE_COLUMNS))
+    conn.executemany(
+        f"INSERT INTO guild_battles ({','.join(GUILD_COLUMNS)}) VALUES ({','.join('?' * len(GUILD_COLUMNS))})",
+        _rows(guilds, GUILD_COLUMNS))
+    conn.executemany(
+        f"INSERT INTO player_battles ({','.join(PLAYER_COLUMNS)}) VALUES ({','.join('?' * len(PLAYER_COLUMNS))})",
+        _rows(players, PLAYER_COLUMNS))
+
+
+def insert_tables(db_path, tables):
+    """
+    Insere as batalhas que ainda não existem no banco, numa única transação.
+    Retorna a lista de IDs efetivamente inseridos.
+    """
+    battles = tables['battles']
+    if battles.empty:
+        return []
+
+    conn = connect(db_path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+
+        candidate_ids = battles['battle_id'].tolist()
+        existing = set()
+        for start in range(0, len(candidate_ids), 500):
+            chunk = candidate_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            existing.update(row[0] for row in conn.execute(
+                f"SELECT battle_id FROM battles WHERE battle_id IN ({placeholders})", chunk))
+
+        new_ids = [battle_id for battle_id in candidate_ids if battle_id not in existing]
+        if new_ids:
+            _insert_rows(conn, tables, new_ids)
+
+    if new_ids:
+        logging.info(f"SQLite: {len(new_ids)} batalhas inseridas em {db_path}")
+    return new_ids
+
+
+def replace_tables(db_path, tables):
+    """
+    Substitui todo o conteúdo do banco pelas tabelas informadas, numa única transação.
+    """
+    conn = connect(db_path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM player_battles")
+        conn.execute("DELETE FROM guild_battles")
+        conn.execute("DELETE FROM battles")
+        _insert_rows(conn, tables, tables['battles']['battle_id'].drop_duplicates())
+
+    logging.info(f"SQLite: banco {db_path} regravado com {len(tables['battles'])} batalhas")
+
+
+def delete_before(db_path, cutoff):
+    """
+    Remove as batalhas anteriores ao instante de corte (retenção).
+    Retorna a lista de IDs removidos.
+    """
+    cutoff_ns = int(_to_epoch_ns(pd.Series([cutoff])).iloc[0])
+    conn = connect(db_path)
+    with conn:
+        removed = [row[0] for row in conn.execute(
+            "SELECT battle_id FROM battles WHERE time < ?", (cutoff_ns,))]
+        if removed:
+            conn.execute("DELETE FROM battles WHERE time < ?", (cutoff_ns,))
+    return removed
+
+
+def battle_count(db_path):
+    """
+    Retorna o número de batalhas no banco.
+    """
+    return connect(db_path).execute("SELECT COUNT(*) FROM battles").fetchone()[0]
+
+
+def _query_tables(db_path, battle_filter, params=()):
+    """
+    Retorna as três tabelas tipadas restritas às batalhas selecionadas por battle_filter,
+    uma subconsulta SQL que devolve battle_id.
+    """
+    conn = connect(db_path)
+    selected = f"SELECT battle_id FROM battles WHERE battle_id IN ({battle_filter})"
+
+    battles = pd.read_sql_query(
+        f"SELECT {','.join(BATTLE_COLUMNS)} FROM battles WHERE battle_id IN ({selected}) "
+        "ORDER BY time DESC", conn, params=params)
+    battles['time'] = pd.to_datetime(battles['time'], unit='ns', utc=True)
+
+    guilds = pd.read_sql_query(
+        f"SELECT {','.join(GUILD_COLUMNS)} FROM guild_battles WHERE battle_id IN ({selected}) "
+        "ORDER BY rowid", conn, params=params)
+    players = pd.read_sql_query(
+        f"SELECT {','.join(PLAYER_COLUMNS)} FROM player_battles WHERE battle_id IN ({selected}) "
+        "ORDER BY rowid", conn, params=params)
+
+    return {
+        'battles': apply_schema(battles, BATTLE_SCHEMA),
+        'guilds': apply_schema(guilds, GUILD_SCHEMA),
+        'players': apply_schema(players, PLAYER_SCHEMA),
+    }
+
+
+def query_all(db_path):
+    """
+    Retorna todas as batalhas do banco.
+    """
+    return _query_tables(db_path, "SELECT battle_id FROM battles")
+
+
+def query_since(db_path, since):
+    """
+    Retorna as batalhas a partir do instante informado (usa o índice de horário).
+    """
+    since_ns = int(_to_epoch_ns(pd.Series([since])).iloc[0])
+    return _query_tables(db_path, "SELECT battle_id FROM battles WHERE time >= ?", (since_ns,))
+
+
+def query_battle_summaries_since(db_path, since):
+    """
+    Retorna apenas a tabela de batalhas a partir do instante informado.
+    """
+    since_ns = int(_to_epoch_ns(pd.Series([since])).iloc[0])
+    battles = pd.read_sql_query(
+        f"SELECT {','.join(BATTLE_COLUMNS)} FROM battles WHERE time >= ? ORDER BY time DESC",
+        connect(db_path), params=(since_ns,))
+    battles['time'] = pd.to_datetime(battles['time'], unit='ns', utc=True)
+    return apply_schema(battles, BATTLE_SCHEMA)
+
+
+def query_by_ids(db_path, battle_ids):
+    """
+    Retorna as batalhas com os IDs informados.
+    """
+    battle_ids = [int(battle_id) for battle_id in battle_ids]
+    if not battle_ids:
+        battle_ids = [-1]
+    placeholders = ','.join('?' * len(battle_ids))
+    return _query_tables(db_path, f"SELECT battle_id FROM battles WHERE battle_id IN ({placeholders})",
+                         tuple(battle_ids))
+
+
+def query_by_guild(db_path, guild=None, guild_id=None, since=None):
+    """
+    Retorna as batalhas em que a guild participou, pelo nome (sem diferenciar
+    maiúsculas) ou pelo ID, opcionalmente a partir de um instante.
+    """
+    conditions = []
+    params = []
+    if guild is not None:
+        conditions.append("guild = ? COLLATE NOCASE")
+        params.append(guild)
+    if guild_id is not None:
+        conditions.append("guild_id = ?")
+        params.append(guild_id)
+
+    battle_filter = f"SELECT battle_id FROM guild_battles WHERE {' AND '.join(conditions) or '1'}"
+    if since is not None:
+        battle_filter += " AND battle_id IN (SELECT battle_id FROM battles WHERE time >= ?)"
+        params.append(int(_to_epoch_ns(pd.Series([since])).iloc[0]))
+
+    return _query_tables(db_path, battle_filter, tuple(params))
+
+
+def query_by_alliance(db_path, alliance_name, since=None):
+    """
+    Retorna as batalhas com guilds da aliança informada.
+    """
+    params = [alliance_name]
+    battle_filter = "SELECT battle_id FROM guild_battles WHERE alliance_name = ? COLLATE NOCASE"
+    if since is not None:
+        battle_filter += " AND battle_id IN (SELECT battle_id FROM battles WHERE time >= ?)"
+        params.append(int(_to_epoch_ns(pd.Series([since])).iloc[0]))
+    return _query_tables(db_path, battle_filter, tuple(params))
+
+
+def query_by_player(db_path, name, since=None):
+    """
+    Retorna as batalhas em que o jogador participou.
+    """
+    params = [name]
+    battle_filter = "SELECT battle_id FROM player_battles WHERE name = ? COLLATE NOCASE"
+    if since is not None:
+        battle_filter += " AND battle_id IN (SELECT battle_id FROM battles WHERE time >= ?)"
+        params.append(int(_to_epoch_ns(pd.Series([since])).iloc[0]))
+    return _query_tables(db_path, battle_filter, tuple(params))
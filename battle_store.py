@@ -0,0 +1,516 @@
+"""
+Armazenamento colunar normalizado do histórico de batalhas.
+Substitui a árvore aninhada details.guilds.*.players por três tabelas planas:
+batalhas, guilds por batalha e jogadores por batalha.
+Usa Parquet (pyarrow) quando disponível e NumPy .npz como alternativa.
+O histórico é particionado por dia, com um manifesto de limites de tempo e contagens,
+para que consultas por período leiam apenas as partições necessárias.
+Nomes de jogadores, guilds e alianças são colunas Categorical em memória e, nas
+partições, IDs do dicionário global de nomes (name_dictionary). As colunas *_key
+referenciam as tabelas de dimensão (dimensions), com 0 quando a entidade não tem
+ID da API conhecido. A coluna side das guilds guarda o lado de cada guild na
+batalha (battle_sides), calculado na ingestão.
+"""
+
+import os
+import json
+import shutil
+import logging
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from name_dictionary import load_names, save_names
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Tabelas do armazenamento colunar
+TABLE_NAMES = ("battles", "guilds", "players")
+
+# Esquema de cada tabela (coluna -> dtype)
+BATTLE_SCHEMA = {
+    'battle_id': 'int64',
+    'time': 'datetime64[ns, UTC]',
+    'players': 'int32',
+    'kills': 'int32',
+    'deaths': 'int32',
+    'fame': 'int64',
+}
+
+GUILD_SCHEMA = {
+    'battle_id': 'int64',
+    'guild': 'category',
+    'guild_id': 'string',
+    'guild_key': 'int32',
+    'total_kills': 'int32',
+    'total_deaths': 'int32',
+    'total_fame': 'int64',
+    'player_count': 'int32',
+    'alliance': 'bool',
+    'alliance_name': 'category',
+    'alliance_key': 'int32',
+    'side': 'int8',
+}
+
+PLAYER_SCHEMA = {
+    'battle_id': 'int64',
+    'guild': 'category',
+    'name': 'category',
+    'player_key': 'int32',
+    'guild_key': 'int32',
+    'kills': 'int32',
+    'deaths': 'int32',
+    'fame': 'int64',
+}
+
+SCHEMAS = {
+    'battles': BATTLE_SCHEMA,
+    'guilds': GUILD_SCHEMA,
+    'players': PLAYER_SCHEMA,
+}
+
+
+def apply_schema(df, schema):
+    """
+    Converte um DataFrame para o esquema informado.
+    Colunas ausentes são criadas com valores padrão e colunas extras são mantidas.
+    """
+    df = df.copy()
+    for col, dtype in schema.items():
+        # Colunas já no tipo certo (e sem valores ausentes, no caso de texto) ficam como estão
+        if col in df.columns and df[col].dtype == dtype and not (dtype == 'string' and df[col].hasnans):
+            continue
+        if col not in df.columns:
+            if dtype in ('string', 'category'):
+                df[col] = ''
+            elif dtype == 'bool':
+                df[col] = False
+            elif dtype.startswith('datetime64'):
+                df[col] = pd.NaT
+            else:
+                df[col] = 0
+
+        if dtype.startswith('datetime64'):
+            # Texto ISO 8601 com ou sem fração de segundo (ex.: journal)
+            text = pd.api.types.is_string_dtype(df[col].dtype)
+            df[col] = pd.to_datetime(df[col], utc=True, format='ISO8601' if text else None).astype(dtype)
+        elif dtype == 'string':
+            df[col] = df[col].fillna('').astype(str).astype('string')
+        elif dtype == 'category':
+            df[col] = df[col].astype(object).fillna('').astype(str).astype('category')
+        elif dtype == 'bool':
+            df[col] = df[col].fillna(False).astype(bool)
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(dtype)
+
+    ordered = list(schema) + [c for c in df.columns if c not in schema]
+    return df[ordered].reset_index(drop=True)
+
+
+def concat_frames(frames, schema):
+    """
+    Concatena tabelas com o mesmo esquema. Colunas Categorical com categorias
+    diferentes (ex.: histórico + journal) são unidas pelas categorias, sem voltar a texto.
+    """
+    frames = [frame for frame in frames if len(frame)] or list(frames)[:1]
+    if not frames:
+        return apply_schema(pd.DataFrame(), schema)
+
+    df = pd.concat(frames, ignore_index=True)
+    for col, dtype in schema.items():
+        if dtype != 'category' or col not in df.columns or df[col].dtype == 'category':
+            continue
+        if all(col in frame.columns and frame[col].dtype == 'category' for frame in frames):
+            df[col] = union_categoricals([frame[col] for frame in frames], ignore_order=True)
+    return apply_schema(df, schema)
+
+
+def empty_tables():
+    """
+    Retorna as três tabelas vazias, já tipadas.
+    """
+    return {name: apply_schema(pd.DataFrame(), SCHEMAS[name]) for name in TABLE_NAMES}
+
+
+def flatten_history(history_df):
+    """
+    Converte o DataFrame aninhado (coluna details) nas três tabelas planas.
+    """
+    if history_df is None or history_df.empty:
+        return empty_tables()
+
+    battle_rows = []
+    guild_rows = []
+    player_rows = []
+
+    for record in history_df.to_dict('records'):
+        battle_id = record.get('battle_id')
+        battle_rows.append({
+            'battle_id': battle_id,
+            'time': record.get('time'),
+            'players': record.get('players', 0),
+            'kills': record.get('kills', 0),
+            'deaths': record.get('deaths', 0),
+            'fame': record.get('fame', 0),
+        })
+
+        details = record.get('details')
+        if not isinstance(details, dict):
+            continue
+
+        for guild_name, stats in details.get('guilds', {}).items():
+            players = stats.get('players', [])
+            guild_rows.append({
+                'battle_id': battle_id,
+                'guild': guild_name,
+                'guild_id': stats.get('guild_id') or '',
+                'total_kills': stats.get('total_kills', 0),
+                'total_deaths': stats.get('total_deaths', 0),
+                'total_fame': stats.get('total_fame', 0),
+                'player_count': stats.get('player_count', len(players)),
+                'alliance': bool(stats.get('alliance', False)),
+                'alliance_name': stats.get('alliance_name') or '',
+                'side': stats.get('side', 0),
+            })
+
+            for player in players:
+                player_rows.append({
+                    'battle_id': battle_id,
+                    'guild': guild_name,
+                    'name': player.get('name', 'Unknown'),
+                    'kills': player.get('kills', 0),
+                    'deaths': player.get('deaths', 0),
+                    'fame': player.get('fame', 0),
+                })
+
+    return {
+        'battles': apply_schema(pd.DataFrame(battle_rows), BATTLE_SCHEMA),
+        'guilds': apply_schema(pd.DataFrame(guild_rows), GUILD_SCHEMA),
+        'players': apply_schema(pd.DataFrame(player_rows), PLAYER_SCHEMA),
+    }
+
+
+def build_history_frame(tables):
+    """
+    Reconstrói o DataFrame aninhado usado pelos componentes a partir das tabelas.
+    Mantém a ordem das batalhas, guilds e jogadores das tabelas.
+    O lado de cada guild (stats['side']) é o da coluna side das tabelas recebidas.
+    """
+    battles = tables['battles']
+    if battles.empty:
+        return pd.DataFrame()
+
+    details = {}
+    for battle_id, battle_time in zip(battles['battle_id'].tolist(), battles['time']):
+        details[battle_id] = {'id': battle_id, 'time': battle_time, 'guilds': {}}
+
+    guilds = tables['guilds']
+    for battle_id, guild, guild_id, kills, deaths, fame, player_count, alliance, alliance_name, side in zip(
+            guilds['battle_id'].tolist(), guilds['guild'].tolist(), guilds['guild_id'].tolist(),
+            guilds['total_kills'].tolist(), guilds['total_deaths'].tolist(),
+            guilds['total_fame'].tolist(), guilds['player_count'].tolist(),
+            guilds['alliance'].tolist(), guilds['alliance_name'].tolist(), guilds['side'].tolist()):
+        if battle_id not in details:
+            continue
+        stats = {
+            'players': [],
+            'total_kills': kills,
+            'total_deaths': deaths,
+            'total_fame': fame,
+            'player_count': player_count,
+            'side': side,
+        }
+        if guild_id:
+            stats['guild_id'] = guild_id
+        if alliance:
+            stats['alliance'] = True
+        if alliance_name:
+            stats['alliance_name'] = alliance_name
+        details[battle_id]['guilds'][guild] = stats
+
+    players = tables['players']
+    for battle_id, guild, name, kills, deaths, fame in zip(
+            players['battle_id'].tolist(), players['guild'].tolist(),
+            players['name'].tolist(), players['kills'].tolist(),
+            players['deaths'].tolist(), players['fame'].tolist()):
+        battle_guilds = details.get(battle_id, {}).get('guilds', {})
+        if guild in battle_guilds:
+            battle_guilds[guild]['players'].append({
+                'name': name,
+                'kills': kills,
+                'deaths': deaths,
+                'fame': fame
+            })
+
+    history_df = battles[list(BATTLE_SCHEMA)].copy()
+    history_df['details'] = [details[battle_id] for battle_id in battles['battle_id'].tolist()]
+    return history_df
+
+
+def filter_tables(tables, battle_ids):
+    """
+    Restringe as três tabelas a um conjunto de IDs de batalha.
+    """
+    battle_ids = np.asarray(list(battle_ids), dtype=np.int64)
+    return {
+        name: table[table['battle_id'].isin(battle_ids)].reset_index(drop=True)
+        for name, table in tables.items()
+    }
+
+
+def concat_tables(*tables_list):
+    """
+    Concatena vários conjuntos de tabelas, mantendo o esquema.
+    """
+    tables_list = [t for t in tables_list if t is not None]
+    if not tables_list:
+        return empty_tables()
+
+    return {
+        name: concat_frames([t[name] for t in tables_list], SCHEMAS[name])
+        for name in tables_list[0]
+    }
+
+
+def _table_path(store_dir, name, fmt):
+    return os.path.join(store_dir, f"{name}.{fmt}")
+
+
+def _write_npz(df, path):
+    """
+    Grava uma tabela como arquivo .npz, uma matriz NumPy por coluna.
+    """
+    arrays = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.DatetimeTZDtype):
+            arrays[col] = series.dt.tz_convert(None).to_numpy(dtype='datetime64[ns]')
+        elif pd.api.types.is_string_dtype(series.dtype) or isinstance(series.dtype, pd.CategoricalDtype):
+            arrays[col] = np.asarray(series.astype(str).tolist(), dtype=np.str_)
+        else:
+            arrays[col] = series.to_numpy()
+
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def _read_npz(path):
+    """
+    Lê uma tabela gravada por _write_npz.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        columns = {col: data[col] for col in data.files}
+    return pd.DataFrame(columns)
+
+
+def store_format(store_dir, tables=TABLE_NAMES):
+    """
+    Retorna o formato ('parquet' ou 'npz') do armazenamento em disco, ou None se não existir.
+    """
+    if HAS_ARROW and all(os.path.exists(_table_path(store_dir, n, 'parquet')) for n in tables):
+        return 'parquet'
+    if all(os.path.exists(_table_path(store_dir, n, 'npz')) for n in tables):
+        return 'npz'
+    return None
+
+
+def save_tables(tables, store_dir, names=None):
+    """
+    Grava as três tabelas no diretório informado.
+    Usa Parquet se o pyarrow estiver instalado, caso contrário .npz.
+    Com names (NameDictionary), as colunas de nomes são gravadas como IDs do
+    dicionário; sem ele, como texto (ex.: checkpoints de backup, autossuficientes).
+    A gravação é feita em arquivos temporários e depois substituída atomicamente.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    fmt = 'parquet' if HAS_ARROW else 'npz'
+
+    for name in TABLE_NAMES:
+        df = apply_schema(tables[name], SCHEMAS[name])
+        if names is not None:
+            df = names.encode_table(df)
+        path = _table_path(store_dir, name, fmt)
+        tmp_path = path + '.tmp'
+
+        if fmt == 'parquet':
+            df.to_parquet(tmp_path, index=False)
+        else:
+            _write_npz(df, tmp_path)
+
+        os.replace(tmp_path, path)
+
+    # Remover arquivos do outro formato para evitar leituras desatualizadas
+    other = 'npz' if fmt == 'parquet' else 'parquet'
+    for name in TABLE_NAMES:
+        stale = _table_path(store_dir, name, other)
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    logging.debug(f"Armazenamento colunar salvo em {store_dir} ({fmt}): "
+                  f"{len(tables['battles'])} batalhas, {len(tables['players'])} jogadores")
+
+
+def load_tables(store_dir, tables=TABLE_NAMES, names=None):
+    """
+    Carrega as tabelas tipadas do diretório informado (por padrão as três).
+    Colunas de nomes gravadas como IDs são decodificadas com names.
+    Retorna None se o armazenamento não existir.
+    """
+    fmt = store_format(store_dir, tables)
+    if fmt is None:
+        return None
+
+    loaded = {}
+    for name in tables:
+        path = _table_path(store_dir, name, fmt)
+        df = pd.read_parquet(path) if fmt == 'parquet' else _read_npz(path)
+        if names is not None:
+            names.decode_table(df)
+        loaded[name] = apply_schema(df, SCHEMAS[name])
+
+    return loaded
+
+
+# Particionamento por tempo
+PARTITION_DIR = "partitions"  # Subdiretório com uma pasta por partição
+PARTITION_MANIFEST = "manifest.json"  # Limites de tempo e contagens de cada partição
+PARTITION_FORMAT = "%Y-%m-%d"  # Partições diárias (UTC); "%Y-%m-%dT%H" gera partições por hora
+
+
+def load_manifest(store_dir):
+    """
+    Carrega o manifesto de partições. Retorna None se o armazenamento não for particionado.
+    """
+    path = os.path.join(store_dir, PARTITION_MANIFEST)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _save_manifest(store_dir, manifest):
+    manifest['version'] = manifest.get('version', 0) + 1
+    path = os.path.join(store_dir, PARTITION_MANIFEST)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _partition_path(store_dir, key):
+    return os.path.join(store_dir, PARTITION_DIR, key)
+
+
+def split_by_partition(tables):
+    """
+    Divide as tabelas por partição de tempo. Retorna {chave: tabelas}.
+    """
+    battles = tables['battles']
+    if battles.empty:
+        return {}
+
+    keys = battles['time'].dt.strftime(PARTITION_FORMAT)
+    return {
+        key: filter_tables(tables, battles.loc[keys == key, 'battle_id'])
+        for key in keys.unique()
+    }
+
+
+def save_partitions(partitions, store_dir, drop_keys=()):
+    """
+    Grava cada partição informada (substituindo o conteúdo anterior dela),
+    remove as partições de drop_keys e atualiza o manifesto.
+    Os nomes novos entram no dicionário, gravado antes das partições.
+    """
+    manifest = load_manifest(store_dir) or {'version': 0, 'partitions': {}}
+
+    names = load_names(store_dir)
+    for tables in partitions.values():
+        for name in TABLE_NAMES:
+            names.register_table(tables[name])
+    save_names(names, store_dir)
+
+    for key, tables in partitions.items():
+        battles = tables['battles']
+        if battles.empty:
+            drop_keys = list(drop_keys) + [key]
+            continue
+
+        save_tables(tables, _partition_path(store_dir, key), names)
+        manifest['partitions'][key] = {
+            'min_time': battles['time'].min().isoformat(),
+            'max_time': battles['time'].max().isoformat(),
+            'battles': len(battles),
+            'guilds': len(tables['guilds']),
+            'players': len(tables['players']),
+        }
+
+    for key in drop_keys:
+        path = _partition_path(store_dir, key)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        manifest['partitions'].pop(key, None)
+
+    _save_manifest(store_dir, manifest)
+
+
+def partition_keys(manifest, since=None, until=None):
+    """
+    Retorna as chaves das partições cujo intervalo de tempo se sobrepõe a [since, until].
+    """
+    keys = []
+    for key, info in manifest['partitions'].items():
+        if since is not None and pd.Timestamp(info['max_time']) < since:
+            continue
+        if until is not None and pd.Timestamp(info['min_time']) > until:
+            continue
+        keys.append(key)
+    return sorted(keys, reverse=True)
+
+
+def load_partitions(store_dir, keys=None, since=None, until=None, tables=TABLE_NAMES):
+    """
+    Carrega e concatena apenas as partições selecionadas (por chave ou por intervalo de tempo).
+    Retorna None se o armazenamento não for particionado.
+    """
+    manifest = load_manifest(store_dir)
+    if manifest is None:
+        return None
+
+    if keys is None:
+        keys = partition_keys(manifest, since, until)
+
+    names = load_names(store_dir)
+    loaded = []
+    for key in keys:
+        part = load_tables(_partition_path(store_dir, key), tables=tables, names=names)
+        if part is None:
+            logging.warning(f"Partição {key} listada no manifesto mas ausente em disco")
+            continue
+        loaded.append(part)
+
+    if not loaded:
+        return {name: apply_schema(pd.DataFrame(), SCHEMAS[name]) for name in tables}
+
+    return {
+        name: concat_frames([part[name] for part in loaded], SCHEMAS[name])
+        for name in tables
+    }
+
+
+def remove_tables(store_dir):
+    """
+    Remove os arquivos de tabelas (não particionados) do diretório informado.
+    """
+    for name in TABLE_NAMES:
+        for fmt in ('parquet', 'npz'):
+            path = _table_path(store_dir, name, fmt)
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,118 @@
+"""
+Benchmark da leitura de dumps de batalhas: json.load x iter_json_array.
+Gera um dump sintético (replicando as batalhas de data.json com IDs novos) e
+mede, cada modo em um subprocesso separado, o tempo e o pico de memória (RSS).
+
+Uso:
+    python bench_json_stream.py [--size-mb 300] [--process] [--keep]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SOURCE_FILE = "data.json"  # Batalhas usadas como modelo para o dump sintético
+
+
+def generate_dump(path, size_mb):
+    """
+    Escreve em path um array JSON com aproximadamente size_mb megabytes.
+    """
+    with open(SOURCE_FILE, 'r') as f:
+        template = json.load(f)
+
+    target = size_mb * 1024 * 1024
+    written = 0
+    battle_id = 10 ** 9
+    with open(path, 'w') as out:
+        out.write('[')
+        first = True
+        while written < target:
+            for battle in template:
+                battle_id += 1
+                battle['id'] = battle_id
+                chunk = json.dumps(battle)
+                if not first:
+                    out.write(',\n')
+                out.write(chunk)
+                first = False
+                written += len(chunk) + 2
+                if written >= target:
+                    break
+        out.write(']')
+    return battle_id - 10 ** 9
+
+
+def run_mode(mode, path, process):
+    """
+    Executa um modo de leitura e imprime uma linha JSON com os resultados.
+    """
+    start = time.perf_counter()
+    battles = 0
+    players = 0
+
+    if mode == 'load':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        source = data
+    else:
+        from json_stream import iter_json_array
+        source = iter_json_array(path)
+
+    if process:
+        from api_data_processor import process_raw_battle_data
+        battles = len(process_raw_battle_data(source, skip_known=False))
+    else:
+        for battle in source:
+            battles += 1
+            players += len(battle.get('players', {}))
+
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'mode': mode, 'battles': battles, 'players': players,
+                      'seconds': elapsed, 'peak_mb': peak_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=300, help='Tamanho do dump sintético')
+    parser.add_argument('--process', action='store_true', help='Inclui process_raw_battle_data na medição')
+    parser.add_argument('--keep', action='store_true', help='Não apaga o dump gerado')
+    parser.add_argument('--run', choices=['load', 'stream'], help=argparse.SUPPRESS)
+    parser.add_argument('--file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_mode(args.run, args.file, args.process)
+        return
+
+    fd, path = tempfile.mkstemp(suffix='.json', prefix='bench_dump_')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        count = generate_dump(path, args.size_mb)
+        size = os.path.getsize(path) / (1024 * 1024)
+        print(f"Dump sintético: {count} batalhas, {size:.0f} MB ({time.perf_counter() - start:.1f}s para gerar)")
+
+        for mode in ('load', 'stream'):
+            cmd = [sys.executable, __file__, '--run', mode, '--file', path]
+            if args.process:
+                cmd.append('--process')
+            output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>6}: {result['battles']} batalhas em {result['seconds']:.2f}s, "
+                  f"pico de memória {result['peak_mb']:.0f} MB")
+    finally:
+        if args.keep:
+            print(f"Dump mantido em {path}")
+        else:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
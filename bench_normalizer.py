@@ -0,0 +1,125 @@
+"""
+Benchmark da normalização de batalhas brutas: laço por jogador (implementação
+anterior, reproduzida aqui como referência) x battle_normalizer.normalize_battles.
+As batalhas são geradas em memória replicando as de data.json com IDs novos.
+Com --workers, mede também normalize_battles_parallel com cada número de processos.
+
+Uso:
+    python bench_normalizer.py [--battles 10000] [--repeat 3] [--workers 1 2 4 8]
+"""
+
+import argparse
+import copy
+import json
+import os
+import time
+from datetime import datetime
+import pandas as pd
+from battle_normalizer import normalize_battles, normalize_battles_parallel
+from battle_store import build_history_frame, flatten_history
+
+SOURCE_FILE = "data.json"  # Batalhas usadas como modelo
+GUILD_ID = "gUFLG-kcRFC1iOJDdwW2BQ"  # Guild acompanhada (We Profit)
+
+
+def generate_battles(count):
+    """
+    Retorna count batalhas brutas, cópias das batalhas de data.json com IDs novos.
+    """
+    with open(SOURCE_FILE, 'r') as f:
+        templates = json.load(f)
+
+    battles = []
+    for i in range(count):
+        battle = copy.copy(templates[i % len(templates)])
+        battle['id'] = 10 ** 9 + i
+        battles.append(battle)
+    return battles
+
+
+def reference_loop(battles):
+    """
+    Laço por jogador com dicionários aninhados, como era feito antes do normalizador.
+    """
+    processed_battles = []
+    for battle in battles:
+        battle_time = datetime.fromisoformat(battle['startTime'].replace('Z', '+00:00'))
+        all_players = list(battle['players'].values())
+        guild_players = [p for p in all_players if p.get('guildId') == GUILD_ID]
+        if not guild_players:
+            continue
+
+        guilds_stats = {}
+        for player in all_players:
+            guild_name = player.get('guildName', 'Unknown')
+            if guild_name not in guilds_stats:
+                guilds_stats[guild_name] = {'players': [], 'total_kills': 0, 'total_deaths': 0, 'total_fame': 0}
+            player_stats = {
+                'name': player.get('name', 'Unknown'),
+                'kills': player.get('kills', 0),
+                'deaths': player.get('deaths', 0),
+                'fame': player.get('killFame', 0)
+            }
+            guilds_stats[guild_name]['players'].append(player_stats)
+            guilds_stats[guild_name]['total_kills'] += player_stats['kills']
+            guilds_stats[guild_name]['total_deaths'] += player_stats['deaths']
+            guilds_stats[guild_name]['total_fame'] += player_stats['fame']
+
+        processed_battles.append({
+            'battle_id': battle['id'],
+            'time': battle_time,
+            'players': len(guild_players),
+            'kills': sum(p.get('kills', 0) for p in guild_players),
+            'deaths': sum(p.get('deaths', 0) for p in guild_players),
+            'fame': battle['totalFame'],
+            'details': {'id': battle['id'], 'time': battle_time, 'guilds': guilds_stats}
+        })
+    return pd.DataFrame(processed_battles)
+
+
+def measure(func, battles, repeat):
+    """
+    Menor tempo (segundos) de repeat execuções de func(battles), e o resultado.
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(battles)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--battles', type=int, default=10000, help='Número de batalhas sintéticas')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições (vale o menor tempo)')
+    parser.add_argument('--workers', type=int, nargs='*', default=[],
+                        help='Números de processos a medir com normalize_battles_parallel')
+    args = parser.parse_args()
+
+    battles = generate_battles(args.battles)
+    players = sum(len(b['players']) for b in battles)
+    print(f"{len(battles)} batalhas, {players} jogadores, {os.cpu_count()} CPUs")
+
+    # "tabelas" é o que a ingestão grava no histórico; "details" é o formato aninhado dos componentes
+    modes = [
+        ('laço (details)', reference_loop),
+        ('laço + tabelas', lambda b: flatten_history(reference_loop(b))),
+        ('normalizador (tabelas)', lambda b: normalize_battles(b, GUILD_ID)),
+        ('normalizador + details', lambda b: build_history_frame(normalize_battles(b, GUILD_ID))),
+    ]
+    # O tempo dos modos paralelos inclui a criação dos processos e o envio dos lotes
+    for workers in args.workers:
+        modes.append((f'paralelo, {workers} processos',
+                      lambda b, workers=workers: normalize_battles_parallel(b, GUILD_ID, workers)))
+    for label, func in modes:
+        seconds, result = measure(func, battles, args.repeat)
+        count = len(result['battles']) if isinstance(result, dict) else len(result)
+        print(f"{label:>26}: {seconds:.2f}s, {seconds / len(battles) * 1e6:.0f} µs por batalha "
+              f"({count} batalhas com a guild)")
+
+
+if __name__ == "__main__":
+    main()
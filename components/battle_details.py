@@ -3,6 +3,8 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from utils import format_number, create_kd_gauge
+from battle_sides import split_sides
+from battle_history_manager import get_battles_from_perspective
 
 def show_battle_details(battle_data, guild_name, alliance_name):
     """Display detailed information about a specific battle"""
@@ -27,6 +29,8 @@ def show_battle_details(battle_data, guild_name, alliance_name):
         st.error("Detalhes da batalha não encontrados ou em formato inválido")
         return
 
+    # Lados das guilds do ponto de vista da guild (e aliança) selecionada
+    battle_data = get_battles_from_perspective(pd.DataFrame([battle_data]), guild_name, alliance_name).iloc[0]
     battle_details = battle_data['details']
 
     # Verificar se o campo guilds existe nos detalhes
@@ -35,31 +39,8 @@ def show_battle_details(battle_data, guild_name, alliance_name):
         st.json(battle_details)  # Mostrar os detalhes disponíveis para debug
         return
 
-    # Find our guild in the battle
-    guild_stats = None
-    enemy_guilds = {}
-    alliance_guilds = {}
-    guild_key = ''
-
-    for guild, stats in battle_details['guilds'].items():
-        if guild_name.lower() in guild.lower():
-            guild_stats = stats
-            guild_key = guild
-        # Verificar se a guild é da aliança pela flag alliance, pelo nome de aliança ou pelo ID
-        elif 'alliance' in stats and stats['alliance'] == True:
-            alliance_guilds[guild] = stats
-        elif 'alliance_name' in stats and stats['alliance_name'] == alliance_name:
-            alliance_guilds[guild] = stats
-            # Marcar como aliança se ainda não estiver marcada
-            if 'alliance' not in stats:
-                stats['alliance'] = True
-        elif alliance_name and alliance_name.lower() in guild.lower():
-            alliance_guilds[guild] = stats
-            # Marcar como aliança se ainda não estiver marcada
-            if 'alliance' not in stats:
-                stats['alliance'] = True
-        else:
-            enemy_guilds[guild] = stats
+    # Find our guild, alliance and enemy guilds (sides from the selected guild's perspective)
+    guild_key, guild_stats, alliance_guilds, enemy_guilds = split_sides(battle_details['guilds'])
 
     if not guild_stats:
         st.error(f"Guild '{guild_name}' not found in this battle")
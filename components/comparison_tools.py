@@ -3,6 +3,8 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from utils import create_guild_comparison_chart
+from battle_sides import split_sides
+from battle_history_manager import get_battles_from_perspective
 
 def show_comparison_tools(battles_df, guild_name, alliance_name):
     """Display tools to compare guild performance with enemies"""
@@ -19,6 +21,9 @@ def show_comparison_tools(battles_df, guild_name, alliance_name):
     if battles_df.empty:
         st.warning("No battle data available for comparison.")
         return
+
+    # Lados das guilds do ponto de vista da guild (e aliança) selecionada
+    battles_df = get_battles_from_perspective(battles_df, guild_name, alliance_name)
     
     # Process guild and enemy data from battles
     guild_stats = {
@@ -33,20 +38,8 @@ def show_comparison_tools(battles_df, guild_name, alliance_name):
     enemy_guilds = {}
     
     for _, battle in battles_df.iterrows():
-        details = battle['details']
-        guild_data = None
-        enemies_data = {}
-        
-        # Find our guild and enemies
-        for guild, stats in details['guilds'].items():
-            if guild_name.lower() in guild.lower():
-                guild_data = stats
-            elif alliance_name and alliance_name.lower() in guild.lower():
-                # This is an alliance guild
-                pass
-            else:
-                # This is an enemy guild
-                enemies_data[guild] = stats
+        # Find our guild and enemies (sides from the selected guild's perspective)
+        _, guild_data, _, enemies_data = split_sides(battle['details']['guilds'])
         
         if guild_data:
             # Update guild stats
@@ -179,17 +172,9 @@ def show_comparison_tools(battles_df, guild_name, alliance_name):
             enemy_battles = []
             
             for _, battle in battles_df.iterrows():
-                details = battle['details']
-                guild_found = False
-                enemy_found = False
+                _, guild_stats, _, enemies = split_sides(battle['details']['guilds'])
                 
-                for guild, _ in details['guilds'].items():
-                    if guild_name.lower() in guild.lower():
-                        guild_found = True
-                    elif selected_enemy.lower() in guild.lower():
-                        enemy_found = True
-                
-                if guild_found and enemy_found:
+                if guild_stats and selected_enemy in enemies:
                     enemy_battles.append(battle)
             
             if enemy_battles:
@@ -201,15 +186,8 @@ def show_comparison_tools(battles_df, guild_name, alliance_name):
                 # Calculate win/loss record
                 wins = 0
                 for _, battle in enemy_battles_df.iterrows():
-                    details = battle['details']
-                    guild_stats = None
-                    enemy_stats = None
-                    
-                    for guild, stats in details['guilds'].items():
-                        if guild_name.lower() in guild.lower():
-                            guild_stats = stats
-                        elif selected_enemy.lower() in guild.lower():
-                            enemy_stats = stats
+                    _, guild_stats, _, enemies = split_sides(battle['details']['guilds'])
+                    enemy_stats = enemies.get(selected_enemy)
                     
                     if guild_stats and enemy_stats:
                         guild_kd = guild_stats['total_kills'] / max(1, guild_stats['total_deaths'])
@@ -259,15 +237,8 @@ def show_comparison_tools(battles_df, guild_name, alliance_name):
                     battle_time = battle['time'].strftime('%Y-%m-%d %H:%M')
                     
                     # Get guild and enemy stats from this battle
-                    details = battle['details']
-                    guild_stats = None
-                    enemy_stats = None
-                    
-                    for guild, stats in details['guilds'].items():
-                        if guild_name.lower() in guild.lower():
-                            guild_stats = stats
-                        elif selected_enemy.lower() in guild.lower():
-                            enemy_stats = stats
+                    _, guild_stats, _, enemies = split_sides(battle['details']['guilds'])
+                    enemy_stats = enemies.get(selected_enemy)
                     
                     if guild_stats and enemy_stats:
                         guild_kd = guild_stats['total_kills'] / max(1, guild_stats['total_deaths'])
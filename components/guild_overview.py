@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from utils import format_number, create_kd_gauge
+from battle_sides import split_sides
+from battle_history_manager import get_battles_from_perspective
 
 def show_guild_overview(battles_df, guild_name, alliance_name=None):
     st.header("📊 Visão Geral da Guild")
@@ -10,6 +12,9 @@ def show_guild_overview(battles_df, guild_name, alliance_name=None):
         st.warning("Nenhum dado de batalha disponível.")
         return
 
+    # Lados das guilds do ponto de vista da guild (e aliança) selecionada
+    battles_df = get_battles_from_perspective(battles_df, guild_name, alliance_name)
+
     # Calcular estatísticas gerais
     total_battles = len(battles_df)
     total_players = set()
@@ -18,9 +23,9 @@ def show_guild_overview(battles_df, guild_name, alliance_name=None):
     victories = 0
 
     for _, battle in battles_df.iterrows():
-        details = battle['details']
-        if guild_name in details['guilds']:
-            guild_stats = details['guilds'][guild_name]
+        # Nossa guild e as guilds inimigas, do ponto de vista selecionado
+        _, guild_stats, _, enemy_guilds = split_sides(battle['details']['guilds'])
+        if guild_stats:
             total_kills += guild_stats['total_kills']
             total_deaths += guild_stats['total_deaths']
 
@@ -30,16 +35,8 @@ def show_guild_overview(battles_df, guild_name, alliance_name=None):
 
             # Verificar vitória
             guild_kd = guild_stats['total_kills'] / max(1, guild_stats['total_deaths'])
-            enemy_kills = sum(
-                stats['total_kills'] 
-                for g, stats in details['guilds'].items() 
-                if g != guild_name
-            )
-            enemy_deaths = sum(
-                stats['total_deaths']
-                for g, stats in details['guilds'].items()
-                if g != guild_name
-            )
+            enemy_kills = sum(stats['total_kills'] for stats in enemy_guilds.values())
+            enemy_deaths = sum(stats['total_deaths'] for stats in enemy_guilds.values())
             enemy_kd = enemy_kills / max(1, enemy_deaths)
 
             if guild_kd > enemy_kd:
@@ -88,9 +85,9 @@ def show_guild_overview(battles_df, guild_name, alliance_name=None):
     # Processar dados dos jogadores
     players_data = {}
     for _, battle in battles_df.iterrows():
-        details = battle['details']
-        if guild_name in details['guilds']:
-            for player in details['guilds'][guild_name]['players']:
+        _, guild_stats, _, _ = split_sides(battle['details']['guilds'])
+        if guild_stats:
+            for player in guild_stats['players']:
                 name = player['name']
                 if name not in players_data:
                     players_data[name] = {
@@ -184,17 +181,9 @@ def show_guild_overview(battles_df, guild_name, alliance_name=None):
 
     for _, battle in recent_battles.iterrows():
         battle_time = battle['time'].strftime('%d/%m/%Y %H:%M')
-        details = battle['details']
-        
-        guild_stats = None
-        enemy_guilds = []
         
-        # Identificar nossa guild e as guilds inimigas
-        for guild, stats in details['guilds'].items():
-            if guild_name.lower() in guild.lower():
-                guild_stats = stats
-            else:
-                enemy_guilds.append(guild)
+        # Nossa guild e as guilds inimigas, do ponto de vista selecionado
+        _, guild_stats, _, enemy_guilds = split_sides(battle['details']['guilds'])
                 
         if guild_stats:
             guild_kd = guild_stats['total_kills'] / max(1, guild_stats['total_deaths'])
@@ -214,16 +203,8 @@ def show_guild_overview(battles_df, guild_name, alliance_name=None):
             </div>
             """, unsafe_allow_html=True)
 
-            enemy_kills = sum(
-                stats['total_kills'] 
-                for g, stats in details['guilds'].items() 
-                if g != guild_name
-            )
-            enemy_deaths = sum(
-                stats['total_deaths']
-                for g, stats in details['guilds'].items() 
-                if g != guild_name
-            )
+            enemy_kills = sum(stats['total_kills'] for stats in enemy_guilds.values())
+            enemy_deaths = sum(stats['total_deaths'] for stats in enemy_guilds.values())
             enemy_kd = enemy_kills / max(1, enemy_deaths)
 
             victory = guild_kd > enemy_kd
@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from utils import create_player_chart
+from battle_sides import split_sides
+from battle_history_manager import get_battles_from_perspective
 
 def show_player_rankings(battles_df, guild_name):
     """Display player rankings with various metrics"""
@@ -30,31 +32,33 @@ def show_player_rankings(battles_df, guild_name):
         st.warning("No battle data available for player rankings.")
         return
 
+    # Lados das guilds do ponto de vista da guild selecionada
+    battles_df = get_battles_from_perspective(battles_df, guild_name)
+
     # Process player data from battles
     players_data = {}
 
     for _, battle in battles_df.iterrows():
-        details = battle['details']
-
-        for guild, stats in details['guilds'].items():
-            if guild_name.lower() in guild.lower():
-                for player in stats['players']:
-                    name = player['name']
-                    if name not in players_data:
-                        players_data[name] = {
-                            'name': name,
-                            'kills': 0,
-                            'deaths': 0,
-                            'fame': 0,
-                            'battles': 0,
-                            'avg_kills': 0,
-                            'avg_deaths': 0
-                        }
-
-                    players_data[name]['kills'] += player['kills']
-                    players_data[name]['deaths'] += player['deaths']
-                    players_data[name]['fame'] += player['fame']
-                    players_data[name]['battles'] += 1
+        _, guild_stats, _, _ = split_sides(battle['details']['guilds'])
+
+        if guild_stats:
+            for player in guild_stats['players']:
+                name = player['name']
+                if name not in players_data:
+                    players_data[name] = {
+                        'name': name,
+                        'kills': 0,
+                        'deaths': 0,
+                        'fame': 0,
+                        'battles': 0,
+                        'avg_kills': 0,
+                        'avg_deaths': 0
+                    }
+
+                players_data[name]['kills'] += player['kills']
+                players_data[name]['deaths'] += player['deaths']
+                players_data[name]['fame'] += player['fame']
+                players_data[name]['battles'] += 1
 
     # Calculate derived metrics
     for name, data in players_data.items():
@@ -1,7 +1,8 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from battle_history_manager import get_daily_stats as history_get_daily_stats
+from battle_history_manager import get_daily_stats as history_get_daily_stats, get_battles_from_perspective
+from battle_sides import split_sides
 
 def get_battles_with_min_members(battles_df, guild_name, min_members=20, days=7):
     """
@@ -18,21 +19,19 @@ def get_battles_with_min_members(battles_df, guild_name, min_members=20, days=7)
     if recent_battles.empty:
         return pd.DataFrame()
 
+    # Lados das guilds do ponto de vista da guild selecionada
+    recent_battles = get_battles_from_perspective(recent_battles, guild_name)
+
     # Filter by guild member count
     filtered_battles = []
 
     for _, battle in recent_battles.iterrows():
-        details = battle['details']
-        guild_found = False
-
-        # Check each guild in the battle
-        for guild, stats in details['guilds'].items():
-            if guild_name.lower() in guild.lower():
-                guild_found = True
-                # Check if the guild has enough members
-                if len(stats['players']) >= min_members:
-                    filtered_battles.append(battle)
-                break
+        # Find our guild (sides from the selected guild's perspective)
+        _, guild_stats, _, _ = split_sides(battle['details']['guilds'])
+
+        # Check if the guild has enough members
+        if guild_stats and len(guild_stats['players']) >= min_members:
+            filtered_battles.append(battle)
 
     return pd.DataFrame(filtered_battles)
 
@@ -41,6 +40,9 @@ def get_guild_stats(battles_df, guild_name, alliance_name=None):
     if battles_df.empty:
         return {}
 
+    # Lados das guilds do ponto de vista da guild (e aliança) selecionada
+    battles_df = get_battles_from_perspective(battles_df, guild_name, alliance_name)
+
     total_battles = len(battles_df)
     total_kills = 0
     total_deaths = 0
@@ -49,37 +51,26 @@ def get_guild_stats(battles_df, guild_name, alliance_name=None):
     players_data = {}
 
     for _, battle in battles_df.iterrows():
-        details = battle['details']
-        guild_stats = None
-        enemies_stats = {}
-
-        # Find the specified guild and alliance members
-        for guild, stats in details['guilds'].items():
-            if guild_name.lower() in guild.lower():
-                guild_stats = stats
-                # Process player data
-                for player in stats['players']:
-                    name = player['name']
-                    if name not in players_data:
-                        players_data[name] = {
-                            'kills': 0,
-                            'deaths': 0,
-                            'fame': 0,
-                            'battles': 0
-                        }
-
-                    players_data[name]['kills'] += player['kills']
-                    players_data[name]['deaths'] += player['deaths']
-                    players_data[name]['fame'] += player['fame']
-                    players_data[name]['battles'] += 1
-            elif alliance_name and alliance_name.lower() in guild.lower():
-                # This is an alliance guild
-                pass
-            else:
-                # This is an enemy guild
-                enemies_stats[guild] = stats
+        # Find our guild (sides from the selected guild's perspective)
+        _, guild_stats, _, _ = split_sides(battle['details']['guilds'])
 
         if guild_stats:
+            # Process player data
+            for player in guild_stats['players']:
+                name = player['name']
+                if name not in players_data:
+                    players_data[name] = {
+                        'kills': 0,
+                        'deaths': 0,
+                        'fame': 0,
+                        'battles': 0
+                    }
+
+                players_data[name]['kills'] += player['kills']
+                players_data[name]['deaths'] += player['deaths']
+                players_data[name]['fame'] += player['fame']
+                players_data[name]['battles'] += 1
+
             total_kills += guild_stats['total_kills']
             total_deaths += guild_stats['total_deaths']
             total_fame += guild_stats['total_fame']
@@ -138,28 +129,30 @@ def get_top_players(battles_df, guild_name, metric='kills', limit=3):
     if battles_df.empty:
         return []
 
+    # Lados das guilds do ponto de vista da guild selecionada
+    battles_df = get_battles_from_perspective(battles_df, guild_name)
+
     players_data = {}
 
     for _, battle in battles_df.iterrows():
-        details = battle['details']
-
-        for guild, stats in details['guilds'].items():
-            if guild_name.lower() in guild.lower():
-                for player in stats['players']:
-                    name = player['name']
-                    if name not in players_data:
-                        players_data[name] = {
-                            'name': name,
-                            'kills': 0,
-                            'deaths': 0,
-                            'fame': 0,
-                            'battles': 0
-                        }
-
-                    players_data[name]['kills'] += player['kills']
-                    players_data[name]['deaths'] += player['deaths']
-                    players_data[name]['fame'] += player['fame']
-                    players_data[name]['battles'] += 1
+        _, guild_stats, _, _ = split_sides(battle['details']['guilds'])
+
+        if guild_stats:
+            for player in guild_stats['players']:
+                name = player['name']
+                if name not in players_data:
+                    players_data[name] = {
+                        'name': name,
+                        'kills': 0,
+                        'deaths': 0,
+                        'fame': 0,
+                        'battles': 0
+                    }
+
+                players_data[name]['kills'] += player['kills']
+                players_data[name]['deaths'] += player['deaths']
+                players_data[name]['fame'] += player['fame']
+                players_data[name]['battles'] += 1
 
     # Convert to DataFrame
     players_df = pd.DataFrame.from_dict(players_data, orient='index')
@@ -226,18 +219,16 @@ def get_enemy_guilds(battles_df, guild_name, alliance_name=None):
     if battles_df.empty:
         return {}
 
+    # Lados das guilds do ponto de vista da guild (e aliança) selecionada
+    battles_df = get_battles_from_perspective(battles_df, guild_name, alliance_name)
+
     enemy_guilds = {}
 
     for _, battle in battles_df.iterrows():
-        details = battle['details']
-
-        for guild, stats in details['guilds'].items():
-            # Skip our guild and alliance
-            if guild_name.lower() in guild.lower():
-                continue
-            if alliance_name and alliance_name.lower() in guild.lower():
-                continue
+        # Only enemy guilds (sides from the selected guild's perspective)
+        _, _, _, enemies = split_sides(battle['details']['guilds'])
 
+        for guild, stats in enemies.items():
             if guild not in enemy_guilds:
                 enemy_guilds[guild] = {
                     'name': guild,
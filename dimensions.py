@@ -0,0 +1,339 @@
+"""
+Tabelas de dimensão de jogadores, guilds e alianças, identificadas pelos IDs da
+API (id, guildId, allianceId) em vez dos nomes exibidos. Cada entidade recebe
+uma chave substituta inteira (1, 2, ...; 0 = sem ID conhecido), que as tabelas
+de fatos (guilds e jogadores por batalha) guardam nas colunas *_key. Assim,
+junções e agregações por entidade são operações sobre arrays de inteiros, e
+duas entidades com o mesmo nome não se misturam.
+
+Cada dimensão guarda, por chave: ID da API, nome atual, entidade "pai" atual
+(guild do jogador, aliança da guild), primeira e última aparição, e o histórico
+de nomes (cada nome usado, com a primeira e a última batalha em que apareceu).
+
+    python dimensions.py show players "Fulano"      # entidades com o nome e histórico de nomes
+    python dimensions.py stats
+    python dimensions.py backfill                   # preenche as chaves do histórico a partir do arquivo de dados brutos
+"""
+
+import argparse
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+from battle_normalizer import API_ID_COLUMNS
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes
+DIMENSION_DIR = os.path.join("battle_store", "dimensions")  # Um arquivo .npz por dimensão
+DIMENSION_KINDS = ("players", "guilds", "alliances")
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def _empty_entities():
+    return pd.DataFrame({
+        'key': pd.Series(dtype='int32'),
+        'api_id': pd.Series(dtype='str'),
+        'name': pd.Series(dtype='str'),
+        'parent_key': pd.Series(dtype='int32'),
+        'first_seen': pd.Series(dtype='datetime64[ns, UTC]'),
+        'last_seen': pd.Series(dtype='datetime64[ns, UTC]'),
+    })
+
+
+def _empty_names():
+    return pd.DataFrame({
+        'key': pd.Series(dtype='int32'),
+        'name': pd.Series(dtype='str'),
+        'first_seen': pd.Series(dtype='datetime64[ns, UTC]'),
+        'last_seen': pd.Series(dtype='datetime64[ns, UTC]'),
+    })
+
+
+class Dimension:
+    """
+    Uma tabela de dimensão: entities (uma linha por chave, na ordem das chaves)
+    e names (histórico de nomes, uma linha por chave e nome).
+    """
+
+    def __init__(self, kind, entities=None, names=None):
+        self.kind = kind
+        self.entities = _empty_entities() if entities is None else entities
+        self.names = _empty_names() if names is None else names
+        self.changed = False
+        self._index = None
+
+    def _api_index(self):
+        if self._index is None or len(self._index) != len(self.entities):
+            self._index = pd.Index(self.entities['api_id'].to_numpy(dtype=object))
+        return self._index
+
+    def lookup(self, api_ids):
+        """
+        Chaves (int32) dos IDs da API; 0 para IDs vazios ou desconhecidos.
+        """
+        positions = self._api_index().get_indexer(pd.Index(np.asarray(api_ids, dtype=object)))
+        return (positions + 1).astype(np.int32)
+
+    def observe(self, api_ids, names, times, parent_keys=None):
+        """
+        Registra as aparições (ID da API sem valores ausentes, nome, instante da
+        batalha, chave do pai),
+        criando as entidades novas e atualizando nome, pai, primeira/última aparição
+        e histórico de nomes. Retorna as chaves (int32) de cada aparição.
+        """
+        observed = pd.DataFrame({
+            'api_id': np.asarray(api_ids, dtype=object),
+            'name': pd.Series(names).reset_index(drop=True),
+            'time': pd.Series(times).reset_index(drop=True),
+            'parent_key': 0 if parent_keys is None else np.asarray(parent_keys, dtype=np.int32),
+        })
+        keys = np.zeros(len(observed), dtype=np.int32)
+        valid = (observed['api_id'] != '').to_numpy()
+        if not valid.any():
+            return keys
+        observed = observed[valid]
+
+        # Entidades novas recebem as próximas chaves, na ordem em que aparecem
+        positions = self._api_index().get_indexer(pd.Index(observed['api_id']))
+        new_ids = pd.unique(observed['api_id'].to_numpy()[positions < 0])
+        if len(new_ids):
+            start = len(self.entities)
+            positions[positions < 0] = start + pd.Index(new_ids).get_indexer(observed['api_id'][positions < 0])
+            added = _empty_entities().reindex(range(len(new_ids)))
+            added['key'] = np.arange(start + 1, start + 1 + len(new_ids), dtype=np.int32)
+            added['api_id'] = new_ids
+            added['parent_key'] = 0
+            self.entities = pd.concat([self.entities, added.astype(_empty_entities().dtypes.to_dict())],
+                                      ignore_index=True)
+        observed['key'] = (positions + 1).astype(np.int32)
+        keys[valid] = observed['key'].to_numpy()
+
+        # Pai atual: o da aparição mais recente, se ela não for anterior à última já registrada
+        latest = observed.sort_values('time', kind='stable').drop_duplicates('key', keep='last')
+        rows = latest['key'].to_numpy() - 1
+        last_seen = self.entities['last_seen'].to_numpy()[rows]
+        newer = pd.isna(last_seen) | (latest['time'].to_numpy() >= last_seen)
+        parent_keys = self.entities['parent_key'].to_numpy().copy()
+        parent_keys[rows[newer]] = latest['parent_key'].to_numpy()[newer]
+        self.entities['parent_key'] = parent_keys
+
+        # Histórico de nomes e, a partir dele, nome atual e primeira/última aparição
+        seen = observed.groupby(['key', 'name'], sort=False, observed=True).agg(
+            first_seen=('time', 'min'), last_seen=('time', 'max')).reset_index()
+        seen['name'] = seen['name'].astype(str)
+        self.names = pd.concat([self.names, seen], ignore_index=True).groupby(
+            ['key', 'name'], sort=False).agg(first_seen=('first_seen', 'min'),
+                                             last_seen=('last_seen', 'max')).reset_index()
+        self.names['key'] = self.names['key'].astype(np.int32)
+
+        touched = np.unique(observed['key'].to_numpy())
+        history = self.names[self.names['key'].isin(touched)]
+        current = history.sort_values('last_seen', kind='stable').drop_duplicates('key', keep='last')
+        spans = history.groupby('key').agg(first_seen=('first_seen', 'min'), last_seen=('last_seen', 'max'))
+        rows = spans.index.to_numpy() - 1
+        entities = self.entities
+        names = entities['name'].to_numpy(dtype=object).copy()
+        names[current['key'].to_numpy() - 1] = current['name'].to_numpy(dtype=object)
+        entities['name'] = pd.array(names, dtype='str')
+        for column in ('first_seen', 'last_seen'):
+            values = entities[column].copy()
+            values.iloc[rows] = spans[column].array
+            entities[column] = values
+
+        self.changed = True
+        return keys
+
+    def history(self, key):
+        """
+        Nomes usados pela entidade, do mais antigo ao mais recente.
+        """
+        return self.names[self.names['key'] == key].sort_values('first_seen').reset_index(drop=True)
+
+
+def _dimension_path(kind, directory):
+    return os.path.join(directory, f"{kind}.npz")
+
+
+def _version(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def _to_arrays(prefix, df):
+    arrays = {}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.DatetimeTZDtype):
+            arrays[f"{prefix}__{column}"] = values.dt.tz_convert(None).to_numpy(dtype='datetime64[ns]')
+        elif values.dtype.kind in 'iub':
+            arrays[f"{prefix}__{column}"] = values.to_numpy()
+        else:
+            arrays[f"{prefix}__{column}"] = np.asarray(values.astype(str).tolist(), dtype=np.str_)
+    return arrays
+
+
+def _from_arrays(prefix, data, empty):
+    df = empty.copy()
+    for column, dtype in empty.dtypes.items():
+        values = data[f"{prefix}__{column}"]
+        if isinstance(dtype, pd.DatetimeTZDtype):
+            df[column] = pd.Series(values).dt.tz_localize('UTC')
+        else:
+            df[column] = pd.Series(values).astype(dtype)
+    return df
+
+
+def load_dimension(kind, directory=DIMENSION_DIR):
+    """
+    Dimensão do tipo informado, em cache por processo e relida quando o arquivo muda.
+    """
+    path = _dimension_path(kind, directory)
+    with _lock:
+        version = _version(path)
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        dimension = Dimension(kind)
+        if version is not None:
+            with np.load(path, allow_pickle=False) as data:
+                dimension = Dimension(kind, _from_arrays('entities', data, _empty_entities()),
+                                      _from_arrays('names', data, _empty_names()))
+        _loaded[path] = (version, dimension)
+        return dimension
+
+
+def save_dimension(dimension, directory=DIMENSION_DIR):
+    """
+    Grava a dimensão se ela mudou desde a última gravação.
+    """
+    if not dimension.changed:
+        return
+    path = _dimension_path(dimension.kind, directory)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **_to_arrays('entities', dimension.entities), **_to_arrays('names', dimension.names))
+    os.replace(tmp_path, path)
+    dimension.changed = False
+    with _lock:
+        _loaded[path] = (_version(path), dimension)
+
+
+def _column(df, column):
+    # Coluna de IDs da API como array de texto ('' quando ausente); nomes Categorical ficam como estão
+    if column not in df.columns:
+        return np.full(len(df), '', dtype=object)
+    if isinstance(df[column].dtype, pd.CategoricalDtype):
+        return df[column]
+    return df[column].to_numpy(dtype=object, na_value='')
+
+
+def assign_keys(tables, directory=DIMENSION_DIR):
+    """
+    Preenche as chaves de dimensão (guild_key, alliance_key, player_key) das
+    tabelas de batalhas novas, a partir dos IDs da API (colunas guild_id e as
+    extras de battle_normalizer.API_ID_COLUMNS), atualizando e gravando as
+    dimensões. Retorna as tabelas com as chaves e sem as colunas extras.
+    Jogadores sem IDs (ex.: batalhas vindas do formato aninhado) recebem a
+    guild_key da guild da batalha com o mesmo nome, e player_key 0.
+    """
+    battles, guilds, players = tables['battles'], tables['guilds'].copy(), tables['players'].copy()
+    if battles.empty:
+        return tables
+
+    battle_times = battles['time'].reset_index(drop=True)
+    battle_rows = pd.Index(battles['battle_id']).get_indexer
+
+    alliances = load_dimension('alliances', directory)
+    guild_dim = load_dimension('guilds', directory)
+    player_dim = load_dimension('players', directory)
+
+    guild_times = battle_times.iloc[battle_rows(guilds['battle_id'])]
+    guilds['alliance_key'] = alliances.observe(_column(guilds, 'alliance_id'), _column(guilds, 'alliance_name'),
+                                               guild_times)
+    guilds['guild_key'] = guild_dim.observe(_column(guilds, 'guild_id'), _column(guilds, 'guild'), guild_times,
+                                            guilds['alliance_key'])
+
+    if 'guild_id' in players.columns:
+        players['guild_key'] = guild_dim.lookup(_column(players, 'guild_id'))
+    elif not players.empty:
+        by_name = guilds[['battle_id', 'guild', 'guild_key']].astype({'guild': object}).drop_duplicates(
+            ['battle_id', 'guild'])
+        players['guild_key'] = players[['battle_id', 'guild']].astype({'guild': object}).merge(
+            by_name, on=['battle_id', 'guild'], how='left')['guild_key'].fillna(0).to_numpy(np.int32)
+    player_times = battle_times.iloc[battle_rows(players['battle_id'])]
+    players['player_key'] = player_dim.observe(_column(players, 'player_id'), _column(players, 'name'),
+                                               player_times, players['guild_key'])
+
+    for dimension in (alliances, guild_dim, player_dim):
+        save_dimension(dimension, directory)
+
+    return {
+        'battles': battles,
+        'guilds': guilds.drop(columns=[c for c in API_ID_COLUMNS['guilds'] if c in guilds.columns]),
+        'players': players.drop(columns=[c for c in API_ID_COLUMNS['players'] if c in players.columns]),
+    }
+
+
+def find_entities(kind, name, directory=DIMENSION_DIR):
+    """
+    Entidades cujo nome atual ou algum nome anterior é igual a name (sem diferenciar maiúsculas).
+    """
+    dimension = load_dimension(kind, directory)
+    name = name.casefold()
+    keys = dimension.names.loc[dimension.names['name'].str.casefold() == name, 'key'].unique()
+    return dimension.entities[dimension.entities['key'].isin(keys)].reset_index(drop=True)
+
+
+def _backfill():
+    # Refaz guilds e jogadores do histórico a partir do arquivo de dados brutos, com as chaves;
+    # a tabela de batalhas (e os números da guild acompanhada) fica como está
+    from battle_history_manager import load_battle_tables, save_battle_tables
+    from battle_normalizer import normalize_battles
+    from battle_sides import store_sides
+    from battle_store import SCHEMAS, concat_frames, filter_tables
+    from raw_archive import iter_raw_battles
+
+    tables = load_battle_tables()
+    battle_ids = tables['battles']['battle_id']
+    rebuilt = store_sides(assign_keys(normalize_battles(iter_raw_battles(battle_ids))))
+    rebuilt_ids = rebuilt['battles']['battle_id']
+    kept = filter_tables(tables, battle_ids[~battle_ids.isin(rebuilt_ids)])
+    updated = {'battles': tables['battles']}
+    for name in ('guilds', 'players'):
+        updated[name] = concat_frames([kept[name], rebuilt[name]], SCHEMAS[name])
+    save_battle_tables(updated, previous_ids=battle_ids)
+    return len(rebuilt_ids), len(battle_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    show_parser = subparsers.add_parser('show', help='Mostra as entidades com o nome e o histórico de nomes')
+    show_parser.add_argument('kind', choices=DIMENSION_KINDS)
+    show_parser.add_argument('name')
+    subparsers.add_parser('stats', help='Tamanho de cada dimensão')
+    subparsers.add_parser('backfill', help='Preenche as chaves do histórico a partir do arquivo de dados brutos')
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        dimension = load_dimension(args.kind)
+        for entity in find_entities(args.kind, args.name).to_dict('records'):
+            print(entity)
+            print(dimension.history(entity['key']).to_string(index=False))
+    elif args.command == 'stats':
+        for kind in DIMENSION_KINDS:
+            dimension = load_dimension(kind)
+            print(f"{kind}: {len(dimension.entities)} entidades, {len(dimension.names)} nomes")
+    else:
+        rebuilt, total = _backfill()
+        print(f"{rebuilt} de {total} batalhas do histórico refeitas a partir do arquivo de dados brutos")
@@ -0,0 +1,173 @@
+"""
+Cache persistente da resolução de nomes de guild para IDs (guild e aliança).
+Evita a busca na API (/search) a cada atualização: as entradas vêm tanto das
+buscas quanto dos dados brutos das batalhas ingeridas, em que cada jogador traz
+guildName/guildId/allianceName/allianceId.
+
+Os nomes são comparados sem diferenciar maiúsculas (casefold). Entradas positivas
+valem por GUILD_CACHE_TTL; buscas sem resultado ficam registradas (cache negativo)
+por GUILD_NEGATIVE_TTL, para não repetir a busca de um nome inexistente.
+
+    python guild_cache.py seed [dump.json ...]    # alimenta a partir do arquivo de dados brutos ou de dumps
+    python guild_cache.py show "We Profit"
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes
+GUILD_CACHE_FILE = os.path.join("battle_store", "guild_ids.json")  # Nome da guild → IDs
+GUILD_CACHE_TTL = 7 * 24 * 3600  # Validade de uma resolução (segundos)
+GUILD_NEGATIVE_TTL = 3600  # Validade de uma busca sem resultado (segundos)
+
+_lock = threading.Lock()
+_entries = None
+_entries_version = None
+
+
+def _key(guild_name):
+    return guild_name.strip().casefold()
+
+
+def _version(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def _load(path):
+    # Entradas em memória, relidas do disco quando o arquivo muda (ex.: gravado pelo worker)
+    global _entries, _entries_version
+    version = _version(path)
+    if _entries is None or version != _entries_version:
+        _entries = {}
+        if version is not None:
+            try:
+                with open(path, 'r') as f:
+                    _entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error("Erro ao ler cache de guilds %s: %s", path, e)
+        _entries_version = version
+    return _entries
+
+
+def _save(entries, path):
+    global _entries_version
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(entries, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    _entries_version = _version(path)
+
+
+def lookup_guild(guild_name, path=GUILD_CACHE_FILE):
+    """
+    Retorna a entrada em cache para o nome ({'name', 'guild_id', 'alliance_id',
+    'alliance_name', ...}), ou None se não houver entrada válida.
+    Uma entrada negativa (nome buscado sem resultado) tem guild_id None.
+    """
+    with _lock:
+        entry = _load(path).get(_key(guild_name))
+    if entry is None:
+        return None
+
+    ttl = GUILD_CACHE_TTL if entry['guild_id'] else GUILD_NEGATIVE_TTL
+    if time.time() - entry['updated_at'] >= ttl:
+        return None
+    return entry
+
+
+def remember_guild(guild_name, guild_id, alliance_id=None, alliance_name=None, source='search',
+                   path=GUILD_CACHE_FILE):
+    """
+    Registra a resolução de um nome de guild. Com guild_id None, registra que a
+    busca não encontrou a guild (cache negativo).
+    """
+    remember_guilds([(guild_name, guild_id, alliance_id, alliance_name)], source, path)
+
+
+def remember_guilds(resolutions, source, path=GUILD_CACHE_FILE):
+    """
+    Registra várias resoluções (nome, guild_id, alliance_id, alliance_name) de uma vez,
+    com uma única gravação. Retorna o número de entradas novas ou alteradas.
+    """
+    now = time.time()
+    changed = 0
+    with _lock:
+        entries = _load(path)
+        for guild_name, guild_id, alliance_id, alliance_name in resolutions:
+            if not guild_name:
+                continue
+            key = _key(guild_name)
+            entry = entries.get(key)
+            if (entry is not None and entry['guild_id'] == guild_id and entry['alliance_id'] == (alliance_id or None)
+                    and now - entry['updated_at'] < GUILD_CACHE_TTL / 2):
+                continue
+            entries[key] = {
+                'name': guild_name,
+                'guild_id': guild_id,
+                'alliance_id': alliance_id or None,
+                'alliance_name': alliance_name or None,
+                'source': source,
+                'updated_at': now,
+            }
+            changed += 1
+
+        if changed:
+            try:
+                _save(entries, path)
+            except OSError as e:
+                logging.error("Erro ao gravar cache de guilds %s: %s", path, e)
+    return changed
+
+
+def seed_from_battles(raw_battles, path=GUILD_CACHE_FILE):
+    """
+    Alimenta o cache com as guilds dos jogadores das batalhas brutas (dicts da API).
+    Retorna o número de entradas novas ou alteradas.
+    """
+    resolutions = {}
+    for battle in raw_battles:
+        players = battle.get('players', {})
+        for player in players.values() if isinstance(players, dict) else players:
+            guild_name = player.get('guildName')
+            guild_id = player.get('guildId')
+            if guild_name and guild_id:
+                resolutions[_key(guild_name)] = (guild_name, guild_id, player.get('allianceId'),
+                                                 player.get('allianceName'))
+
+    changed = remember_guilds(resolutions.values(), 'battle', path)
+    if changed:
+        logging.info("Cache de guilds: %s guilds registradas a partir das batalhas", changed)
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    seed_parser = subparsers.add_parser('seed', help='Alimenta o cache a partir de batalhas brutas')
+    seed_parser.add_argument('dumps', nargs='*', help='Arquivos JSON de batalhas (padrão: arquivo de dados brutos)')
+    show_parser = subparsers.add_parser('show', help='Mostra a resolução de um nome')
+    show_parser.add_argument('name')
+    args = parser.parse_args()
+
+    if args.command == 'seed':
+        if args.dumps:
+            from json_stream import iter_json_array
+            for dump_path in args.dumps:
+                print(f"{dump_path}: {seed_from_battles(iter_json_array(dump_path))} guilds registradas")
+        else:
+            from raw_archive import iter_raw_battles
+            print(f"{seed_from_battles(iter_raw_battles())} guilds registradas")
+    else:
+        print(lookup_guild(args.name))
@@ -0,0 +1,60 @@
+"""
+Cache em memória, compartilhado pelo processo, para dados derivados do histórico.
+Cada entrada guarda a versão do armazenamento em que foi calculada; quando a versão
+muda (nova gravação, neste ou em outro processo) a entrada é recalculada.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class VersionedCache:
+    """
+    Cache LRU em que cada valor é válido apenas para uma versão dos dados.
+    Os valores são compartilhados entre os chamadores e não devem ser modificados;
+    quem precisar alterar um DataFrame deve trabalhar sobre uma cópia.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, loader):
+        """
+        Retorna o valor de key para a versão informada, chamando loader() se a
+        entrada não existir ou tiver sido calculada para outra versão.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader()
+
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def invalidate(self):
+        """
+        Descarta todas as entradas.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Retorna contadores de acertos, falhas e entradas em cache.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
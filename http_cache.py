@@ -0,0 +1,201 @@
+"""
+Cache em disco das respostas da API, endereçado pelo hash (SHA-256) da requisição.
+Cada entrada guarda o corpo da resposta e os metadados necessários para decidir
+se ela ainda vale (TTL), para revalidá-la com o servidor (ETag / Last-Modified)
+e para o descarte LRU quando o cache passa do tamanho máximo.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+PERMANENT = None  # TTL de entradas que nunca expiram (ex.: batalhas encerradas)
+
+
+def request_key(url, params=None):
+    """
+    Identidade da requisição: hash da URL com os parâmetros em ordem canônica.
+    """
+    query = urlencode(sorted((params or {}).items()), doseq=True)
+    return hashlib.sha256(f"GET {url}?{query}".encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache de respostas HTTP em disco, com descarte LRU limitado a max_bytes.
+    O acesso a uma entrada atualiza o mtime do arquivo de metadados, usado como
+    ordem de uso no descarte. Seguro para uso por várias threads do processo.
+    """
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _paths(self, key):
+        directory = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(directory, key + '.meta.json'), os.path.join(directory, key + '.body')
+
+    def get(self, key):
+        """
+        Retorna (metadados, corpo) da entrada, ou None se não existir.
+        Os metadados incluem 'fresh', indicando se a entrada ainda está no TTL.
+        """
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+
+        ttl = meta.get('ttl')
+        meta['fresh'] = ttl is PERMANENT or time.time() - meta['stored_at'] < ttl
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+        return meta, body
+
+    def put(self, key, url, status, headers, body, ttl):
+        """
+        Grava a resposta (só o corpo e os cabeçalhos relevantes) com o TTL informado.
+        """
+        meta_path, body_path = self._paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        meta = {
+            'url': url,
+            'status': status,
+            'headers': {name: headers[name] for name in ('Content-Type', 'ETag', 'Last-Modified')
+                        if name in headers},
+            'stored_at': time.time(),
+            'ttl': ttl,
+            'size': len(body),
+        }
+
+        previous = self._entry_size(meta_path)
+        # Corpo primeiro: a entrada só passa a existir quando os metadados são gravados
+        for path, data, mode in ((body_path, body, 'wb'), (meta_path, json.dumps(meta), 'w')):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, mode) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self.stores += 1
+            if self._total_bytes is not None:
+                self._total_bytes += len(body) - previous
+        self._evict_if_needed()
+
+    def refresh(self, key, ttl):
+        """
+        Renova o TTL de uma entrada revalidada pelo servidor (resposta 304).
+        """
+        meta_path, _ = self._paths(key)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            meta['stored_at'] = time.time()
+            meta['ttl'] = ttl
+            tmp_path = f"{meta_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, meta_path)
+        except (OSError, ValueError) as e:
+            logging.warning("Erro ao renovar entrada do cache HTTP: %s", e)
+
+    def record(self, outcome):
+        """
+        Conta o resultado de uma consulta: 'hit', 'miss' ou 'revalidated'.
+        """
+        with self._lock:
+            if outcome == 'hit':
+                self.hits += 1
+            elif outcome == 'revalidated':
+                self.revalidated += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """
+        Retorna os contadores do cache.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated,
+                    'stores': self.stores, 'evictions': self.evictions, 'bytes': self._total_bytes}
+
+    def _entry_size(self, meta_path):
+        try:
+            with open(meta_path, 'r') as f:
+                return json.load(f).get('size', 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _entries(self):
+        # (mtime dos metadados, tamanho, caminho dos metadados) de todas as entradas
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for directory in os.scandir(self.cache_dir):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith('.meta.json'):
+                    body_path = entry.path[:-len('.meta.json')] + '.body'
+                    try:
+                        size = os.path.getsize(body_path)
+                        entries.append((entry.stat().st_mtime, size, entry.path))
+                    except OSError:
+                        continue
+        return entries
+
+    def _evict_if_needed(self):
+        """
+        Remove as entradas usadas há mais tempo até o cache caber em max_bytes.
+        """
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            if self._total_bytes <= self.max_bytes:
+                return
+
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, meta_path in entries:
+                if total <= self.max_bytes:
+                    break
+                for path in (meta_path, meta_path[:-len('.meta.json')] + '.body'):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                self.evictions += 1
+            self._total_bytes = total
+
+    def clear(self):
+        """
+        Remove todas as entradas.
+        """
+        with self._lock:
+            for _, _, meta_path in self._entries():
+                for path in (meta_path, meta_path[:-len('.meta.json')] + '.body'):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            self._total_bytes = 0
@@ -0,0 +1,94 @@
+"""
+Registro (logging) dos payloads da API no caminho de ingestão.
+Em vez de formatar a resposta inteira na mensagem, o log recebe um resumo
+(tamanho, quantidade de batalhas/jogadores) que só é montado se a mensagem for
+de fato emitida. Para depuração, uma amostra das respostas completas pode ser
+gravada em um arquivo rotativo separado:
+
+    ALBION_PAYLOAD_SAMPLE=0.05 python ingest_worker.py --once   # grava ~5% das respostas em logs/api_payloads.log
+
+As mensagens dos módulos de ingestão usam formatação %-style do logging
+(logging.info("... %s", valor)), avaliada apenas quando o nível está habilitado.
+"""
+
+import logging
+import os
+import random
+import threading
+from logging.handlers import RotatingFileHandler
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes
+PAYLOAD_SAMPLE_RATE = float(os.environ.get("ALBION_PAYLOAD_SAMPLE", "0"))  # Fração das respostas gravadas por inteiro
+PAYLOAD_LOG_FILE = os.path.join("logs", "api_payloads.log")  # Arquivo das respostas amostradas
+PAYLOAD_LOG_MAX_BYTES = 10 * 1024 * 1024  # Tamanho de cada arquivo antes da rotação
+PAYLOAD_LOG_BACKUPS = 3  # Arquivos rotacionados mantidos
+
+payload_logger = logging.getLogger("ingest.payloads")
+payload_logger.propagate = False  # Payloads completos nunca vão para o log principal
+payload_logger.setLevel(logging.DEBUG)
+
+_handler_lock = threading.Lock()
+
+
+class PayloadSummary:
+    """
+    Resumo de um payload para mensagens de log, calculado só ao ser formatado
+    (str), ou seja, apenas se a mensagem for emitida.
+    """
+
+    __slots__ = ('payload', 'size')
+
+    def __init__(self, payload, size=None):
+        self.payload = payload
+        self.size = size
+
+    def __str__(self):
+        payload = self.payload
+        if isinstance(payload, list):
+            summary = f"lista com {len(payload)} itens"
+        elif isinstance(payload, dict) and 'players' in payload:
+            summary = (f"batalha {payload.get('id')} com {len(payload['players'])} jogadores "
+                       f"e {len(payload.get('guilds', {}))} guilds")
+        elif isinstance(payload, dict):
+            summary = f"objeto com {len(payload)} chaves"
+        else:
+            summary = type(payload).__name__
+        if self.size is not None:
+            summary += f", {self.size / 1024:.1f} KB"
+        return summary
+
+
+def summarize(payload, size=None):
+    """
+    Resumo preguiçoso do payload (lista, batalha ou objeto), com o tamanho em bytes se informado.
+    """
+    return PayloadSummary(payload, size)
+
+
+def _ensure_payload_handler():
+    with _handler_lock:
+        if not payload_logger.handlers:
+            os.makedirs(os.path.dirname(PAYLOAD_LOG_FILE) or '.', exist_ok=True)
+            handler = RotatingFileHandler(PAYLOAD_LOG_FILE, maxBytes=PAYLOAD_LOG_MAX_BYTES,
+                                          backupCount=PAYLOAD_LOG_BACKUPS, encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            payload_logger.addHandler(handler)
+
+
+def capture_payload(url, body, sample_rate=None):
+    """
+    Grava o corpo completo da resposta no arquivo rotativo, para uma amostra
+    (sample_rate, padrão ALBION_PAYLOAD_SAMPLE) das respostas. Retorna True se gravou.
+    """
+    sample_rate = PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+    if sample_rate <= 0 or random.random() >= sample_rate:
+        return False
+
+    _ensure_payload_handler()
+    if isinstance(body, bytes):
+        body = body.decode('utf-8', errors='replace')
+    payload_logger.debug("%s\n%s", url, body)
+    return True
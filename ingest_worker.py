@@ -0,0 +1,113 @@
+"""
+Worker de ingestão: atualiza o histórico de batalhas a partir da API do Albion Online
+em segundo plano, com APScheduler, independente das execuções da página Streamlit.
+
+    python ingest_worker.py                              # guilds e intervalos de ALBION_INGEST_GUILDS
+    python ingest_worker.py --guild "We Profit=15"       # intervalo em minutos por guild
+    python ingest_worker.py --once                       # uma atualização de cada guild e sai
+
+Ao iniciar, o worker grava também as batalhas novas do arquivo local (data.json).
+Com o worker rodando, a interface usa ALBION_INGEST_WORKER=1: get_battle_data apenas
+lê o histórico, sem acessar a API nem o arquivo local (ver api_data_processor).
+
+Cada guild é um job de intervalo próprio. Os jobs rodam em um único thread, então
+apenas uma atualização grava no histórico por vez; max_instances=1 impede que um
+job se sobreponha à própria execução anterior e coalesce junta execuções perdidas
+(ex.: enquanto outra guild atualizava) em uma só.
+"""
+
+import argparse
+import logging
+import os
+import time
+from datetime import datetime
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MISSED
+from api_scraper import refresh_battle_data
+from api_data_processor import ingest_local_data
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes
+INGEST_GUILDS = os.environ.get("ALBION_INGEST_GUILDS", "We Profit=15")  # "Guild=minutos,Outra=minutos"
+INGEST_DAYS = 30  # Período coberto na primeira sincronização de cada guild (dias)
+
+
+def parse_guild_intervals(spec):
+    """
+    Converte "Guild=minutos,Outra=minutos" em {guild: minutos}.
+    Guilds sem intervalo usam 15 minutos.
+    """
+    intervals = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, minutes = item.partition('=')
+        intervals[name.strip()] = float(minutes) if minutes.strip() else 15.0
+    return intervals
+
+
+def run_ingest(guild_name, days=INGEST_DAYS):
+    """
+    Uma atualização da guild: busca as batalhas novas na API e grava no histórico
+    (refresh_battle_data). Retorna o número de batalhas novas.
+    """
+    start = time.perf_counter()
+    new_battles_df = refresh_battle_data(guild_name, days=days)
+    logging.info("Ingestão de %s: %s batalhas novas em %.1fs",
+                 guild_name, len(new_battles_df), time.perf_counter() - start)
+    return len(new_battles_df)
+
+
+def _log_job_event(event):
+    if event.code == EVENT_JOB_MISSED:
+        logging.warning("Execução do job %s perdida (%s)", event.job_id, event.scheduled_run_time)
+    else:
+        logging.error("Erro na execução do job %s: %s", event.job_id, event.exception)
+
+
+def create_scheduler(guild_intervals, days=INGEST_DAYS):
+    """
+    Cria o agendador com um job de intervalo por guild ({guild: minutos}).
+    O primeiro run de cada guild é imediato.
+    """
+    scheduler = BlockingScheduler(
+        executors={'default': ThreadPoolExecutor(1)},  # Um único gravador do histórico
+        job_defaults={
+            'max_instances': 1,  # Sem execuções sobrepostas do mesmo job
+            'coalesce': True,  # Execuções perdidas viram uma só
+            'misfire_grace_time': None,  # Execuções atrasadas ainda rodam (uma vez, com coalesce)
+        },
+    )
+    scheduler.add_listener(_log_job_event, EVENT_JOB_ERROR | EVENT_JOB_MISSED)
+
+    for guild_name, minutes in guild_intervals.items():
+        scheduler.add_job(run_ingest, 'interval', args=[guild_name, days], minutes=minutes,
+                          id=f"ingest:{guild_name}", name=f"Ingestão {guild_name}",
+                          next_run_time=datetime.now())
+        logging.info("Ingestão de %s agendada a cada %g minutos", guild_name, minutes)
+
+    return scheduler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guild', action='append', help='Guild=minutos (pode repetir; substitui ALBION_INGEST_GUILDS)')
+    parser.add_argument('--days', type=int, default=INGEST_DAYS, help='Período da primeira sincronização (dias)')
+    parser.add_argument('--once', action='store_true', help='Atualiza cada guild uma vez e sai')
+    args = parser.parse_args()
+
+    guild_intervals = parse_guild_intervals(','.join(args.guild) if args.guild else INGEST_GUILDS)
+    ingest_local_data()
+
+    if args.once:
+        for guild_name in guild_intervals:
+            run_ingest(guild_name, args.days)
+    else:
+        scheduler = create_scheduler(guild_intervals, args.days)
+        try:
+            scheduler.start()
+        except (KeyboardInterrupt, SystemExit):
+            logging.info("Worker de ingestão encerrado")
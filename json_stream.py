@@ -0,0 +1,99 @@
+"""
+Leitura incremental de arquivos JSON cujo conteúdo é um array no nível superior
+(como data.json e os outros dumps de batalhas da API).
+Em vez de materializar o array inteiro com json.load, entrega um elemento por vez,
+mantendo em memória apenas o trecho do arquivo necessário para o elemento atual.
+"""
+
+import json
+
+CHUNK_SIZE = 1 << 20  # Bytes lidos do arquivo por vez
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+
+
+def iter_json_array(path, chunk_size=CHUNK_SIZE):
+    """
+    Gera os elementos do array JSON do arquivo, um de cada vez.
+    Lança ValueError se o arquivo não contiver um array JSON válido.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+
+        def fill(min_size):
+            # Descarta o que já foi consumido e lê pelo menos min_size caracteres a mais
+            nonlocal buffer, pos, eof
+            buffer = buffer[pos:]
+            pos = 0
+            while not eof and min_size > 0:
+                chunk = f.read(max(chunk_size, min_size))
+                if not chunk:
+                    eof = True
+                    break
+                buffer += chunk
+                min_size -= len(chunk)
+
+        def skip(chars):
+            # Avança pos sobre os caracteres informados, lendo mais dados se preciso
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in chars:
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                fill(chunk_size)
+
+        skip(_WHITESPACE)
+        if pos >= len(buffer) or buffer[pos] != '[':
+            raise ValueError(f"{path} não contém um array JSON")
+        pos += 1
+
+        expect_value = True
+        count = 0
+        while True:
+            skip(_WHITESPACE)
+            if pos >= len(buffer):
+                raise ValueError(f"Fim inesperado do arquivo {path}")
+
+            char = buffer[pos]
+            if char == ']':
+                if expect_value and count:
+                    raise ValueError(f"Vírgula antes do fim do array em {path}")
+                pos += 1
+                skip(_WHITESPACE)
+                if pos < len(buffer):
+                    raise ValueError(f"Conteúdo após o fim do array em {path}")
+                return
+            if char == ',':
+                if expect_value:
+                    raise ValueError(f"Vírgula inesperada em {path}")
+                expect_value = True
+                pos += 1
+                continue
+            if not expect_value:
+                raise ValueError(f"Vírgula ausente entre elementos em {path}")
+
+            # Decodificar o próximo elemento; se ele não for seguido de um delimitador
+            # pode estar truncado (ex.: "2." de "2.5"), então lemos mais dados e tentamos de novo
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    fill(len(buffer) - pos)
+                    continue
+                if not eof and (end >= len(buffer) or buffer[end] not in _DELIMITERS):
+                    fill(len(buffer) - pos)
+                    continue
+                break
+
+            pos = end
+            expect_value = False
+            count += 1
+            yield value
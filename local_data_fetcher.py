@@ -1,7 +1,8 @@
 import pandas as pd
-import json
 import logging
-from datetime import datetime
+from json_stream import iter_json_array
+from battle_normalizer import normalize_battles
+from battle_store import build_history_frame
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -19,78 +20,20 @@ def get_battle_data():
     try:
         logging.info(f"Lendo dados de batalhas do arquivo local: {DATA_FILE}")
         
-        # Abrir o arquivo JSON
-        with open(DATA_FILE, 'r') as f:
-            battles_data = json.load(f)
+        # Ler o arquivo JSON uma batalha por vez, sem carregar o array inteiro
+        battles_data = iter_json_array(DATA_FILE)
         
-        logging.info(f"Encontrados dados de {len(battles_data)} batalhas no arquivo")
+        # Processar batalhas (apenas as que têm jogadores da guild)
+        total_battles = 0
         
-        # Processar batalhas
-        processed_battles = []
+        def counted(battles):
+            nonlocal total_battles
+            for battle in battles:
+                total_battles += 1
+                yield battle
         
-        for battle in battles_data:
-            try:
-                # Extrair informações básicas
-                battle_id = battle['id']
-                battle_time = datetime.fromisoformat(battle['startTime'].replace('Z', '+00:00'))
-                total_fame = battle['totalFame']
-                
-                # Filtrar jogadores da guild
-                guild_players = [p for p in battle['players'] if p.get('guildId') == GUILD_ID]
-                
-                if guild_players:
-                    players_count = len(guild_players)
-                    guild_kills = sum(p.get('kills', 0) for p in guild_players)
-                    guild_deaths = sum(p.get('deaths', 0) for p in guild_players)
-                    
-                    # Agrupar por guild
-                    guilds_stats = {}
-                    
-                    for player in battle['players']:
-                        guild_name = player.get('guildName', 'Unknown')
-                        
-                        if guild_name not in guilds_stats:
-                            guilds_stats[guild_name] = {
-                                'players': [],
-                                'total_kills': 0,
-                                'total_deaths': 0,
-                                'total_fame': 0
-                            }
-                        
-                        player_stats = {
-                            'name': player.get('name', 'Unknown'),
-                            'kills': player.get('kills', 0),
-                            'deaths': player.get('deaths', 0),
-                            'fame': player.get('killFame', 0)
-                        }
-                        
-                        guilds_stats[guild_name]['players'].append(player_stats)
-                        guilds_stats[guild_name]['total_kills'] += player_stats['kills']
-                        guilds_stats[guild_name]['total_deaths'] += player_stats['deaths']
-                        guilds_stats[guild_name]['total_fame'] += player_stats['fame']
-                    
-                    # Criar objeto de detalhes
-                    battle_details = {
-                        'id': battle_id,
-                        'time': battle_time,
-                        'guilds': guilds_stats
-                    }
-                    
-                    # Adicionar à lista
-                    processed_battles.append({
-                        'battle_id': battle_id,
-                        'time': battle_time,
-                        'players': players_count,
-                        'kills': guild_kills,
-                        'deaths': guild_deaths,
-                        'fame': total_fame,
-                        'details': battle_details
-                    })
-            except Exception as e:
-                logging.error(f"Erro ao processar batalha: {e}")
-        
-        # Criar DataFrame
-        battles_df = pd.DataFrame(processed_battles)
+        battles_df = build_history_frame(normalize_battles(counted(battles_data), GUILD_ID))
+        logging.info(f"Encontrados dados de {total_battles} batalhas no arquivo")
         logging.info(f"Processados dados de {len(battles_df)} batalhas com sucesso")
         
         return battles_df
@@ -0,0 +1,184 @@
+"""
+Dicionário global de nomes do armazenamento colunar: cada nome de jogador, guild
+e aliança recebe um ID int32 estável, e as partições gravam só os IDs.
+Em memória as colunas de nomes são pandas Categorical cujas categorias são o
+próprio dicionário, de modo que filtros e agrupamentos por nome trabalham com
+os códigos inteiros e cada nome é guardado uma única vez.
+
+O dicionário só cresce (nomes nunca são removidos nem renumerados) e é gravado
+antes das partições que o usam, então um leitor nunca encontra um ID sem nome.
+"""
+
+import logging
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes
+NAMES_FILE = "names.npz"  # Dicionário de nomes, na raiz do armazenamento
+NAME_KINDS = ("players", "guilds", "alliances")
+
+# Colunas das tabelas codificadas pelo dicionário → tipo de nome
+DICTIONARY_COLUMNS = {
+    'name': 'players',
+    'guild': 'guilds',
+    'alliance_name': 'alliances',
+}
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+class NameDictionary:
+    """
+    Tabelas ID ↔ nome para cada tipo de nome (NAME_KINDS).
+    O ID de um nome é a sua posição na lista do tipo.
+    """
+
+    def __init__(self, names=None):
+        names = names or {}
+        self.names = {kind: list(names.get(kind, [])) for kind in NAME_KINDS}
+        self.changed = False
+        self._dtypes = {}
+
+    def dtype(self, kind):
+        """
+        CategoricalDtype com todos os nomes do tipo, compartilhado pelas colunas
+        decodificadas (concatenar colunas com o mesmo dtype mantém os códigos).
+        """
+        dtype = self._dtypes.get(kind)
+        if dtype is None or len(dtype.categories) != len(self.names[kind]):
+            dtype = pd.CategoricalDtype(pd.Index(self.names[kind], dtype='str'))
+            self._dtypes[kind] = dtype
+        return dtype
+
+    def encode(self, kind, values):
+        """
+        Converte os nomes (Series de texto ou Categorical) em IDs int32,
+        acrescentando ao dicionário os nomes que ainda não existem.
+        """
+        categorical = values.array if isinstance(values.dtype, pd.CategoricalDtype) else pd.Categorical(values)
+        codes = np.asarray(categorical.codes)
+        categories = categorical.categories
+        if not len(categories):
+            return np.full(len(codes), -1, dtype=np.int32)
+        known = self.dtype(kind).categories
+
+        # Categorias que já são um prefixo do dicionário (colunas decodificadas por ele): códigos = IDs
+        if len(categories) <= len(known) and categories.equals(known[:len(categories)]):
+            return codes.astype(np.int32)
+
+        mapping = known.get_indexer(categories)
+        missing = mapping < 0
+        if missing.any():
+            start = len(self.names[kind])
+            self.names[kind].extend(categories[missing].tolist())
+            mapping[missing] = np.arange(start, len(self.names[kind]))
+            self.changed = True
+        return np.where(codes >= 0, mapping[codes], -1).astype(np.int32)
+
+    def decode(self, kind, ids):
+        """
+        Converte IDs em Categorical com o dicionário do tipo como categorias.
+        """
+        return pd.Categorical.from_codes(np.asarray(ids, dtype=np.int32), dtype=self.dtype(kind))
+
+    def register_table(self, df):
+        """
+        Acrescenta ao dicionário os nomes da tabela que ainda não existem.
+        """
+        for column, kind in DICTIONARY_COLUMNS.items():
+            if column in df.columns:
+                self.encode(kind, df[column])
+
+    def encode_table(self, df):
+        """
+        Cópia da tabela com as colunas de nomes trocadas pelos IDs.
+        """
+        df = df.copy()
+        for column, kind in DICTIONARY_COLUMNS.items():
+            if column in df.columns:
+                df[column] = self.encode(kind, df[column])
+        return df
+
+    def decode_table(self, df):
+        """
+        Decodifica, no lugar, as colunas de nomes gravadas como IDs.
+        Colunas gravadas como texto (partições anteriores ao dicionário) ficam como estão.
+        """
+        for column, kind in DICTIONARY_COLUMNS.items():
+            if column in df.columns and pd.api.types.is_integer_dtype(df[column].dtype):
+                df[column] = self.decode(kind, df[column].to_numpy())
+        return df
+
+
+def _names_path(store_dir):
+    return os.path.join(store_dir, NAMES_FILE)
+
+
+def _version(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def load_names(store_dir):
+    """
+    Dicionário de nomes do armazenamento, em cache por processo e relido
+    quando o arquivo muda (ex.: gravado pelo worker de ingestão).
+    """
+    path = _names_path(store_dir)
+    with _lock:
+        version = _version(path)
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        names = {}
+        if version is not None:
+            with np.load(path, allow_pickle=False) as data:
+                names = {kind: data[kind].tolist() for kind in data.files}
+        dictionary = NameDictionary(names)
+        _loaded[path] = (version, dictionary)
+        return dictionary
+
+
+def save_names(dictionary, store_dir):
+    """
+    Grava o dicionário se ele recebeu nomes novos desde a última gravação.
+    """
+    if not dictionary.changed:
+        return
+    path = _names_path(store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **{kind: np.asarray(dictionary.names[kind], dtype=np.str_) for kind in NAME_KINDS})
+    os.replace(tmp_path, path)
+    dictionary.changed = False
+    with _lock:
+        _loaded[path] = (_version(path), dictionary)
+    logging.debug("Dicionário de nomes gravado: %s",
+                  ", ".join(f"{len(dictionary.names[kind])} {kind}" for kind in NAME_KINDS))
+
+
+def name_mask(values, name, partial=False):
+    """
+    Máscara booleana das linhas cujo nome é igual a name (ou o contém, com partial),
+    sem diferenciar maiúsculas. Em colunas Categorical a comparação é feita uma vez
+    por nome distinto e as linhas são selecionadas pelos códigos inteiros.
+    """
+    name = name.casefold()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories.str.casefold()
+        matched = categories.str.contains(name, regex=False) if partial else categories == name
+        return np.isin(values.cat.codes.to_numpy(), np.flatnonzero(matched))
+
+    folded = values.astype(str).str.casefold()
+    return (folded.str.contains(name, regex=False) if partial else folded == name).to_numpy()
@@ -0,0 +1,152 @@
+"""
+Limitação de taxa das requisições à API e espera entre tentativas.
+Cada host tem um token bucket: as requisições consomem um token e esperam quando
+o balde está vazio. Respostas 429/503 com Retry-After pausam o host inteiro pelo
+tempo pedido. As tentativas repetidas usam espera exponencial com jitter.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes
+RATE_LIMIT_PER_SECOND = float(os.environ.get("ALBION_API_RATE", "5"))  # Requisições por segundo por host
+RATE_LIMIT_BURST = int(os.environ.get("ALBION_API_BURST", "10"))  # Requisições seguidas permitidas
+BACKOFF_MAX_DELAY = 30  # Espera máxima entre tentativas (segundos)
+THROTTLE_STATUSES = (429, 503)  # Respostas que indicam excesso de requisições
+
+
+class TokenBucket:
+    """
+    Token bucket: rate tokens por segundo, até capacity acumulados.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        # Reserva um token e retorna quanto tempo esperar até poder usá-lo
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self):
+        """
+        Bloqueia até haver um token disponível. Retorna o tempo esperado (segundos).
+        """
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """
+        Suspende o balde por seconds segundos (ex.: Retry-After do servidor).
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+def retry_after_seconds(response):
+    """
+    Lê o cabeçalho Retry-After (segundos ou data HTTP). Retorna None se ausente ou inválido.
+    """
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base_delay, response=None, max_delay=BACKOFF_MAX_DELAY):
+    """
+    Espera antes da próxima tentativa: Retry-After da resposta, se houver;
+    senão exponencial no número da tentativa com jitter de ±50%, limitada a max_delay.
+    """
+    retry_after = retry_after_seconds(response)
+    if retry_after is not None:
+        return min(retry_after, max_delay)
+    return min(max_delay, base_delay * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+class RateLimiter:
+    """
+    Token buckets por host, com métricas de espera para ajustar a vazão.
+    """
+
+    def __init__(self, rate=RATE_LIMIT_PER_SECOND, burst=RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.requests = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.retry_after_pauses = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def acquire(self, url):
+        """
+        Espera a vez da requisição para o host da URL. Retorna o tempo esperado.
+        """
+        waited = self._bucket(url).acquire()
+        with self._lock:
+            self.requests += 1
+            if waited > 0:
+                self.throttled += 1
+                self.wait_seconds += waited
+        return waited
+
+    def observe(self, url, response):
+        """
+        Registra a resposta: 429/503 com Retry-After pausa o host pelo tempo pedido.
+        """
+        if response.status_code not in THROTTLE_STATUSES:
+            return
+        retry_after = retry_after_seconds(response)
+        if retry_after is None:
+            return
+        self._bucket(url).pause(retry_after)
+        with self._lock:
+            self.retry_after_pauses += 1
+        logging.warning("API pediu para aguardar %.1fs (%s)", retry_after, urlparse(url).netloc)
+
+    def stats(self):
+        """
+        Retorna as métricas: requisições, requisições que esperaram, tempo total
+        de espera e pausas por Retry-After.
+        """
+        with self._lock:
+            return {'requests': self.requests, 'throttled': self.throttled,
+                    'wait_seconds': round(self.wait_seconds, 3), 'retry_after_pauses': self.retry_after_pauses}
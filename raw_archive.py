@@ -0,0 +1,273 @@
+"""
+Arquivo compactado dos dados brutos das batalhas (JSON da API), um registro por batalha.
+Cada batalha é guardada uma única vez, comprimida com zlib (ou lzma), em um arquivo
+só de acréscimos; um índice (battle_id → posição no arquivo) permite ler qualquer
+batalha sem percorrer o arquivo e reprocessar os dados brutos sem buscá-los de novo.
+
+    python raw_archive.py import data.json raw_battles_data.json test_api.json
+    python raw_archive.py stats
+    python raw_archive.py export saida.json [--ids 173256294 173255407]
+
+Formato de cada registro: cabeçalho '<qBI' (battle_id, codec, tamanho comprimido)
+seguido do JSON comprimido. O índice pode ser reconstruído lendo os cabeçalhos.
+"""
+
+import argparse
+import json
+import logging
+import lzma
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+from battle_index import to_ids
+from json_stream import iter_json_array
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Constantes
+ARCHIVE_FILE = os.path.join("battle_store", "raw_battles.bin")  # Registros comprimidos
+ARCHIVE_INDEX_FILE = os.path.join("battle_store", "raw_battles_index.npz")  # battle_id → posição
+ARCHIVE_CODEC = os.environ.get("ALBION_ARCHIVE_CODEC", "zlib")  # zlib (rápido) ou lzma (menor)
+ZLIB_LEVEL = 9  # Nível de compressão do zlib
+
+RECORD_HEADER = struct.Struct('<qBI')  # battle_id, codec, tamanho do JSON comprimido
+CODECS = {'zlib': 1, 'lzma': 2}
+
+_lock = threading.Lock()
+_index_cache = {}
+
+
+def _compress(data, codec):
+    if codec == CODECS['lzma']:
+        return lzma.compress(data, preset=6)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(data, codec):
+    if codec == CODECS['lzma']:
+        return lzma.decompress(data)
+    return zlib.decompress(data)
+
+
+def _empty_index():
+    return {'ids': np.empty(0, dtype=np.int64), 'offsets': np.empty(0, dtype=np.int64), 'end': 0}
+
+
+def _scan_records(path, start=0):
+    """
+    Lê os cabeçalhos a partir de start. Retorna (ids, posições, fim do último registro completo).
+    """
+    ids, offsets = [], []
+    end = start
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            battle_id, _, length = RECORD_HEADER.unpack(header)
+            f.seek(length, os.SEEK_CUR)
+            if f.tell() > size:
+                break
+            ids.append(battle_id)
+            offsets.append(end)
+            end += RECORD_HEADER.size + length
+    return ids, offsets, end
+
+
+def _merge_index(index, ids, offsets, end):
+    # Acrescenta registros ao índice, mantendo os IDs ordenados (o primeiro registro de cada ID vale)
+    all_ids = np.concatenate([index['ids'], np.asarray(ids, dtype=np.int64)])
+    all_offsets = np.concatenate([index['offsets'], np.asarray(offsets, dtype=np.int64)])
+    order = np.lexsort((all_offsets, all_ids))
+    all_ids, all_offsets = all_ids[order], all_offsets[order]
+    first = np.ones(len(all_ids), dtype=bool)
+    first[1:] = all_ids[1:] != all_ids[:-1]
+    return {'ids': all_ids[first], 'offsets': all_offsets[first], 'end': end}
+
+
+def _save_index(index, index_path):
+    os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, ids=index['ids'], offsets=index['offsets'], end=np.int64(index['end']))
+    os.replace(tmp_path, index_path)
+
+
+def _load_index(path, index_path):
+    """
+    Índice do arquivo, em cache por processo. Registros gravados depois do índice
+    (ex.: interrupção entre a gravação e a atualização do índice) são lidos do arquivo,
+    e um registro incompleto no final é descartado.
+    """
+    if not os.path.exists(path):
+        return _empty_index()
+
+    size = os.path.getsize(path)
+    cached = _index_cache.get((path, index_path))
+    if cached is not None and cached['end'] == size:
+        return cached
+
+    index = cached
+    if index is None and os.path.exists(index_path):
+        try:
+            with np.load(index_path, allow_pickle=False) as data:
+                index = {'ids': data['ids'], 'offsets': data['offsets'], 'end': int(data['end'])}
+        except Exception as e:
+            logging.error("Erro ao ler índice do arquivo de dados brutos %s: %s", index_path, e)
+            index = None
+    if index is None or index['end'] > size:
+        logging.info("Reconstruindo índice do arquivo de dados brutos %s", path)
+        index = _empty_index()
+
+    if index['end'] < size:
+        ids, offsets, end = _scan_records(path, index['end'])
+        index = _merge_index(index, ids, offsets, end)
+        if end < size:
+            logging.warning("Descartando registro incompleto no final de %s", path)
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+        _save_index(index, index_path)
+
+    _index_cache[(path, index_path)] = index
+    return index
+
+
+def archived_ids(path=ARCHIVE_FILE, index_path=ARCHIVE_INDEX_FILE):
+    """
+    Retorna o array ordenado (int64) dos IDs de batalhas arquivadas.
+    """
+    with _lock:
+        return _load_index(path, index_path)['ids']
+
+
+def archive_battles(battles, path=ARCHIVE_FILE, index_path=ARCHIVE_INDEX_FILE, codec=ARCHIVE_CODEC):
+    """
+    Arquiva os dados brutos das batalhas (iterável de dicts da API) que ainda não
+    estão no arquivo. Retorna o número de batalhas acrescentadas.
+    """
+    codec_id = CODECS[codec]
+    with _lock:
+        index = _load_index(path, index_path)
+        ids, offsets = [], []
+        seen = set()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'ab') as f:
+            end = f.tell()
+            for battle in battles:
+                try:
+                    battle_id = int(battle['id'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                position = np.searchsorted(index['ids'], battle_id)
+                if battle_id in seen or (position < len(index['ids']) and index['ids'][position] == battle_id):
+                    continue
+
+                payload = _compress(json.dumps(battle, separators=(',', ':')).encode('utf-8'), codec_id)
+                f.write(RECORD_HEADER.pack(battle_id, codec_id, len(payload)))
+                f.write(payload)
+                ids.append(battle_id)
+                offsets.append(end)
+                seen.add(battle_id)
+                end += RECORD_HEADER.size + len(payload)
+
+        if ids:
+            index = _merge_index(index, ids, offsets, end)
+            _save_index(index, index_path)
+            _index_cache[(path, index_path)] = index
+            logging.info("%s batalhas acrescentadas ao arquivo de dados brutos", len(ids))
+        return len(ids)
+
+
+def _read_record(f, offset):
+    f.seek(offset)
+    _, codec_id, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+    return json.loads(_decompress(f.read(length), codec_id))
+
+
+def get_raw_battle(battle_id, path=ARCHIVE_FILE, index_path=ARCHIVE_INDEX_FILE):
+    """
+    Retorna o JSON bruto da batalha, ou None se ela não estiver arquivada.
+    """
+    with _lock:
+        index = _load_index(path, index_path)
+    battle_id = int(battle_id)
+    position = np.searchsorted(index['ids'], battle_id)
+    if position >= len(index['ids']) or index['ids'][position] != battle_id:
+        return None
+    with open(path, 'rb') as f:
+        return _read_record(f, int(index['offsets'][position]))
+
+
+def iter_raw_battles(battle_ids=None, path=ARCHIVE_FILE, index_path=ARCHIVE_INDEX_FILE):
+    """
+    Itera sobre os JSON brutos arquivados (todos, ou apenas battle_ids), na ordem do
+    arquivo, descomprimindo um por vez. Útil para reprocessar o histórico com novas regras.
+    """
+    with _lock:
+        index = _load_index(path, index_path)
+    offsets = index['offsets']
+    if battle_ids is not None:
+        offsets = offsets[np.isin(index['ids'], to_ids(battle_ids))]
+    if not len(offsets):
+        return
+
+    with open(path, 'rb') as f:
+        for offset in np.sort(offsets):
+            yield _read_record(f, int(offset))
+
+
+def archive_stats(path=ARCHIVE_FILE, index_path=ARCHIVE_INDEX_FILE):
+    """
+    Retorna o número de batalhas arquivadas e o tamanho do arquivo em bytes.
+    """
+    with _lock:
+        index = _load_index(path, index_path)
+    return {'battles': len(index['ids']), 'bytes': index['end']}
+
+
+def import_dumps(paths, archive_path=ARCHIVE_FILE, index_path=ARCHIVE_INDEX_FILE, codec=ARCHIVE_CODEC):
+    """
+    Importa arquivos JSON de batalhas (arrays, como data.json) para o arquivo,
+    uma batalha por vez. Batalhas repetidas entre os arquivos são gravadas uma só vez.
+    Retorna o número de batalhas acrescentadas.
+    """
+    added = 0
+    for dump_path in paths:
+        count = archive_battles(iter_json_array(dump_path), archive_path, index_path, codec)
+        logging.info("%s: %s batalhas novas", dump_path, count)
+        added += count
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help='Importa arquivos JSON de batalhas')
+    import_parser.add_argument('dumps', nargs='+')
+    import_parser.add_argument('--codec', choices=sorted(CODECS), default=ARCHIVE_CODEC)
+    subparsers.add_parser('stats', help='Mostra o tamanho do arquivo')
+    export_parser = subparsers.add_parser('export', help='Exporta batalhas para um arquivo JSON (array)')
+    export_parser.add_argument('output')
+    export_parser.add_argument('--ids', nargs='*')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        sizes = sum(os.path.getsize(dump_path) for dump_path in args.dumps)
+        added = import_dumps(args.dumps, codec=args.codec)
+        stats = archive_stats()
+        print(f"{added} batalhas importadas de {len(args.dumps)} arquivos ({sizes / 1024:.0f} KB); "
+              f"arquivo com {stats['battles']} batalhas em {stats['bytes'] / 1024:.0f} KB")
+    elif args.command == 'stats':
+        stats = archive_stats()
+        print(f"{stats['battles']} batalhas em {stats['bytes'] / 1024:.0f} KB")
+    else:
+        with open(args.output, 'w') as f:
+            f.write('[')
+            for i, battle in enumerate(iter_raw_battles(args.ids)):
+                f.write((',' if i else '') + json.dumps(battle))
+            f.write(']')
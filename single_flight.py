@@ -0,0 +1,100 @@
+"""
+Deduplicação de chamadas concorrentes idênticas (single-flight).
+Quando várias threads (ex.: sessões do Streamlit no mesmo processo) pedem a mesma
+busca ao mesmo tempo, apenas a primeira executa; as demais esperam e recebem o
+mesmo resultado (ou a mesma exceção). Depois que a chamada termina, a próxima
+volta a executar normalmente: não é um cache.
+"""
+
+import copy
+import functools
+import inspect
+import logging
+import threading
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class _Call:
+    # Uma chamada em andamento: resultado ou exceção, e o aviso de término
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Grupo de chamadas identificadas por chave. Seguro para uso por várias threads.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Executa func(*args, **kwargs), a menos que uma chamada com a mesma chave já
+        esteja em andamento; nesse caso espera por ela e retorna o mesmo resultado.
+        Quando a chamada é compartilhada, cada chamador recebe a sua cópia (copy.copy)
+        do resultado, então alterar um DataFrame não afeta os outros chamadores;
+        objetos aninhados (ex.: os dicionários da coluna details) continuam
+        compartilhados e devem ser tratados como somente leitura.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            logging.info("Aguardando chamada já em andamento: %s", key)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.copy(call.result)
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                shared = call.waiters > 0
+            call.done.set()
+
+        # O resultado guardado em call fica intacto para as cópias dos que esperavam
+        return copy.copy(call.result) if shared else call.result
+
+    def wrap(self, func):
+        """
+        Decorador: chamadas concorrentes à função com os mesmos argumentos
+        (após aplicar os valores padrão) compartilham uma única execução.
+        """
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__qualname__,) + tuple(bound.arguments.items())
+            return self.do(key, func, *args, **kwargs)
+
+        return wrapper
+
+    def stats(self):
+        """
+        Retorna quantas chamadas executaram e quantas reaproveitaram uma em andamento.
+        """
+        with self._lock:
+            return {'executed': self.executed, 'shared': self.shared, 'in_flight': len(self._calls)}
@@ -0,0 +1,183 @@
+"""
+Servidor HTTP local que imita a API do Albion Online usando os arquivos de exemplo
+(test_api.json, api_response.json e outros dumps no mesmo formato).
+Permite exercitar a ingestão sem acessar a API real:
+
+    python stub_api_server.py [--port 8000] [--latency 0.1] [--fail-rate 0.2] [--synthetic 500]
+    ALBION_API_BASE_URL=http://127.0.0.1:8000 python battle_fetcher.py 173256294
+
+Rotas:
+    /battles/{id}                          detalhes de uma batalha
+    /battles?offset=&limit=&guildId=       listagem paginada, mais recentes primeiro
+    /search?q=                             busca de guilds pelo nome
+
+As respostas levam ETag e respondem 304 a If-None-Match, como a API real.
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+FIXTURE_FILES = ["test_api.json", "api_response.json"]  # Dumps servidos pelo stub
+
+
+def load_fixtures(paths=FIXTURE_FILES):
+    """
+    Carrega as batalhas dos arquivos de exemplo, indexadas pelo ID (como string).
+    """
+    battles = {}
+    for path in paths:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        for battle in data if isinstance(data, list) else [data]:
+            battles[str(battle['id'])] = battle
+    return battles
+
+
+def synthetic_battles(templates, count, days=30):
+    """
+    Gera count batalhas a partir das batalhas modelo, com IDs novos e horários
+    espalhados pelos últimos days dias (para exercitar a paginação da listagem).
+    """
+    now = datetime.now(timezone.utc)
+    templates = list(templates)
+    battles = {}
+    for i in range(count):
+        battle = copy.deepcopy(templates[i % len(templates)])
+        battle['id'] = 2_000_000_000 + i
+        start = now - timedelta(days=days) * (i / count)
+        battle['startTime'] = start.strftime('%Y-%m-%dT%H:%M:%S.%f') + 'Z'
+        battles[str(battle['id'])] = battle
+    return battles
+
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    """
+    Responde às rotas de batalhas a partir de server.battles.
+    """
+
+    protocol_version = 'HTTP/1.1'  # Keep-alive, como a API real
+
+    def log_message(self, format, *args):
+        logging.debug("Stub API: " + format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.server.not_modified_count += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status == 200:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.fail_rate and random.random() < server.fail_rate:
+            headers = {'Retry-After': str(server.retry_after)} if server.retry_after else None
+            self._send_json(503, {'error': 'Service Unavailable'}, headers)
+            return
+
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        # Aceitar o prefixo da API real (/api/gameinfo/...) ou apenas /battles/...
+        if parts[:2] == ['api', 'gameinfo']:
+            parts = parts[2:]
+
+        if parts == ['search']:
+            self._send_json(200, self._search(parse_qs(url.query)))
+        elif parts == ['battles']:
+            self._send_json(200, self._list_battles(parse_qs(url.query)))
+        elif len(parts) == 2 and parts[0] == 'battles':
+            battle = server.battles.get(parts[1])
+            if battle is None:
+                self._send_json(404, {'error': 'Not Found'})
+            else:
+                self._send_json(200, battle)
+        else:
+            self._send_json(404, {'error': 'Not Found'})
+
+    def _search(self, query):
+        term = query.get('q', [''])[0].lower()
+        guilds = {}
+        for battle in self.server.battles.values():
+            for guild in battle.get('guilds', {}).values():
+                if term and term in guild.get('name', '').lower():
+                    guilds[guild['id']] = {'Id': guild['id'], 'Name': guild['name'],
+                                           'AllianceId': guild.get('allianceId', ''),
+                                           'AllianceName': guild.get('alliance', '')}
+        return {'guilds': list(guilds.values()), 'players': []}
+
+    def _list_battles(self, query):
+        offset = int(query.get('offset', ['0'])[0])
+        limit = int(query.get('limit', ['51'])[0])
+        guild_id = query.get('guildId', [None])[0]
+
+        battles = sorted(self.server.battles.values(), key=lambda b: b['startTime'], reverse=True)
+        if guild_id:
+            battles = [b for b in battles
+                       if any(p.get('guildId') == guild_id for p in b.get('players', {}).values())]
+        return battles[offset:offset + limit]
+
+
+def start_stub_server(port=0, latency=0.0, fail_rate=0.0, fixtures=FIXTURE_FILES, synthetic=0, retry_after=0):
+    """
+    Inicia o servidor em uma thread e retorna (servidor, base_url).
+    Com port=0 o sistema escolhe uma porta livre. Com synthetic, serve também
+    essa quantidade de batalhas sintéticas recentes. Encerrar com server.shutdown().
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubAPIHandler)
+    server.battles = load_fixtures(fixtures)
+    if synthetic:
+        server.battles.update(synthetic_battles(server.battles.values(), synthetic))
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.retry_after = retry_after
+    server.request_count = 0
+    server.not_modified_count = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help='Atraso de cada resposta (segundos)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fração de respostas 503')
+    parser.add_argument('--retry-after', type=float, default=0, help='Retry-After enviado nas respostas 503')
+    parser.add_argument('--synthetic', type=int, default=0, help='Batalhas sintéticas recentes adicionais')
+    parser.add_argument('fixtures', nargs='*', default=FIXTURE_FILES, help='Dumps de batalhas servidos')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency, args.fail_rate, args.fixtures, args.synthetic,
+                                         args.retry_after)
+    print(f"Servindo {len(server.battles)} batalhas em {base_url} (Ctrl+C para sair)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,66 @@
+"""
+Estado da sincronização incremental com a API: para cada guild, a batalha mais
+recente já sincronizada (high-water mark). A atualização seguinte lista apenas
+as batalhas a partir desse ponto, em vez de baixar o período inteiro de novo.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+
+# Configuração de logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SYNC_STATE_FILE = os.path.join("battle_store", "sync_state.json")  # Marcas por guild
+
+
+def load_sync_state(path=SYNC_STATE_FILE):
+    """
+    Lê o estado de sincronização ({guild_id: marca}). Retorna {} se não existir.
+    """
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.error("Erro ao ler estado de sincronização %s: %s", path, e)
+        return {}
+
+
+def get_high_water_mark(guild_id, path=SYNC_STATE_FILE):
+    """
+    Retorna (horário, battle_id) da batalha mais recente sincronizada para a guild,
+    ou None se a guild ainda não foi sincronizada.
+    """
+    mark = load_sync_state(path).get(guild_id)
+    if not mark:
+        return None
+    return datetime.fromisoformat(mark['newest_time']), mark['newest_id']
+
+
+def update_high_water_mark(guild_id, newest_time, newest_id, path=SYNC_STATE_FILE):
+    """
+    Avança a marca da guild para (newest_time, newest_id), se for mais recente que a atual.
+    A gravação é atômica (arquivo temporário + os.replace).
+    """
+    state = load_sync_state(path)
+    current = state.get(guild_id)
+    if current and (datetime.fromisoformat(current['newest_time']), current['newest_id']) >= (newest_time, newest_id):
+        return False
+
+    state[guild_id] = {
+        'newest_time': newest_time.isoformat(),
+        'newest_id': int(newest_id),
+        'synced_at': datetime.now().astimezone().isoformat(),
+    }
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+    logging.info("Sincronização da guild %s avançada até a batalha %s (%s)", guild_id, newest_id, newest_time)
+    return True
@@ -0,0 +1,84 @@
+"""
+Configuração comum dos testes: os módulos ficam na raiz do repositório e usam
+caminhos relativos (battle_store/, backups/, battle_history.json), então cada
+teste roda num diretório temporário próprio, com os caches do processo limpos.
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Diretório de trabalho vazio e caches de histórico, dimensões e nomes descartados.
+    """
+    import battle_history_manager
+    import dimensions
+    import name_dictionary
+    import raw_archive
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(battle_history_manager, 'MAX_HISTORY_DAYS', 36500)
+    battle_history_manager.invalidate_history_cache()
+    dimensions._loaded.clear()
+    name_dictionary._loaded.clear()
+    raw_archive._index_cache.clear()
+    yield tmp_path
+    battle_history_manager.invalidate_history_cache()
+    dimensions._loaded.clear()
+    name_dictionary._loaded.clear()
+    raw_archive._index_cache.clear()
+
+
+@pytest.fixture
+def legacy_history(workdir):
+    """
+    Diretório de trabalho com o battle_history.json legado do repositório.
+    """
+    shutil.copy(os.path.join(REPO_DIR, 'battle_history.json'), workdir / 'battle_history.json')
+    return workdir
+
+
+@pytest.fixture(scope='session')
+def stub_battles():
+    """
+    Batalhas servidas pelo stub: as de exemplo e 300 sintéticas dos últimos 30 dias.
+    """
+    from stub_api_server import FIXTURE_FILES, load_fixtures, synthetic_battles
+
+    battles = load_fixtures([os.path.join(REPO_DIR, path) for path in FIXTURE_FILES])
+    battles.update(synthetic_battles(battles.values(), 300))
+    return battles
+
+
+@pytest.fixture
+def stub_api(workdir, stub_battles, monkeypatch):
+    """
+    Servidor stub da API (stub_api_server) com as batalhas de stub_battles. O
+    cliente compartilhado aponta para ele, com cache de respostas novo no
+    diretório de trabalho e sem limite de taxa.
+    """
+    import api_client
+    import api_scraper
+    from rate_limiter import RateLimiter
+    from stub_api_server import start_stub_server
+
+    server, base_url = start_stub_server(fixtures=[])
+    server.battles = dict(stub_battles)
+    monkeypatch.setattr(api_client, 'API_BASE_URL', base_url)
+    monkeypatch.setattr(api_client, '_response_cache', None)
+    monkeypatch.setattr(api_client, 'rate_limiter', RateLimiter(rate=1000, burst=1000))
+    monkeypatch.setattr(api_scraper, 'BATTLE_DETAIL_URL', f"{base_url}/battles")
+    monkeypatch.setattr(api_scraper, 'SEARCH_URL', f"{base_url}/search")
+    api_client.close_session()
+    yield server
+    server.shutdown()
+    server.server_close()
+    api_client.close_session()
@@ -0,0 +1,12 @@
+from api_client import api_get, connection_stats
+
+
+def test_sequential_requests_reuse_one_connection(stub_api):
+    for _ in range(5):
+        response = api_get('search', params={'q': 'we profit'}, use_cache=False)
+        assert response.status_code == 200
+
+    stats = connection_stats()
+    assert stats['requests'] == 5
+    assert stats['connections'] == 1
+    assert stats['reused'] == 4
@@ -0,0 +1,35 @@
+import battle_history_manager as manager
+import dimensions
+from battle_store import filter_tables
+
+
+def _legacy_tables(workdir, monkeypatch):
+    # Batalhas do histórico legado, seguindo num diretório sem histórico gravado
+    tables = manager.load_battle_tables()
+    (workdir / 'empty').mkdir()
+    monkeypatch.chdir(workdir / 'empty')
+    manager.invalidate_history_cache()
+    dimensions._loaded.clear()
+    return tables
+
+
+def _history_ids():
+    manager.invalidate_history_cache()
+    return set(manager.load_battle_tables()['battles']['battle_id'])
+
+
+def test_restore_older_backup_discards_later_deltas(legacy_history, monkeypatch):
+    tables = _legacy_tables(legacy_history, monkeypatch)
+    first, second, third = [[battle_id] for battle_id in tables['battles']['battle_id'][:3]]
+
+    manager.update_battle_tables(filter_tables(tables, first))
+    checkpoint_seq = manager.list_backups(manager.BACKUP_DIR)[-1]['seq']
+    manager.update_battle_tables(filter_tables(tables, second))
+    assert _history_ids() == set(first + second)
+
+    assert manager.restore_battle_history(checkpoint_seq)
+    assert _history_ids() == set(first)
+
+    manager.update_battle_tables(filter_tables(tables, third))
+    assert manager.restore_battle_history()
+    assert _history_ids() == set(first + third)
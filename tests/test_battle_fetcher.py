@@ -0,0 +1,54 @@
+import socket
+
+from battle_fetcher import fetch_battles_sync
+
+FIXTURE_IDS = ['1180068492', '1179317816', '1179515290']
+
+
+def test_fetch_battles_returns_each_battle_once(stub_api):
+    battles = fetch_battles_sync(FIXTURE_IDS + FIXTURE_IDS[:1], delay=0)
+
+    assert sorted(str(battle['id']) for battle in battles) == sorted(FIXTURE_IDS)
+    assert stub_api.request_count == len(FIXTURE_IDS)
+
+
+def test_missing_battle_is_skipped_without_retrying(stub_api):
+    battles = fetch_battles_sync(['999', FIXTURE_IDS[0]], delay=0)
+
+    assert [str(battle['id']) for battle in battles] == [FIXTURE_IDS[0]]
+    assert stub_api.request_count == 2
+
+
+def test_server_errors_are_retried_then_omitted(stub_api):
+    stub_api.fail_rate = 1.0
+
+    assert fetch_battles_sync(FIXTURE_IDS[:2], max_attempts=3, delay=0) == []
+    assert stub_api.request_count == 6
+
+
+def test_server_error_recovers_on_retry(stub_api, monkeypatch):
+    import random
+
+    # Só a primeira resposta falha
+    draws = iter([0.0])
+    monkeypatch.setattr(random, 'random', lambda: next(draws, 1.0))
+    stub_api.fail_rate = 0.5
+
+    battles = fetch_battles_sync(FIXTURE_IDS[:1], max_attempts=3, delay=0)
+    assert [str(battle['id']) for battle in battles] == FIXTURE_IDS[:1]
+    assert stub_api.request_count == 2
+
+
+def test_timeouts_are_omitted(stub_api):
+    stub_api.latency = 1.0
+
+    assert fetch_battles_sync(FIXTURE_IDS[:1], timeout=0.2, max_attempts=2, delay=0) == []
+
+
+def test_connection_errors_are_omitted(workdir):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    battles = fetch_battles_sync(FIXTURE_IDS[:1], base_url=f"http://127.0.0.1:{port}", max_attempts=2, delay=0)
+    assert battles == []
@@ -0,0 +1,66 @@
+import numpy as np
+
+import battle_history_manager as manager
+from battle_index import BloomFilter, build_index, contains
+from battle_normalizer import normalize_battles
+
+
+def _random_ids(seed, count):
+    return np.random.default_rng(seed).integers(1, 2**40, size=count, dtype=np.int64)
+
+
+def test_contains_matches_a_set():
+    stored = _random_ids(1, 2000)
+    probes = np.concatenate([stored[::3], _random_ids(2, 2000), [0, 2**41]])
+    index = build_index(stored)
+    expected = np.array([battle_id in set(stored.tolist()) for battle_id in probes])
+
+    assert (contains(index, probes) == expected).all()
+    assert not contains(build_index([]), probes).any()
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives(tmp_path):
+    stored = _random_ids(3, 5000)
+    bloom = BloomFilter.from_ids(stored, error_rate=0.01)
+    assert bloom.might_contain(stored).all()
+
+    absent = np.setdiff1d(_random_ids(4, 50000), stored)
+    assert bloom.might_contain(absent).mean() < 0.03
+
+    path = str(tmp_path / 'bloom.npz')
+    bloom.save(path)
+    loaded = BloomFilter.load(path)
+    assert (loaded.might_contain(absent) == bloom.might_contain(absent)).all()
+    assert not loaded.saturated
+
+
+def _store(stub_battles, ids):
+    raw = [stub_battles[str(battle_id)] for battle_id in ids]
+    manager.update_battle_tables(normalize_battles(raw))
+
+
+def test_known_battles_mask_matches_a_set(workdir, stub_battles):
+    ids = sorted(int(battle_id) for battle_id in stub_battles)
+    first, later, absent = ids[:100], ids[100:150], ids[150:200]
+    probes = first + later + absent + [1, 2**40]
+
+    _store(stub_battles, first)
+    assert (manager.known_battles_mask(probes) == np.isin(probes, first)).all()
+
+    # IDs gravados depois que o índice e o filtro já estão em cache
+    _store(stub_battles, later)
+    assert (manager.known_battles_mask(probes) == np.isin(probes, first + later)).all()
+
+
+def test_bloom_false_positives_are_resolved_by_the_index(workdir, stub_battles):
+    ids = sorted(int(battle_id) for battle_id in stub_battles)
+    _store(stub_battles, ids[:100])
+    probes = ids + list(_random_ids(5, 1000))
+
+    # Filtro com todos os bits ligados: todo ID é um possível positivo
+    bloom = BloomFilter.from_ids(ids[:100])
+    bloom.bits[:] = 0xFF
+    bloom.save(manager.ID_BLOOM_FILE)
+
+    assert manager._battle_filter().might_contain(probes).all()
+    assert (manager.known_battles_mask(probes) == np.isin(probes, ids[:100])).all()
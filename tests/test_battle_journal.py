@@ -0,0 +1,18 @@
+import battle_history_manager as manager
+from battle_journal import append_battles, read_journal
+from battle_store import filter_tables
+
+
+def test_append_after_partial_line_keeps_new_battles(legacy_history):
+    tables = manager.load_battle_tables()
+    first, second = [[battle_id] for battle_id in tables['battles']['battle_id'][:2]]
+    path = legacy_history / 'journal.ndjson'
+
+    append_battles(str(path), filter_tables(tables, first))
+    # Gravação interrompida: metade da linha seguinte, sem o '\n'
+    with open(path, 'a') as f:
+        f.write('{"battle_id": 1, "guil')
+    append_battles(str(path), filter_tables(tables, second))
+
+    assert set(read_journal(str(path))['battles']['battle_id']) == set(first + second)
+    assert path.read_text().endswith('\n')
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from battle_fetcher import LIST_PAGE_SIZE, ListingError, iterate_sync, list_guild_battles
+
+GUILD_ID = 'gUFLG-kcRFC1iOJDdwW2BQ'
+
+
+def _battle_time(battle):
+    return datetime.fromisoformat(battle['startTime'].replace('Z', '+00:00'))
+
+
+def _expected(server, cutoff):
+    # Batalhas da guild a partir do corte, mais recentes primeiro (como a listagem)
+    battles = [b for b in server.battles.values()
+               if any(p.get('guildId') == GUILD_ID for p in b['players'].values())]
+    battles.sort(key=lambda b: b['startTime'], reverse=True)
+    return [b['id'] for b in battles if _battle_time(b) >= cutoff]
+
+
+def _list(**kwargs):
+    return [battle['id'] for battle in iterate_sync(list_guild_battles(GUILD_ID, delay=0, **kwargs))]
+
+
+def test_listing_stops_at_the_days_cutoff(stub_api):
+    expected = _expected(stub_api, datetime.now(timezone.utc) - timedelta(days=20))
+    assert len(expected) > 2 * LIST_PAGE_SIZE
+
+    assert _list(days=20, pages_in_flight=1) == expected
+    # Só as páginas até a primeira batalha anterior ao corte
+    assert stub_api.request_count == len(expected) // LIST_PAGE_SIZE + 1
+
+
+def test_concurrent_pages_are_delivered_in_order(stub_api):
+    expected = _expected(stub_api, datetime.now(timezone.utc) - timedelta(days=20))
+
+    assert _list(days=20, pages_in_flight=3) == expected
+
+
+def test_listing_stops_at_since(stub_api):
+    since = datetime.now(timezone.utc) - timedelta(days=3)
+    expected = _expected(stub_api, since)
+
+    assert _list(days=30, since=since, pages_in_flight=1) == expected
+    assert stub_api.request_count == 1
+
+
+def test_listing_ends_at_the_last_partial_page(stub_api):
+    expected = _expected(stub_api, datetime.now(timezone.utc) - timedelta(days=3650))
+
+    assert _list(days=3650, pages_in_flight=2) == expected
+
+
+def test_failed_page_raises_listing_error(stub_api):
+    stub_api.fail_rate = 1.0
+
+    with pytest.raises(ListingError):
+        _list(days=20, max_attempts=2)
+
+
+def test_guild_battles_are_normalized_from_the_listing(stub_api):
+    from api_scraper import get_guild_battles
+
+    expected = _expected(stub_api, datetime.now(timezone.utc) - timedelta(days=20))
+    battles = get_guild_battles(GUILD_ID, days=20, delay=0)
+
+    assert sorted(battles['battle_id']) == sorted(expected)
+
+
+def test_failed_listing_is_reported_incomplete(stub_api):
+    from api_scraper import _collect_guild_battles
+
+    stub_api.fail_rate = 1.0
+    tables, listed, newest, complete = _collect_guild_battles(GUILD_ID, 20, max_attempts=2, delay=0)
+
+    assert (listed, newest, complete) == (0, None, False)
+    assert tables['battles'].empty
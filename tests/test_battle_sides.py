@@ -0,0 +1,69 @@
+import numpy as np
+
+import battle_history_manager as manager
+from battle_sides import SIDE_OWN, SIDE_UNKNOWN, fill_sides, split_sides
+from battle_store import load_partitions
+
+
+def test_legacy_history_finds_own_guild_by_name(legacy_history):
+    history = manager.load_battle_history()
+
+    assert len(history) == 4
+    for details in history['details']:
+        own_name, own_stats, _, _ = split_sides(details['guilds'])
+        assert own_name == 'We Profit'
+        assert own_stats is not None
+
+
+def test_name_matched_sides_are_not_persisted(legacy_history):
+    manager.load_battle_history()
+    assert manager.compact_battle_history()
+
+    stored = load_partitions(manager.STORE_DIR)
+    assert (stored['guilds']['side'].to_numpy() == SIDE_UNKNOWN).all()
+    # Sem linha com o ID da guild, nada é preenchido para gravação
+    assert (fill_sides(stored, stored=True)['guilds']['side'].to_numpy() == SIDE_UNKNOWN).all()
+
+    manager.invalidate_history_cache()
+    sides = manager.load_battle_tables()['guilds']['side'].to_numpy()
+    assert np.count_nonzero(sides == SIDE_OWN) == 4
+
+
+def test_selected_guild_uses_its_own_perspective(legacy_history):
+    from data_processor import get_guild_stats
+
+    history = manager.load_battle_history()
+    guilds = history['details'].iloc[0]['guilds']
+    other = next(name for name in guilds if name != 'We Profit')
+
+    selected = manager.get_battles_from_perspective(history, other)
+    own_name, own_stats, _, enemies = split_sides(selected['details'].iloc[0]['guilds'])
+    assert own_name == other
+    assert 'We Profit' in enemies
+
+    stats = get_guild_stats(history, other)
+    assert stats['total_kills'] == sum(
+        split_sides(details['guilds'])[1]['total_kills']
+        for details in selected['details'] if split_sides(details['guilds'])[1])
+
+
+def test_perspective_is_computed_only_for_the_selected_battles(legacy_history, monkeypatch):
+    from battle_sides import resolve_perspective
+    from battle_store import build_history_frame
+
+    history = manager.load_battle_history()
+    other = next(name for name in history['details'].iloc[0]['guilds'] if name != 'We Profit')
+    expected = build_history_frame(manager.load_battle_tables(perspective=resolve_perspective(other)))
+    expected_details = dict(zip(expected['battle_id'], expected['details']))
+
+    built = []
+    monkeypatch.setattr(manager, 'build_history_frame', lambda tables: built.append(tables))
+    selected = manager.get_battles_from_perspective(history.iloc[:2], other)
+
+    assert built == []
+    assert list(selected['battle_id']) == list(history['battle_id'][:2])
+    for battle_id, details in zip(selected['battle_id'], selected['details']):
+        sides = {guild: stats['side'] for guild, stats in details['guilds'].items()}
+        assert sides == {guild: stats['side'] for guild, stats in expected_details[battle_id]['guilds'].items()}
+    # O histórico original não é alterado
+    assert split_sides(history['details'].iloc[0]['guilds'])[0] == 'We Profit'
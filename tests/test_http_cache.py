@@ -0,0 +1,98 @@
+import os
+
+import api_client
+from api_client import api_get, get_response_cache
+from http_cache import PERMANENT, ResponseCache, request_key
+
+SEARCH = {'q': 'we profit'}
+
+
+def _search_key():
+    return request_key(api_client.api_url('search'), SEARCH)
+
+
+def test_fresh_entries_are_served_without_requests(stub_api):
+    first = api_get('search', params=SEARCH)
+    second = api_get('search', params=SEARCH)
+
+    assert stub_api.request_count == 1
+    assert second.json() == first.json()
+    assert getattr(second, 'from_cache', False)
+    assert get_response_cache().stats()['hits'] == 1
+
+
+def test_stale_entry_is_revalidated_with_etag(stub_api):
+    first = api_get('search', params=SEARCH)
+    cache = get_response_cache()
+    cache.refresh(_search_key(), 0)
+
+    revalidated = api_get('search', params=SEARCH)
+    assert stub_api.request_count == 2
+    assert stub_api.not_modified_count == 1
+    assert revalidated.status_code == 200
+    assert revalidated.json() == first.json()
+    assert cache.stats()['revalidated'] == 1
+
+    # A revalidação renova o TTL
+    api_get('search', params=SEARCH)
+    assert stub_api.request_count == 2
+
+
+def test_stale_entry_is_replaced_when_the_response_changes(stub_api):
+    api_get('search', params=SEARCH)
+    get_response_cache().refresh(_search_key(), 0)
+    stub_api.battles.clear()
+
+    changed = api_get('search', params=SEARCH)
+    assert stub_api.not_modified_count == 0
+    assert changed.json() == {'guilds': [], 'players': []}
+    assert api_get('search', params=SEARCH).json() == {'guilds': [], 'players': []}
+    assert stub_api.request_count == 2
+
+
+def test_stale_entry_is_used_when_the_network_fails(stub_api):
+    first = api_get('search', params=SEARCH)
+    get_response_cache().refresh(_search_key(), 0)
+    stub_api.shutdown()
+    stub_api.server_close()
+    api_client.close_session()
+
+    assert api_get('search', params=SEARCH, timeout=2).json() == first.json()
+
+
+def test_finished_battles_are_cached_permanently(stub_api):
+    path = 'battles/1180068492'
+    api_get(path)
+    api_get(path)
+
+    assert stub_api.request_count == 1
+    meta, _ = get_response_cache().get(request_key(api_client.api_url(path)))
+    assert meta['ttl'] is PERMANENT
+
+
+def test_listing_is_not_cached(stub_api):
+    params = {'offset': 0, 'limit': 5}
+    api_get('battles', params=params)
+    api_get('battles', params=params)
+
+    assert stub_api.request_count == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=250)
+    keys = [request_key(f"http://stub/{name}") for name in 'abc']
+    for key in keys[:2]:
+        cache.put(key, 'http://stub', 200, {'ETag': '"x"'}, b'x' * 100, PERMANENT)
+
+    # A primeira entrada é a usada há mais tempo até ser lida de novo
+    for age, key in zip((1000, 2000), keys[:2]):
+        meta_path = cache._paths(key)[0]
+        os.utime(meta_path, (age, age))
+    assert cache.get(keys[0]) is not None
+
+    cache.put(keys[2], 'http://stub', 200, {}, b'x' * 100, PERMANENT)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 200
@@ -0,0 +1,59 @@
+import copy
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+import api_scraper
+import battle_fetcher
+from sync_state import get_high_water_mark
+
+GUILD_ID = 'gUFLG-kcRFC1iOJDdwW2BQ'
+
+
+def _newest(server):
+    # A batalha mais recente da guild servida pelo stub
+    battles = [b for b in server.battles.values()
+               if any(p.get('guildId') == GUILD_ID for p in b['players'].values())]
+    return max(battles, key=lambda b: b['startTime'])
+
+
+def _add_battle(server, battle_id, start):
+    battle = copy.deepcopy(_newest(server))
+    battle['id'] = battle_id
+    battle['startTime'] = start.strftime('%Y-%m-%dT%H:%M:%S.%f') + 'Z'
+    server.battles[str(battle_id)] = battle
+
+
+def test_refresh_lists_only_battles_after_the_high_water_mark(stub_api):
+    first = api_scraper.refresh_battle_data('We Profit', days=10)
+    newest = _newest(stub_api)
+    mark = get_high_water_mark(GUILD_ID)
+    assert len(first) > api_scraper.LIST_PAGE_SIZE
+    assert mark[1] == newest['id']
+
+    # Sem batalhas novas: uma página, só com as batalhas dentro da margem, todas conhecidas
+    requests_before = stub_api.request_count
+    assert api_scraper.refresh_battle_data('We Profit', days=10).empty
+    assert stub_api.request_count - requests_before == 1
+    assert get_high_water_mark(GUILD_ID) == mark
+
+    _add_battle(stub_api, 3_000_000_000, datetime.now(timezone.utc) + timedelta(minutes=1))
+    update = api_scraper.refresh_battle_data('We Profit', days=10)
+    assert list(update['battle_id']) == [3_000_000_000]
+    assert get_high_water_mark(GUILD_ID)[1] == 3_000_000_000
+
+
+def test_failed_listing_keeps_the_high_water_mark(stub_api, monkeypatch):
+    monkeypatch.setattr(battle_fetcher, 'backoff_delay', lambda *args, **kwargs: 0)
+    monkeypatch.setattr(api_scraper, 'get_known_battles', lambda guild_name: pd.DataFrame())
+    api_scraper.refresh_battle_data('We Profit', days=10)
+    mark = get_high_water_mark(GUILD_ID)
+
+    _add_battle(stub_api, 3_000_000_001, datetime.now(timezone.utc) + timedelta(minutes=1))
+    stub_api.fail_rate = 1.0
+    assert api_scraper.refresh_battle_data('We Profit', days=10).empty
+    assert get_high_water_mark(GUILD_ID) == mark
+
+    # Na próxima sincronização a batalha perdida ainda é listada
+    stub_api.fail_rate = 0.0
+    assert list(api_scraper.refresh_battle_data('We Profit', days=10)['battle_id']) == [3_000_000_001]
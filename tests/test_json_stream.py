@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from json_stream import iter_json_array
+
+VALID = [
+    '[]',
+    ' [ ] \n',
+    '[1]',
+    '[1, 2.5, "a,]b", {"x": [1, 2]}, null, true]',
+    '\n[\n  {"id": 1},\n  {"id": 2}\n]\n',
+]
+
+INVALID = [
+    '',
+    '[1,]',
+    '[,1]',
+    '[1,,2]',
+    '[1 2]',
+    '[1] xx',
+    '[1]]',
+    '[1, 2',
+    '[{"id": 1}, {"id"',
+]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1 << 20])
+@pytest.mark.parametrize('text', VALID)
+def test_valid_arrays_match_json_load(tmp_path, text, chunk_size):
+    path = tmp_path / 'dump.json'
+    path.write_text(text)
+
+    assert list(iter_json_array(str(path), chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 1 << 20])
+@pytest.mark.parametrize('text', INVALID)
+def test_invalid_arrays_are_rejected_like_json_load(tmp_path, text, chunk_size):
+    path = tmp_path / 'dump.json'
+    path.write_text(text)
+
+    with pytest.raises(ValueError):
+        json.loads(text)
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), chunk_size))
+
+
+def test_top_level_object_is_rejected(tmp_path):
+    path = tmp_path / 'dump.json'
+    path.write_text('{"id": 1}')
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path)))
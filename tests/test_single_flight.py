@@ -0,0 +1,83 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from single_flight import SingleFlight
+
+
+def _run_concurrently(group, func, callers=4):
+    # Chama group.do com a mesma chave em várias threads enquanto func está em andamento
+    results, errors = [None] * callers, [None] * callers
+
+    def call(i):
+        try:
+            results[i] = group.do('key', func)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def _wait_for_followers(group, followers):
+    while group.stats()['shared'] < followers:
+        threading.Event().wait(0.01)
+
+
+def test_concurrent_calls_share_one_execution_with_independent_copies():
+    group = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return pd.DataFrame({'battle_id': [1, 2]})
+
+    threads, results, errors = _run_concurrently(group, fetch)
+    _wait_for_followers(group, 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert errors == [None] * 4
+    assert len({id(result) for result in results}) == 4
+
+    results[0].loc[0, 'battle_id'] = 99
+    results[1]['extra'] = True
+    for result in results[2:]:
+        assert list(result['battle_id']) == [1, 2]
+        assert list(result.columns) == ['battle_id']
+    assert group.stats() == {'executed': 1, 'shared': 3, 'in_flight': 0}
+
+
+def test_concurrent_callers_receive_the_same_exception():
+    group = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError('API indisponível')
+
+    threads, results, errors = _run_concurrently(group, fail, callers=3)
+    _wait_for_followers(group, 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert results == [None] * 3
+
+
+def test_calls_after_completion_execute_again():
+    group = SingleFlight()
+    frame = pd.DataFrame({'battle_id': [1]})
+
+    assert group.do('key', lambda: frame) is frame
+    with pytest.raises(KeyError):
+        group.do('key', lambda: {}['missing'])
+    assert group.stats()['executed'] == 2